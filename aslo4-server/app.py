@@ -1,32 +1,79 @@
+import concurrent.futures
+import logging
 import os
 import flask
 from flask import request, Response
-import urllib.request
+
+from config import (
+    ASLO1_DOMAIN_API_ENDPOINT,
+    ASLO4_DOMAIN_API_ENDPOINT,
+    ASLO4_MIN_APP_VERSION,
+    ASLO4_SERVER_API_DIRECTORY,
+    ASLO4_SERVER_API_RELOAD_INTERVAL,
+    ASLO4_SERVER_BATCH_MAX_BODY_SIZE,
+    ASLO4_SERVER_BATCH_MAX_BUNDLES,
+    ASLO4_SERVER_CACHE_NEGATIVE_TTL,
+    ASLO4_SERVER_CACHE_SIZE,
+    ASLO4_SERVER_CACHE_STALE_TTL,
+    ASLO4_SERVER_CACHE_TTL,
+    ASLO4_SERVER_UPSTREAM_CONCURRENCY,
+    ASLO4_SERVER_UPSTREAM_TIMEOUT,
+    RDF_HEADERS,
+)
+from local_api import open_local_api
+from updates import get_batch_response, get_upstream_request, parse_batch_request
+from upstream import ConnectionPool, UpstreamCache, UpstreamError
+
+logger = logging.getLogger("aslo4-server")
 
 app = flask.Flask(__name__)
 
 # use production
 app.config["DEBUG"] = os.getenv("ASLO4_SERVER_DEBUG") or False
+# only batch update checks have a body
+app.config["MAX_CONTENT_LENGTH"] = ASLO4_SERVER_BATCH_MAX_BODY_SIZE
 
-# domain names
-ASLO4_DOMAIN = os.getenv("ASLO4_DOMAIN") or "https://v4.activities.sugarlabs.org"
-ASLO1_DOMAIN = os.getenv("ASLO1_DOMAIN") or "https://activities.sugarlabs.org"
+upstream_cache = UpstreamCache(
+    ConnectionPool(timeout=ASLO4_SERVER_UPSTREAM_TIMEOUT).get,
+    max_entries=ASLO4_SERVER_CACHE_SIZE,
+    ttl=ASLO4_SERVER_CACHE_TTL,
+    stale_ttl=ASLO4_SERVER_CACHE_STALE_TTL,
+    negative_ttl=ASLO4_SERVER_CACHE_NEGATIVE_TTL,
+)
+
+rdf_directory = None
+if ASLO4_SERVER_API_DIRECTORY:
+    rdf_directory = open_local_api(
+        ASLO4_SERVER_API_DIRECTORY, reload_interval=ASLO4_SERVER_API_RELOAD_INTERVAL
+    )
 
-# api end points
-ASLO4_DOMAIN_API_ENDPOINT = f"{ASLO4_DOMAIN}" + "/api"
-ASLO1_DOMAIN_API_ENDPOINT = (
-    f"{ASLO1_DOMAIN}" + "/services/update-aslo.php?id={i}&appVersion={v}"
+# fetches the update RDFs of a batch update check concurrently
+batch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=ASLO4_SERVER_UPSTREAM_CONCURRENCY
 )
 
-# headers for RDF output
-_RDF_HEADERS = """<?xml version="1.0"?>
-<RDF:RDF xmlns:RDF="http://www.w3.org/1999/02/22-rdf-syntax-ns#" \
-xmlns:em="http://www.mozilla.org/2004/em-rdf#"></RDF:RDF>"""
+
+def get_update_rdf(bundle_id, app_version):
+    """
+    Returns the update RDF of a bundle, routed by appVersion as
+    update_aslo does
+    :return: None if the bundle has no update RDF
+    :rtype: Union[bytes, None]
+    """
+    if float(app_version) >= ASLO4_MIN_APP_VERSION and rdf_directory is not None:
+        rdf = rdf_directory.get(bundle_id)
+        return None if rdf is None else rdf.content
+    key, url = get_upstream_request(bundle_id, app_version)
+    try:
+        return upstream_cache.get(key, url)
+    except UpstreamError as e:
+        logger.warning(f"Could not fetch an update: {e}")
+        return None
 
 
 @app.route("/services/update-aslo.php", methods=["GET"])
 def update_aslo():
-    xml = _RDF_HEADERS
+    xml = RDF_HEADERS
     bundle_id = request.args.get("id")
     app_version = request.args.get("appVersion")
     try:
@@ -36,22 +83,64 @@ def update_aslo():
         response.headers.add("Access-Control-Allow-Origin", "*")
         return response
 
-    if float(app_version) < 0.116:
-        with urllib.request.urlopen(
-            ASLO1_DOMAIN_API_ENDPOINT.format(i=bundle_id, v=app_version)
-        ) as f:
-            xml = f.read().decode("utf-8")
+    if float(app_version) < ASLO4_MIN_APP_VERSION:
+        # the answer of ASLOv1 depends on the sugar release
+        key = (bundle_id, f"{float(app_version):.3f}")
+        url = ASLO1_DOMAIN_API_ENDPOINT.format(i=bundle_id, v=app_version)
+    elif rdf_directory is not None:
+        rdf = rdf_directory.get(bundle_id)
+        if rdf is None:
+            # the bundle is not published on ASLOv4
+            response = Response(xml, mimetype="text/xml")
+        else:
+            response = Response(rdf.content, mimetype="text/xml")
+            response.set_etag(rdf.etag)
+            response.last_modified = rdf.last_modified
+            response.cache_control.no_cache = True
+            # 304 Not Modified if the client has the same RDF
+            response.make_conditional(request)
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response
     else:
-        aslo4_domain_formatted_endpoint = f"{ASLO4_DOMAIN_API_ENDPOINT}/{bundle_id}.xml"
-        print(aslo4_domain_formatted_endpoint)
-        with urllib.request.urlopen(aslo4_domain_formatted_endpoint) as f:
-            xml = f.read().decode("utf-8")
+        key = (bundle_id, "aslo4")
+        url = f"{ASLO4_DOMAIN_API_ENDPOINT}/{bundle_id}.xml"
+
+    try:
+        xml = upstream_cache.get(key, url).decode("utf-8")
+    except UpstreamError as e:
+        logger.error(f"Could not fetch an update: {e}")
+        response = Response("Bad Gateway", status=502, mimetype="text/plain")
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response
 
     response = Response(xml, mimetype="text/xml")
     response.headers.add("Access-Control-Allow-Origin", "*")
     return response
 
 
+@app.route("/services/update-aslo-batch", methods=["POST"])
+def update_aslo_batch():
+    """
+    Checks the updates of many bundles at once, see
+    updates.parse_batch_request for the body of the request. Only the
+    bundles which have a newer version are part of the response
+    """
+    try:
+        app_version, pairs, output_format = parse_batch_request(
+            request.get_json(force=True, silent=True), ASLO4_SERVER_BATCH_MAX_BUNDLES
+        )
+    except ValueError as e:
+        response = Response(str(e), status=400, mimetype="text/plain")
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        return response
+
+    rdfs = batch_executor.map(lambda x: get_update_rdf(x[0], app_version), pairs)
+    body, mimetype = get_batch_response(pairs, rdfs, output_format)
+    response = Response(body, mimetype=mimetype)
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+
 @app.route("/ping", methods=["GET"])
 def wake():
     response = flask.jsonify({"pong": "Ok"})
@@ -0,0 +1,265 @@
+"""
+asyncio (ASGI) variant of app.py. Upstream servers are fetched without
+blocking, so a single process can hold thousands of concurrent update
+checks. Run with
+    uvicorn asgi:app
+or
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+"""
+
+import asyncio
+import email.utils
+import json
+import logging
+import urllib.parse
+
+from config import (
+    ASLO1_DOMAIN_API_ENDPOINT,
+    ASLO4_DOMAIN_API_ENDPOINT,
+    ASLO4_MIN_APP_VERSION,
+    ASLO4_SERVER_API_DIRECTORY,
+    ASLO4_SERVER_API_RELOAD_INTERVAL,
+    ASLO4_SERVER_BATCH_MAX_BODY_SIZE,
+    ASLO4_SERVER_BATCH_MAX_BUNDLES,
+    ASLO4_SERVER_CACHE_NEGATIVE_TTL,
+    ASLO4_SERVER_CACHE_SIZE,
+    ASLO4_SERVER_CACHE_STALE_TTL,
+    ASLO4_SERVER_CACHE_TTL,
+    ASLO4_SERVER_UPSTREAM_CONCURRENCY,
+    ASLO4_SERVER_UPSTREAM_TIMEOUT,
+    RDF_HEADERS,
+)
+from local_api import open_local_api
+from updates import get_batch_response, get_upstream_request, parse_batch_request
+from upstream import UpstreamError
+from upstream_async import AsyncConnectionPool, AsyncUpstreamCache
+
+logger = logging.getLogger("aslo4-server")
+
+connection_pool = AsyncConnectionPool(
+    max_concurrency=ASLO4_SERVER_UPSTREAM_CONCURRENCY,
+    timeout=ASLO4_SERVER_UPSTREAM_TIMEOUT,
+)
+upstream_cache = AsyncUpstreamCache(
+    connection_pool.get,
+    max_entries=ASLO4_SERVER_CACHE_SIZE,
+    ttl=ASLO4_SERVER_CACHE_TTL,
+    stale_ttl=ASLO4_SERVER_CACHE_STALE_TTL,
+    negative_ttl=ASLO4_SERVER_CACHE_NEGATIVE_TTL,
+)
+
+rdf_directory = None
+if ASLO4_SERVER_API_DIRECTORY:
+    rdf_directory = open_local_api(
+        ASLO4_SERVER_API_DIRECTORY, reload_interval=ASLO4_SERVER_API_RELOAD_INTERVAL
+    )
+# reload of rdf_directory in progress
+_rdf_directory_reload = None
+
+
+def get_local_rdf(bundle_id):
+    """
+    Returns the RDF of the bundle from rdf_directory. Reloading it reads
+    the disk, so it runs in a thread of the default executor, while the
+    requests are answered from the RDFs already loaded
+    :rtype: Union[local_api.RdfFile, update_index.IndexedUpdate, None]
+    """
+    global _rdf_directory_reload
+    if rdf_directory.is_reload_due() and (
+        _rdf_directory_reload is None or _rdf_directory_reload.done()
+    ):
+        _rdf_directory_reload = asyncio.get_running_loop().run_in_executor(
+            None, rdf_directory.reload_if_due
+        )
+    return rdf_directory.get(bundle_id, reload=False)
+
+
+async def _respond(send, status, body, content_type, headers=()):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"access-control-allow-origin", b"*"),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _is_not_modified(request_headers, rdf):
+    """
+    Returns True if the client already has the RDF, according to the
+    If-None-Match or If-Modified-Since headers of the request
+    """
+    if_none_match = request_headers.get(b"if-none-match")
+    if if_none_match is not None:
+        for etag in if_none_match.decode("latin-1").split(","):
+            etag = etag.strip()
+            if etag.startswith("W/"):
+                etag = etag[2:]
+            if etag in ("*", f'"{rdf.etag}"'):
+                return True
+        return False
+    if_modified_since = request_headers.get(b"if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = email.utils.parsedate_to_datetime(
+                if_modified_since.decode("latin-1")
+            )
+        except (TypeError, ValueError):
+            return False
+        return int(rdf.last_modified) <= since.timestamp()
+    return False
+
+
+async def update_aslo(scope, receive, send):
+    query = urllib.parse.parse_qs(scope["query_string"].decode("latin-1"))
+    bundle_id = query.get("id", [None])[0]
+    app_version = query.get("appVersion", [None])[0]
+    try:
+        app_version_number = float(app_version)
+    except (TypeError, ValueError):
+        await _respond(send, 200, RDF_HEADERS.encode("utf-8"), "text/xml")
+        return
+
+    if app_version_number < ASLO4_MIN_APP_VERSION:
+        # the answer of ASLOv1 depends on the sugar release
+        key = (bundle_id, f"{app_version_number:.3f}")
+        url = ASLO1_DOMAIN_API_ENDPOINT.format(i=bundle_id, v=app_version)
+    elif rdf_directory is not None:
+        rdf = get_local_rdf(bundle_id)
+        if rdf is None:
+            # the bundle is not published on ASLOv4
+            await _respond(send, 200, RDF_HEADERS.encode("utf-8"), "text/xml")
+            return
+        headers = [
+            (b"etag", f'"{rdf.etag}"'.encode("latin-1")),
+            (
+                b"last-modified",
+                email.utils.formatdate(rdf.last_modified, usegmt=True).encode(
+                    "latin-1"
+                ),
+            ),
+            (b"cache-control", b"no-cache"),
+        ]
+        if _is_not_modified(dict(scope["headers"]), rdf):
+            await _respond(send, 304, b"", "text/xml", headers)
+        else:
+            await _respond(send, 200, rdf.content, "text/xml", headers)
+        return
+    else:
+        key = (bundle_id, "aslo4")
+        url = f"{ASLO4_DOMAIN_API_ENDPOINT}/{bundle_id}.xml"
+
+    try:
+        xml = await upstream_cache.get(key, url)
+    except UpstreamError as e:
+        logger.error(f"Could not fetch an update: {e}")
+        await _respond(send, 502, b"Bad Gateway", "text/plain")
+        return
+    await _respond(send, 200, xml, "text/xml")
+
+
+async def get_update_rdf(bundle_id, app_version):
+    """
+    Returns the update RDF of a bundle, routed by appVersion as
+    update_aslo does
+    :return: None if the bundle has no update RDF
+    :rtype: Union[bytes, None]
+    """
+    if float(app_version) >= ASLO4_MIN_APP_VERSION and rdf_directory is not None:
+        rdf = get_local_rdf(bundle_id)
+        return None if rdf is None else rdf.content
+    key, url = get_upstream_request(bundle_id, app_version)
+    try:
+        return await upstream_cache.get(key, url)
+    except UpstreamError as e:
+        logger.warning(f"Could not fetch an update: {e}")
+        return None
+
+
+async def _read_body(receive, max_size):
+    """
+    Returns the body of the request, None if it is larger than max_size
+    """
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > max_size:
+            return None
+        if not message.get("more_body"):
+            return body
+
+
+async def update_aslo_batch(scope, receive, send):
+    """
+    Checks the updates of many bundles at once, see
+    updates.parse_batch_request for the body of the request. Only the
+    bundles which have a newer version are part of the response
+    """
+    body = await _read_body(receive, ASLO4_SERVER_BATCH_MAX_BODY_SIZE)
+    if body is None:
+        await _respond(send, 413, b"Payload Too Large", "text/plain")
+        return
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    try:
+        app_version, pairs, output_format = parse_batch_request(
+            data, ASLO4_SERVER_BATCH_MAX_BUNDLES
+        )
+    except ValueError as e:
+        await _respond(send, 400, str(e).encode("utf-8"), "text/plain")
+        return
+
+    rdfs = await asyncio.gather(
+        *(get_update_rdf(bundle_id, app_version) for bundle_id, _ in pairs)
+    )
+    body, content_type = get_batch_response(pairs, rdfs, output_format)
+    await _respond(send, 200, body, content_type)
+
+
+async def wake(scope, receive, send):
+    await _respond(send, 200, json.dumps({"pong": "Ok"}).encode(), "application/json")
+
+
+# path: (method, route)
+ROUTES = {
+    "/services/update-aslo.php": ("GET", update_aslo),
+    "/services/update-aslo-batch": ("POST", update_aslo_batch),
+    "/ping": ("GET", wake),
+}
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await connection_pool.open()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await connection_pool.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(scope, receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method, route = ROUTES.get(scope["path"], (None, None))
+    if route is None:
+        await _respond(send, 404, b"Not Found", "text/plain")
+    elif scope["method"] != method:
+        await _respond(send, 405, b"Method Not Allowed", "text/plain")
+    else:
+        await route(scope, receive, send)
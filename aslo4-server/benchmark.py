@@ -0,0 +1,237 @@
+"""
+Compares the Flask (WSGI) and the asyncio (ASGI) update servers.
+
+A local stub answers the upstream update checks after a delay, so that
+the servers spend their time waiting on upstream, as they do in
+production. Every request asks for a different bundle, so none of them
+is answered from the cache.
+
+    python benchmark.py --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import http.server
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+SERVER_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class StubUpstreamHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # the headers and the body are written separately, which would
+    # otherwise wait for the delayed ACK of the client
+    disable_nagle_algorithm = True
+    delay = 0.1
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = f"<xml>{self.path}</xml>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubUpstreamServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 4096
+
+
+def get_free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_stub_upstream(port, delay):
+    StubUpstreamHandler.delay = delay
+    StubUpstreamServer(("127.0.0.1", port), StubUpstreamHandler).serve_forever()
+
+
+def start_stub_upstream(port, delay):
+    # in its own process, so that it does not compete with the load
+    # generator for the GIL
+    process = multiprocessing.Process(
+        target=serve_stub_upstream, args=(port, delay), daemon=True
+    )
+    process.start()
+    return process
+
+
+def get_server_command(name, port, workers, threads):
+    bind = f"127.0.0.1:{port}"
+    if name == "wsgi":
+        return [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--workers",
+            str(workers),
+            "--threads",
+            str(threads),
+            "--backlog",
+            "4096",
+            "--bind",
+            bind,
+            "wsgi:app",
+        ]
+    return [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--workers",
+        str(workers),
+        "--worker-class",
+        "uvicorn.workers.UvicornWorker",
+        "--backlog",
+        "4096",
+        "--bind",
+        bind,
+        "asgi:app",
+    ]
+
+
+async def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not start")
+
+
+async def run_load(base_url, requests, concurrency, timeout):
+    """
+    Sends `requests` update checks, `concurrency` at a time
+    :return: the latencies of the successful requests, and the number
+             of failed ones
+    """
+    latencies = list()
+    errors = 0
+    next_request = iter(range(requests))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=client_timeout
+    ) as session:
+
+        async def worker():
+            nonlocal errors
+            for i in next_request:
+                url = (
+                    f"{base_url}/services/update-aslo.php"
+                    f"?id=org.sugarlabs.Benchmark{i}&appVersion=0.112"
+                )
+                started_at = time.perf_counter()
+                try:
+                    async with session.get(url) as response:
+                        await response.read()
+                        response.raise_for_status()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started_at)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def get_percentile(values, percentile):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+def benchmark(name, upstream_url, args):
+    port = get_free_port()
+    env = dict(
+        os.environ,
+        ASLO1_DOMAIN=upstream_url,
+        ASLO4_DOMAIN=upstream_url,
+        ASLO4_SERVER_UPSTREAM_TIMEOUT=str(args.timeout),
+        ASLO4_SERVER_UPSTREAM_CONCURRENCY=str(args.concurrency),
+    )
+    process = subprocess.Popen(
+        get_server_command(name, port, args.workers, args.threads),
+        cwd=SERVER_DIRECTORY,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_until_ready(f"{base_url}/ping"))
+        started_at = time.perf_counter()
+        latencies, errors = asyncio.run(
+            run_load(base_url, args.requests, args.concurrency, args.timeout * 3)
+        )
+        elapsed = time.perf_counter() - started_at
+    finally:
+        process.terminate()
+        process.wait()
+
+    return {
+        "server": name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "upstream_delay": args.upstream_delay,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(get_percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(get_percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument(
+        "--upstream-delay",
+        type=float,
+        default=0.1,
+        help="Seconds the stub upstream takes to answer",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="Server processes")
+    parser.add_argument(
+        "--threads", type=int, default=4, help="Threads per process of the WSGI server"
+    )
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument(
+        "--servers", nargs="+", choices=("wsgi", "asgi"), default=("wsgi", "asgi")
+    )
+    args = parser.parse_args()
+
+    upstream_port = get_free_port()
+    upstream = start_stub_upstream(upstream_port, args.upstream_delay)
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    try:
+        for name in args.servers:
+            print(json.dumps(benchmark(name, upstream_url, args)), flush=True)
+    finally:
+        upstream.terminate()
+
+
+if __name__ == "__main__":
+    main()
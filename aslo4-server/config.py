@@ -0,0 +1,48 @@
+import os
+
+# domain names
+ASLO4_DOMAIN = os.getenv("ASLO4_DOMAIN") or "https://v4.activities.sugarlabs.org"
+ASLO1_DOMAIN = os.getenv("ASLO1_DOMAIN") or "https://activities.sugarlabs.org"
+
+# api end points
+ASLO4_DOMAIN_API_ENDPOINT = f"{ASLO4_DOMAIN}" + "/api"
+ASLO1_DOMAIN_API_ENDPOINT = (
+    f"{ASLO1_DOMAIN}" + "/services/update-aslo.php?id={i}&appVersion={v}"
+)
+
+# cache of the upstream responses
+ASLO4_SERVER_CACHE_SIZE = int(os.getenv("ASLO4_SERVER_CACHE_SIZE") or 4096)
+ASLO4_SERVER_CACHE_TTL = float(os.getenv("ASLO4_SERVER_CACHE_TTL") or 300)
+ASLO4_SERVER_CACHE_STALE_TTL = float(os.getenv("ASLO4_SERVER_CACHE_STALE_TTL") or 86400)
+# seconds an answer other than 200 OK (e.g. 404) is remembered
+ASLO4_SERVER_CACHE_NEGATIVE_TTL = float(
+    os.getenv("ASLO4_SERVER_CACHE_NEGATIVE_TTL") or 60
+)
+ASLO4_SERVER_UPSTREAM_TIMEOUT = float(os.getenv("ASLO4_SERVER_UPSTREAM_TIMEOUT") or 10)
+
+# output directory of the generator. When set, the RDFs of ASLOv4 are
+# served from its update index, or from its api/ directory, instead of
+# being fetched from ASLO4_DOMAIN
+ASLO4_SERVER_API_DIRECTORY = os.getenv("ASLO4_SERVER_API_DIRECTORY")
+ASLO4_SERVER_API_RELOAD_INTERVAL = float(
+    os.getenv("ASLO4_SERVER_API_RELOAD_INTERVAL") or 5
+)
+
+# maximum number of concurrent fetches of the upstream servers, per
+# process (ASGI) or per batch update check (WSGI)
+ASLO4_SERVER_UPSTREAM_CONCURRENCY = int(
+    os.getenv("ASLO4_SERVER_UPSTREAM_CONCURRENCY") or 100
+)
+
+# maximum number of bundles of a batch update check
+ASLO4_SERVER_BATCH_MAX_BUNDLES = int(os.getenv("ASLO4_SERVER_BATCH_MAX_BUNDLES") or 500)
+# maximum size of the body of a batch update check, in bytes
+ASLO4_SERVER_BATCH_MAX_BODY_SIZE = ASLO4_SERVER_BATCH_MAX_BUNDLES * 1024
+
+# sugar versions from which the activities are served by ASLOv4
+ASLO4_MIN_APP_VERSION = 0.116
+
+# headers for RDF output
+RDF_HEADERS = """<?xml version="1.0"?>
+<RDF:RDF xmlns:RDF="http://www.w3.org/1999/02/22-rdf-syntax-ns#" \
+xmlns:em="http://www.mozilla.org/2004/em-rdf#"></RDF:RDF>"""
@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from update_index import UPDATE_INDEX_FILE_NAME, UpdateIndex
+
+logger = logging.getLogger("aslo4-server")
+
+
+class RdfFile:
+    """
+    An RDF of the api/ directory, held in memory
+    """
+
+    __slots__ = ("content", "etag", "last_modified", "signature")
+
+    def __init__(self, content, last_modified, signature):
+        self.content = content
+        self.etag = hashlib.sha256(content).hexdigest()[:32]
+        self.last_modified = last_modified
+        self.signature = signature
+
+
+class RdfDirectory:
+    """
+    Serves the RDFs written by the generator to <output directory>/api/
+    from memory. Every RDF is loaded when the directory is opened, and
+    the files which were added, changed or removed since are reloaded at
+    most every `reload_interval` seconds, when an RDF is requested
+    """
+
+    def __init__(self, output_dir, reload_interval=5):
+        """
+        :param output_dir: output directory of the generator
+        :type output_dir: str
+        :param reload_interval: seconds between two checks for changes
+        :type reload_interval: float
+        """
+        self.api_dir = os.path.join(output_dir, "api")
+        self.reload_interval = reload_interval
+        self._files = dict()
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """
+        Loads the RDFs which changed since the last reload
+        :return: None
+        :rtype: None
+        """
+        files = dict()
+        changed = 0
+        try:
+            entries = list(os.scandir(self.api_dir))
+        except FileNotFoundError:
+            logger.warning(f"{self.api_dir} does not exist")
+            entries = []
+        for entry in entries:
+            if not entry.name.endswith(".xml") or not entry.is_file():
+                continue
+            bundle_id = entry.name[: -len(".xml")]
+            stat = entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            rdf = self._files.get(bundle_id)
+            if rdf is None or rdf.signature != signature:
+                try:
+                    with open(entry.path, "rb") as fp:
+                        content = fp.read()
+                except OSError:
+                    # removed while it was being read
+                    continue
+                rdf = RdfFile(content, stat.st_mtime, signature)
+                changed += 1
+            files[bundle_id] = rdf
+        if changed or len(files) != len(self._files):
+            logger.info(f"{len(files)} RDFs loaded from {self.api_dir}")
+        # readers keep using the previous dict until it is swapped
+        self._files = files
+        self._checked_at = time.monotonic()
+
+    def is_reload_due(self):
+        """
+        Returns True if the directory was last checked for changes more
+        than `reload_interval` seconds ago
+        :rtype: bool
+        """
+        return time.monotonic() - self._checked_at > self.reload_interval
+
+    def reload_if_due(self):
+        """
+        Reloads the RDFs which changed, if it is due and no other thread
+        is reloading them
+        :return: None
+        :rtype: None
+        """
+        # one request reloads, the others keep serving the loaded RDFs
+        if self.is_reload_due() and self._lock.acquire(blocking=False):
+            try:
+                self.reload()
+            finally:
+                self._lock.release()
+
+    def get(self, bundle_id, reload=True):
+        """
+        Returns the RDF of the bundle
+        :param bundle_id: bundle id
+        :type bundle_id: str
+        :param reload: reload the RDFs which changed first, if it is due
+        :type reload: bool
+        :return: None if there is no RDF for the bundle
+        :rtype: Union[RdfFile, None]
+        """
+        if reload:
+            self.reload_if_due()
+        return self._files.get(bundle_id)
+
+
+class LocalApi:
+    """
+    The RDFs of the output directory of the generator: its binary update
+    index if it has one, else its api/ directory. While the RDFs are
+    served from the api/ directory, the output directory is checked for
+    an update index every `reload_interval` seconds, so that a server
+    started before the first build which writes the index switches to
+    it without a restart
+    """
+
+    def __init__(self, output_dir, reload_interval=5):
+        """
+        :param output_dir: output directory of the generator
+        :type output_dir: str
+        :param reload_interval: seconds between two checks for changes
+        :type reload_interval: float
+        """
+        self.output_dir = output_dir
+        self.reload_interval = reload_interval
+        self.index_path = os.path.join(output_dir, UPDATE_INDEX_FILE_NAME)
+        if os.path.exists(self.index_path):
+            self.source = UpdateIndex(output_dir, reload_interval=reload_interval)
+        else:
+            self.source = RdfDirectory(output_dir, reload_interval=reload_interval)
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _open_update_index(self):
+        """
+        Switches to the update index, if it was written since the last
+        check
+        :return: None
+        :rtype: None
+        """
+        self._checked_at = time.monotonic()
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            self.source = UpdateIndex(
+                self.output_dir, reload_interval=self.reload_interval
+            )
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not open {self.index_path}: {e}")
+
+    def _is_index_check_due(self):
+        return (
+            isinstance(self.source, RdfDirectory)
+            and time.monotonic() - self._checked_at > self.reload_interval
+        )
+
+    def is_reload_due(self):
+        """
+        Returns True if the output directory should be checked for an
+        update index, or the source for changes
+        :rtype: bool
+        """
+        return self._is_index_check_due() or self.source.is_reload_due()
+
+    def reload_if_due(self):
+        """
+        Switches to the update index if it was written, and reloads the
+        changes of the source, if it is due and no other thread is
+        reloading them
+        :return: None
+        :rtype: None
+        """
+        if self._is_index_check_due() and self._lock.acquire(blocking=False):
+            try:
+                self._open_update_index()
+            finally:
+                self._lock.release()
+        self.source.reload_if_due()
+
+    def get(self, bundle_id, reload=True):
+        """
+        Returns the RDF of the bundle
+        :param bundle_id: bundle id
+        :type bundle_id: str
+        :param reload: reload the changes first, if it is due
+        :type reload: bool
+        :return: None if there is no RDF for the bundle
+        :rtype: Union[RdfFile, IndexedUpdate, None]
+        """
+        if reload:
+            self.reload_if_due()
+        return self.source.get(bundle_id, reload=False)
+
+
+def open_local_api(output_dir, reload_interval=5):
+    """
+    Returns the RDFs of the output directory of the generator, see
+    LocalApi
+    :param output_dir: output directory of the generator
+    :type output_dir: str
+    :param reload_interval: seconds between two checks for changes
+    :type reload_interval: float
+    :rtype: LocalApi
+    """
+    return LocalApi(output_dir, reload_interval=reload_interval)
@@ -0,0 +1,178 @@
+"""
+Tests of the update server, against a local stub of the upstream servers:
+    python3 -m pytest aslo4-server/tests
+"""
+
+import asyncio
+import http.server
+import os
+import sys
+import threading
+import time
+import uuid
+
+import pytest
+
+SERVER_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the modules of the server are imported as top level modules, as they are
+# by gunicorn and uvicorn, and the generator for its update index
+sys.path.insert(0, SERVER_DIRECTORY)
+sys.path.insert(1, os.path.dirname(SERVER_DIRECTORY))
+
+from aslo4.rdf.index import write_update_index  # noqa: E402
+from aslo4.rdf.rdf import RDF  # noqa: E402
+
+
+class StubResponse:
+    """
+    What the stub upstream answers for a path
+    """
+
+    def __init__(self, body=b"", status=200, location=None, delay=0):
+        self.body = body
+        self.status = status
+        self.location = location
+        self.delay = delay
+
+
+class StubUpstreamHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.hits.append(self.path)
+            stub.connections.add(self.client_address)
+            response = stub.responses.get(self.path, StubResponse(status=404))
+        time.sleep(response.delay)
+        self.send_response(response.status)
+        if response.location is not None:
+            self.send_header("Location", response.location)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(response.body)))
+        self.end_headers()
+        self.wfile.write(response.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubUpstream:
+    """
+    A local HTTP server standing for ASLOv1 and ASLOv4. Every request is
+    recorded in `hits`, and the client address of its connection in
+    `connections`
+    """
+
+    def __init__(self):
+        self.responses = dict()
+        self.hits = list()
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), StubUpstreamHandler
+        )
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+
+    def set(self, path, *args, **kwargs):
+        with self.lock:
+            self.responses[path] = StubResponse(*args, **kwargs)
+
+    def count(self, path):
+        with self.lock:
+            return self.hits.count(path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    stub = StubUpstream()
+    yield stub
+    stub.close()
+
+
+def wait_for(predicate, timeout=5):
+    """
+    Waits until predicate() is true, for the background revalidations
+    """
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def make_update(bundle_id, version="1"):
+    """
+    Returns the update of a bundle, as aslo4.rdf.rdf.RDF.get_update does
+    """
+    sha256 = uuid.uuid5(uuid.NAMESPACE_URL, bundle_id).hex * 2
+    return {
+        "bundle_id": bundle_id,
+        "version": version,
+        "uuid": uuid.uuid5(uuid.NAMESPACE_URL, f"{bundle_id}:{version}:{sha256}"),
+        "min_version": "0.116",
+        "max_version": "0.120",
+        "update_link": f"https://example.org/bundles/{bundle_id}-{version}.xo",
+        "update_size": 42,
+        "update_info": f"https://example.org/app/{bundle_id}.html",
+        "sha256": sha256,
+    }
+
+
+def render_rdf(update):
+    """
+    Returns the RDF the generator writes to api/ for an update
+    """
+    # parse only needs the RDF instance to compute the update itself
+    return RDF.__new__(RDF).parse(update)
+
+
+def write_output_dir(output_dir, updates, index=False):
+    """
+    Writes the api/ directory of the updates, as the generator does, and
+    the binary update index if `index`
+    """
+    api_dir = os.path.join(output_dir, "api")
+    os.makedirs(api_dir, exist_ok=True)
+    for update in updates:
+        with open(os.path.join(api_dir, f"{update['bundle_id']}.xml"), "w") as fp:
+            fp.write(render_rdf(update))
+    if index:
+        write_update_index(os.path.join(output_dir, "update-index.bin"), updates)
+
+
+def call_asgi(app, method, path, query_string=b"", headers=(), body=b""):
+    """
+    Sends a request to an ASGI application
+    :return: Tuple (status, headers, body) of the response
+    :rtype: tuple
+    """
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": list(headers),
+    }
+    messages = list()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start, response_body = messages
+    return start["status"], dict(start["headers"]), response_body["body"]
@@ -0,0 +1,62 @@
+import pytest
+
+import app as server
+from upstream import ConnectionPool, UpstreamCache
+
+
+@pytest.fixture
+def client(upstream, monkeypatch):
+    monkeypatch.setattr(server, "ASLO4_DOMAIN_API_ENDPOINT", f"{upstream.url}/api")
+    monkeypatch.setattr(
+        server,
+        "ASLO1_DOMAIN_API_ENDPOINT",
+        upstream.url + "/services/update-aslo.php?id={i}&appVersion={v}",
+    )
+    monkeypatch.setattr(
+        server, "upstream_cache", UpstreamCache(ConnectionPool(timeout=5).get)
+    )
+    monkeypatch.setattr(server, "rdf_directory", None)
+    return server.app.test_client()
+
+
+def test_aslo4_update_is_cached(client, upstream):
+    upstream.set("/api/org.sugarlabs.Foo.xml", b"<RDF/>")
+    for _ in range(3):
+        response = client.get(
+            "/services/update-aslo.php?id=org.sugarlabs.Foo&appVersion=0.118"
+        )
+        assert response.status_code == 200
+        assert response.data == b"<RDF/>"
+        assert response.headers["Access-Control-Allow-Origin"] == "*"
+    assert upstream.count("/api/org.sugarlabs.Foo.xml") == 1
+
+
+def test_aslo1_update_is_cached_by_sugar_release(client, upstream):
+    for version in ("0.110", "0.112"):
+        upstream.set(
+            f"/services/update-aslo.php?id=org.sugarlabs.Foo&appVersion={version}",
+            version.encode(),
+        )
+    for version in ("0.110", "0.112", "0.110"):
+        response = client.get(
+            f"/services/update-aslo.php?id=org.sugarlabs.Foo&appVersion={version}"
+        )
+        assert response.data == version.encode()
+    assert len(upstream.hits) == 2
+
+
+def test_invalid_app_version(client, upstream):
+    response = client.get("/services/update-aslo.php?id=org.sugarlabs.Foo&appVersion=x")
+    assert response.status_code == 200
+    assert response.data.decode() == server.RDF_HEADERS
+    assert upstream.hits == []
+
+
+def test_upstream_error_is_a_bad_gateway(client, upstream):
+    url = "/services/update-aslo.php?id=org.sugarlabs.Missing&appVersion=0.118"
+    for _ in range(3):
+        response = client.get(url)
+        assert response.status_code == 502
+        assert response.headers["Access-Control-Allow-Origin"] == "*"
+    # the 404 of upstream is remembered
+    assert upstream.count("/api/org.sugarlabs.Missing.xml") == 1
@@ -0,0 +1,148 @@
+import json
+
+import pytest
+
+import app as server
+import asgi
+from conftest import call_asgi, make_update, render_rdf, write_output_dir
+from local_api import LocalApi
+from updates import (
+    get_batch_response,
+    get_newest_update,
+    parse_batch_request,
+    parse_version,
+)
+from upstream import ConnectionPool, UpstreamCache
+
+BATCH_URL = "/services/update-aslo-batch"
+
+
+@pytest.fixture
+def local_api(tmp_path, monkeypatch):
+    write_output_dir(
+        str(tmp_path),
+        [make_update("org.sugarlabs.Foo", "3"), make_update("org.x.Bar", "7")],
+    )
+    local_api = LocalApi(str(tmp_path), reload_interval=0)
+    monkeypatch.setattr(server, "rdf_directory", local_api)
+    monkeypatch.setattr(asgi, "rdf_directory", local_api)
+    return local_api
+
+
+def test_parse_version():
+    assert parse_version("12") == (12,)
+    assert parse_version("1.2.3-beta") == (1, 2, 3)
+    assert parse_version("beta") is None
+    assert parse_version("10") > parse_version("9")
+
+
+def test_get_newest_update():
+    update = get_newest_update(render_rdf(make_update("org.sugarlabs.Foo", "3")))
+    assert update["version"] == "3"
+    assert update["link"] == "https://example.org/bundles/org.sugarlabs.Foo-3.xo"
+    assert update["size"] == "42"
+    assert get_newest_update(b"not xml") is None
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        None,
+        {"appVersion": "x", "bundles": []},
+        {"appVersion": "0.118", "bundles": "org.sugarlabs.Foo"},
+        {"appVersion": "0.118", "bundles": [["org.sugarlabs.Foo"]]},
+        {"appVersion": "0.118", "bundles": [], "format": "yaml"},
+        {"appVersion": "0.118", "bundles": [["a", "1"]] * 3},
+    ],
+)
+def test_invalid_batch_requests(data):
+    with pytest.raises(ValueError):
+        parse_batch_request(data, max_bundles=2)
+
+
+def test_parse_batch_request():
+    assert parse_batch_request(
+        {
+            "appVersion": 0.118,
+            "bundles": [{"id": "org.sugarlabs.Foo", "version": 2}, ["org.x.Bar", "7"]],
+        },
+        max_bundles=2,
+    ) == ("0.118", [("org.sugarlabs.Foo", "2"), ("org.x.Bar", "7")], "rdf")
+
+
+def test_only_newer_versions_are_returned():
+    pairs = [("org.sugarlabs.Foo", "2"), ("org.x.Bar", "7"), ("org.x.Baz", "1")]
+    rdfs = [
+        render_rdf(make_update("org.sugarlabs.Foo", "3")),
+        render_rdf(make_update("org.x.Bar", "7")),
+        None,
+    ]
+    body, mimetype = get_batch_response(pairs, rdfs, "json")
+    assert mimetype == "application/json"
+    assert [x["id"] for x in json.loads(body)["updates"]] == ["org.sugarlabs.Foo"]
+
+    body, mimetype = get_batch_response(pairs, rdfs, "rdf")
+    assert mimetype == "text/xml"
+    assert get_newest_update(body)["version"] == "3"
+    assert b"org.x.Bar" not in body
+
+
+def test_wsgi_batch(local_api):
+    response = server.app.test_client().post(
+        BATCH_URL,
+        json={
+            "appVersion": "0.118",
+            "bundles": [["org.sugarlabs.Foo", "2"], ["org.x.Bar", "7"]],
+            "format": "json",
+        },
+    )
+    assert response.status_code == 200
+    updates = response.get_json()["updates"]
+    assert [(x["id"], x["version"]) for x in updates] == [("org.sugarlabs.Foo", "3")]
+
+
+def test_wsgi_batch_invalid_request(local_api):
+    response = server.app.test_client().post(BATCH_URL, data=b"not json")
+    assert response.status_code == 400
+
+
+def test_wsgi_batch_routes_old_sugar_to_aslo1(upstream, monkeypatch):
+    monkeypatch.setattr(
+        server, "upstream_cache", UpstreamCache(ConnectionPool(timeout=5).get)
+    )
+    monkeypatch.setattr(
+        "updates.ASLO1_DOMAIN_API_ENDPOINT",
+        upstream.url + "/services/update-aslo.php?id={i}&appVersion={v}",
+    )
+    upstream.set(
+        "/services/update-aslo.php?id=org.sugarlabs.Foo&appVersion=0.110",
+        render_rdf(make_update("org.sugarlabs.Foo", "3")).encode(),
+    )
+    response = server.app.test_client().post(
+        BATCH_URL,
+        json={
+            "appVersion": "0.110",
+            "bundles": [["org.sugarlabs.Foo", "2"], ["org.x.Missing", "1"]],
+            "format": "json",
+        },
+    )
+    assert response.status_code == 200
+    assert [x["id"] for x in response.get_json()["updates"]] == ["org.sugarlabs.Foo"]
+    assert len(upstream.hits) == 2
+
+
+def test_asgi_batch(local_api):
+    status, headers, body = call_asgi(
+        asgi.app,
+        "POST",
+        BATCH_URL,
+        body=json.dumps(
+            {
+                "appVersion": "0.118",
+                "bundles": [["org.sugarlabs.Foo", "3"], ["org.x.Bar", "6"]],
+            }
+        ).encode(),
+    )
+    assert status == 200
+    assert headers[b"content-type"] == b"text/xml"
+    assert get_newest_update(body)["version"] == "7"
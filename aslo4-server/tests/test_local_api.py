@@ -0,0 +1,132 @@
+import email.utils
+import os
+import threading
+
+import pytest
+
+import app as server
+import asgi
+from conftest import call_asgi, make_update, render_rdf, write_output_dir
+from local_api import LocalApi, RdfDirectory
+from update_index import UpdateIndex
+
+UPDATE_URL = "/services/update-aslo.php"
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    write_output_dir(
+        str(tmp_path), [make_update("org.sugarlabs.Foo"), make_update("org.x.Bar")]
+    )
+    return str(tmp_path)
+
+
+@pytest.fixture
+def local_api(output_dir, monkeypatch):
+    local_api = LocalApi(output_dir, reload_interval=0)
+    monkeypatch.setattr(server, "rdf_directory", local_api)
+    monkeypatch.setattr(asgi, "rdf_directory", local_api)
+    return local_api
+
+
+def test_rdfs_are_loaded(output_dir):
+    rdfs = RdfDirectory(output_dir)
+    rdf = rdfs.get("org.sugarlabs.Foo")
+    assert rdf.content == render_rdf(make_update("org.sugarlabs.Foo")).encode()
+    assert rdfs.get("org.sugarlabs.Missing") is None
+
+
+def test_rdfs_are_reloaded(output_dir):
+    rdfs = RdfDirectory(output_dir, reload_interval=0)
+    etag = rdfs.get("org.sugarlabs.Foo").etag
+    write_output_dir(output_dir, [make_update("org.sugarlabs.Foo", "10")])
+    os.remove(os.path.join(output_dir, "api", "org.x.Bar.xml"))
+    assert rdfs.get("org.sugarlabs.Foo").etag != etag
+    assert rdfs.get("org.x.Bar") is None
+
+
+def test_switches_to_the_update_index(output_dir):
+    local_api = LocalApi(output_dir, reload_interval=0)
+    assert isinstance(local_api.source, RdfDirectory)
+    write_output_dir(output_dir, [make_update("org.sugarlabs.Foo", "2")], index=True)
+    assert local_api.get("org.sugarlabs.Foo").version == "2"
+    assert isinstance(local_api.source, UpdateIndex)
+
+
+def test_opens_the_update_index(output_dir):
+    write_output_dir(output_dir, [make_update("org.sugarlabs.Foo")], index=True)
+    assert isinstance(LocalApi(output_dir).source, UpdateIndex)
+
+
+def test_wsgi_etag_and_not_modified(local_api):
+    url = f"{UPDATE_URL}?id=org.sugarlabs.Foo&appVersion=0.118"
+    client = server.app.test_client()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == local_api.get("org.sugarlabs.Foo").content
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    response = client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    response = client.get(url, headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_wsgi_bundle_not_on_aslo4(local_api):
+    response = server.app.test_client().get(
+        f"{UPDATE_URL}?id=org.sugarlabs.Missing&appVersion=0.118"
+    )
+    assert response.status_code == 200
+    assert response.data.decode() == server.RDF_HEADERS
+
+
+def test_asgi_etag_and_not_modified(local_api):
+    query = b"id=org.sugarlabs.Foo&appVersion=0.118"
+    status, headers, body = call_asgi(asgi.app, "GET", UPDATE_URL, query)
+    assert status == 200
+    assert body == local_api.get("org.sugarlabs.Foo").content
+    etag = headers[b"etag"]
+
+    status, _, body = call_asgi(
+        asgi.app, "GET", UPDATE_URL, query, [(b"if-none-match", etag)]
+    )
+    assert (status, body) == (304, b"")
+    last_modified = email.utils.formatdate(
+        local_api.get("org.sugarlabs.Foo").last_modified + 1, usegmt=True
+    )
+    status, _, _ = call_asgi(
+        asgi.app,
+        "GET",
+        UPDATE_URL,
+        query,
+        [(b"if-modified-since", last_modified.encode())],
+    )
+    assert status == 304
+    status, _, _ = call_asgi(
+        asgi.app, "GET", UPDATE_URL, query, [(b"if-none-match", b'"other"')]
+    )
+    assert status == 200
+
+
+def test_asgi_reloads_off_the_event_loop(local_api, output_dir, monkeypatch):
+    reload_threads = list()
+    reload_if_due = local_api.reload_if_due
+
+    def record_reload():
+        reload_threads.append(threading.current_thread())
+        reload_if_due()
+
+    monkeypatch.setattr(local_api, "reload_if_due", record_reload)
+    write_output_dir(output_dir, [make_update("org.sugarlabs.Foo", "10")])
+    query = b"id=org.sugarlabs.Foo&appVersion=0.118"
+    status, _, _ = call_asgi(asgi.app, "GET", UPDATE_URL, query)
+    assert status == 200
+    assert reload_threads
+    assert threading.current_thread() not in reload_threads
+    # the reload finished in the background
+    _, _, body = call_asgi(asgi.app, "GET", UPDATE_URL, query)
+    assert body == render_rdf(make_update("org.sugarlabs.Foo", "10")).encode()
@@ -0,0 +1,61 @@
+import os
+import random
+
+import pytest
+
+from conftest import make_update, render_rdf, write_output_dir
+from update_index import UPDATE_INDEX_FILE_NAME, UpdateIndex
+
+
+@pytest.fixture
+def updates():
+    rng = random.Random(0)
+    bundle_ids = {"org.sugarlabs.Pippy", "org.sugarlabs.Écrire", "a", "z" * 200}
+    while len(bundle_ids) < 300:
+        bundle_ids.add(f"org.{rng.randrange(10 ** 6)}.Activity")
+    return [make_update(x, str(rng.randrange(1, 40))) for x in bundle_ids]
+
+
+def test_updates_are_the_rdfs_of_the_api_directory(tmp_path, updates):
+    write_output_dir(str(tmp_path), updates, index=True)
+    index = UpdateIndex(str(tmp_path))
+    for update in updates:
+        indexed = index.get(update["bundle_id"])
+        assert indexed.version == update["version"]
+        assert indexed.content == render_rdf(update).encode("utf-8")
+
+
+def test_bundles_not_in_the_index(tmp_path, updates):
+    write_output_dir(str(tmp_path), updates, index=True)
+    index = UpdateIndex(str(tmp_path))
+    for bundle_id in ("", "0", "org", "org.sugarlabs.Pippy2", "zz", "￿"):
+        assert index.get(bundle_id) is None
+    assert index.get(None) is None
+
+
+def test_empty_index(tmp_path):
+    write_output_dir(str(tmp_path), [], index=True)
+    assert UpdateIndex(str(tmp_path)).get("org.sugarlabs.Pippy") is None
+
+
+def test_index_is_swapped_when_replaced(tmp_path):
+    write_output_dir(str(tmp_path), [make_update("org.sugarlabs.Pippy", "1")], True)
+    index = UpdateIndex(str(tmp_path), reload_interval=0)
+    old = index.get("org.sugarlabs.Pippy")
+    write_output_dir(str(tmp_path), [make_update("org.sugarlabs.Pippy", "2")], True)
+    assert index.get("org.sugarlabs.Pippy").version == "2"
+    # the updates found before the swap are still valid
+    assert old.version == "1"
+    assert old.etag != index.get("org.sugarlabs.Pippy").etag
+
+
+def test_invalid_index_is_not_swapped(tmp_path):
+    write_output_dir(str(tmp_path), [make_update("org.sugarlabs.Pippy")], True)
+    index = UpdateIndex(str(tmp_path), reload_interval=0)
+    path = os.path.join(str(tmp_path), UPDATE_INDEX_FILE_NAME)
+    with open(f"{path}.new", "wb") as fp:
+        fp.write(b"not an update index")
+    os.replace(f"{path}.new", path)
+    assert index.get("org.sugarlabs.Pippy").version == "1"
+    with pytest.raises(ValueError):
+        UpdateIndex(str(tmp_path))
@@ -0,0 +1,178 @@
+import asyncio
+import concurrent.futures
+import time
+
+import pytest
+
+from conftest import wait_for
+from upstream import ConnectionPool, UpstreamCache, UpstreamError
+from upstream_async import AsyncConnectionPool, AsyncUpstreamCache
+
+
+def make_cache(upstream, **kwargs):
+    return UpstreamCache(ConnectionPool(timeout=5).get, **kwargs)
+
+
+def test_fresh_hit_does_not_reach_upstream(upstream):
+    upstream.set("/api/a.xml", b"<a/>")
+    cache = make_cache(upstream)
+    url = f"{upstream.url}/api/a.xml"
+    assert cache.get(("a", "aslo4"), url) == b"<a/>"
+    assert cache.get(("a", "aslo4"), url) == b"<a/>"
+    assert upstream.count("/api/a.xml") == 1
+
+
+def test_keys_are_cached_separately(upstream):
+    upstream.set("/api/a.xml", b"<a/>")
+    cache = make_cache(upstream)
+    url = f"{upstream.url}/api/a.xml"
+    cache.get(("a", "0.110"), url)
+    cache.get(("a", "0.112"), url)
+    assert upstream.count("/api/a.xml") == 2
+
+
+def test_concurrent_misses_are_coalesced(upstream):
+    upstream.set("/api/a.xml", b"<a/>", delay=0.3)
+    cache = make_cache(upstream)
+    url = f"{upstream.url}/api/a.xml"
+    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as pool:
+        bodies = list(pool.map(lambda _: cache.get(("a", "aslo4"), url), range(20)))
+    assert bodies == [b"<a/>"] * 20
+    assert upstream.count("/api/a.xml") == 1
+
+
+def test_concurrent_misses_share_the_error(upstream):
+    upstream.set("/api/a.xml", status=500, delay=0.3)
+    cache = make_cache(upstream)
+    url = f"{upstream.url}/api/a.xml"
+
+    def get(_):
+        with pytest.raises(UpstreamError):
+            cache.get(("a", "aslo4"), url)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as pool:
+        list(pool.map(get, range(10)))
+    assert upstream.count("/api/a.xml") == 1
+
+
+def test_stale_while_revalidate(upstream):
+    upstream.set("/api/a.xml", b"<v1/>")
+    cache = make_cache(upstream, ttl=0.1, stale_ttl=60)
+    url = f"{upstream.url}/api/a.xml"
+    assert cache.get(("a", "aslo4"), url) == b"<v1/>"
+    time.sleep(0.2)
+    upstream.set("/api/a.xml", b"<v2/>", delay=0.2)
+    # the expired response is served at once, and refreshed in the
+    # background
+    started = time.monotonic()
+    assert cache.get(("a", "aslo4"), url) == b"<v1/>"
+    assert time.monotonic() - started < 0.15
+    wait_for(lambda: cache.get(("a", "aslo4"), url) == b"<v2/>")
+    assert upstream.count("/api/a.xml") == 2
+
+
+def test_stale_on_error(upstream):
+    upstream.set("/api/a.xml", b"<v1/>")
+    cache = make_cache(upstream, ttl=0.05, stale_ttl=0)
+    url = f"{upstream.url}/api/a.xml"
+    assert cache.get(("a", "aslo4"), url) == b"<v1/>"
+    time.sleep(0.1)
+    upstream.set("/api/a.xml", status=503)
+    assert cache.get(("a", "aslo4"), url) == b"<v1/>"
+    assert upstream.count("/api/a.xml") == 2
+
+
+def test_error_without_cached_response(upstream):
+    cache = make_cache(upstream)
+    with pytest.raises(UpstreamError) as e:
+        cache.get(("a", "aslo4"), f"{upstream.url}/api/a.xml")
+    assert e.value.status == 404
+
+
+def test_unreachable_upstream():
+    cache = UpstreamCache(ConnectionPool(timeout=1).get)
+    with pytest.raises(UpstreamError) as e:
+        # nothing listens on the discard port
+        cache.get(("a", "aslo4"), "http://127.0.0.1:9/api/a.xml")
+    assert e.value.status is None
+
+
+def test_failures_are_cached_for_negative_ttl(upstream):
+    cache = make_cache(upstream, negative_ttl=0.2)
+    url = f"{upstream.url}/api/a.xml"
+    for _ in range(5):
+        with pytest.raises(UpstreamError) as e:
+            cache.get(("a", "aslo4"), url)
+        assert e.value.status == 404
+    assert upstream.count("/api/a.xml") == 1
+    time.sleep(0.3)
+    upstream.set("/api/a.xml", b"<a/>")
+    assert cache.get(("a", "aslo4"), url) == b"<a/>"
+    assert upstream.count("/api/a.xml") == 2
+
+
+def test_lru_eviction(upstream):
+    for name in "abc":
+        upstream.set(f"/api/{name}.xml", name.encode())
+    cache = make_cache(upstream, max_entries=2)
+    for name in "abc":
+        cache.get((name, "aslo4"), f"{upstream.url}/api/{name}.xml")
+    cache.get(("a", "aslo4"), f"{upstream.url}/api/a.xml")
+    assert upstream.count("/api/a.xml") == 2
+    cache.get(("c", "aslo4"), f"{upstream.url}/api/c.xml")
+    assert upstream.count("/api/c.xml") == 1
+
+
+def test_redirects_are_followed(upstream):
+    upstream.set("/old.xml", status=301, location="/api/a.xml")
+    upstream.set("/api/a.xml", b"<a/>")
+    pool = ConnectionPool(timeout=5)
+    assert pool.get(f"{upstream.url}/old.xml") == b"<a/>"
+    assert upstream.hits == ["/old.xml", "/api/a.xml"]
+
+
+def test_redirect_loops_are_errors(upstream):
+    upstream.set("/loop.xml", status=302, location="/loop.xml")
+    with pytest.raises(UpstreamError):
+        ConnectionPool(timeout=5).get(f"{upstream.url}/loop.xml")
+
+
+def test_connections_are_kept_alive(upstream):
+    upstream.set("/api/a.xml", b"<a/>")
+    upstream.set("/api/b.xml", b"<b/>")
+    pool = ConnectionPool(timeout=5)
+    pool.get(f"{upstream.url}/api/a.xml")
+    pool.get(f"{upstream.url}/api/b.xml")
+    assert len(upstream.connections) == 1
+
+
+def test_async_failures_are_cached_for_negative_ttl(upstream):
+    async def check():
+        pool = AsyncConnectionPool(timeout=5)
+        await pool.open()
+        try:
+            cache = AsyncUpstreamCache(pool.get, negative_ttl=60)
+            url = f"{upstream.url}/api/a.xml"
+            for _ in range(5):
+                with pytest.raises(UpstreamError) as e:
+                    await cache.get(("a", "aslo4"), url)
+                assert e.value.status == 404
+        finally:
+            await pool.close()
+
+    asyncio.run(check())
+    assert upstream.count("/api/a.xml") == 1
+
+
+def test_async_pool_opens_without_lifespan(upstream):
+    upstream.set("/api/a.xml", b"<a/>")
+
+    async def check():
+        # as with uvicorn --lifespan off
+        pool = AsyncConnectionPool(timeout=5)
+        try:
+            return await pool.get(f"{upstream.url}/api/a.xml")
+        finally:
+            await pool.close()
+
+    assert asyncio.run(check()) == b"<a/>"
@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("aslo4-server")
+
+# the binary update index written by the generator, see aslo4/rdf/index.py
+UPDATE_INDEX_FILE_NAME = "update-index.bin"
+UPDATE_INDEX_MAGIC = b"ASLOUIDX"
+UPDATE_INDEX_VERSION = 1
+UPDATE_INDEX_HEADER = struct.Struct("<8sII")
+UPDATE_INDEX_RECORD = struct.Struct("<III32s16s")
+# strings offset and length, the start of a record
+UPDATE_INDEX_RECORD_STRINGS = struct.Struct("<II")
+
+# same as aslo4.rdf.rdf.RDF_TEMPLATE, so that the RDFs are the same as
+# the ones of the api/ directory
+UPDATE_RDF_TEMPLATE = """<?xml version="1.0"?>
+<RDF:RDF xmlns:RDF="http://www.w3.org/1999/02/22-rdf-syntax-ns#" \
+xmlns:em="http://www.mozilla.org/2004/em-rdf#">
+    <RDF:Description about="urn:mozilla:extension:{bundle_id}">
+        <em:updates>
+            <RDF:Seq>
+                <RDF:li resource=\
+"urn:mozilla:extension:{bundle_id}:{version}"/>
+            </RDF:Seq>
+        </em:updates>
+    </RDF:Description>
+    <RDF:Description about="urn:mozilla:extension:{bundle_id}:{version}">
+        <em:version>{version}</em:version>
+        <em:targetApplication>
+            <RDF:Description>
+                <em:id>{{{uuid}}}</em:id>
+                <em:minVersion>{min_version}</em:minVersion>
+                <em:maxVersion>{max_version}</em:maxVersion>
+                <em:updateLink>{update_link}</em:updateLink>
+                <em:updateSize>{update_size}</em:updateSize>
+                <em:updateInfoURL>{update_info}</em:updateInfoURL>
+                <em:updateHash>sha256:{sha256}</em:updateHash>
+            </RDF:Description>
+        </em:targetApplication>
+    </RDF:Description>
+</RDF:RDF>"""
+
+
+class IndexedUpdate:
+    """
+    An update of the update index, served like local_api.RdfFile
+    """
+
+    __slots__ = ("content", "etag", "last_modified", "version")
+
+    def __init__(self, record, strings, last_modified):
+        _, _, update_size, sha256, update_uuid = record
+        (
+            bundle_id,
+            version,
+            min_version,
+            max_version,
+            update_link,
+            update_info,
+        ) = strings.decode("utf-8").split("\0")
+        self.version = version
+        self.content = UPDATE_RDF_TEMPLATE.format(
+            bundle_id=bundle_id,
+            version=version,
+            uuid=uuid.UUID(bytes=update_uuid),
+            min_version=min_version,
+            max_version=max_version,
+            update_link=update_link,
+            update_size=update_size,
+            update_info=update_info,
+            sha256=sha256.hex(),
+        ).encode("utf-8")
+        self.etag = hashlib.sha256(self.content).hexdigest()[:32]
+        self.last_modified = last_modified
+
+
+class _MappedIndex:
+    """
+    An update index mapped in memory. The pages of the file are shared
+    by all the processes which map it
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fp:
+            stat = os.fstat(fp.fileno())
+            if stat.st_size < UPDATE_INDEX_HEADER.size:
+                raise ValueError(f"{path} is not an update index")
+            self.mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = UPDATE_INDEX_HEADER.unpack_from(self.mapping)
+        if magic != UPDATE_INDEX_MAGIC or version != UPDATE_INDEX_VERSION:
+            raise ValueError(
+                f"{path} is not a version {UPDATE_INDEX_VERSION} update index"
+            )
+        self.strings_start = (
+            UPDATE_INDEX_HEADER.size + self.count * UPDATE_INDEX_RECORD.size
+        )
+        self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self.last_modified = stat.st_mtime
+
+    def _get_record_offset(self, i):
+        return UPDATE_INDEX_HEADER.size + i * UPDATE_INDEX_RECORD.size
+
+    def find(self, bundle_id):
+        """
+        Binary searches the record of a bundle
+        :return: None if the bundle is not in the index
+        :rtype: Union[IndexedUpdate, None]
+        """
+        key = bundle_id.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset, length = UPDATE_INDEX_RECORD_STRINGS.unpack_from(
+                self.mapping, self._get_record_offset(middle)
+            )
+            start = self.strings_start + offset
+            strings_end = start + length
+            end = self.mapping.find(b"\0", start, strings_end)
+            candidate = self.mapping[start:end]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                record = UPDATE_INDEX_RECORD.unpack_from(
+                    self.mapping, self._get_record_offset(middle)
+                )
+                return IndexedUpdate(
+                    record,
+                    self.mapping[start:strings_end],
+                    self.last_modified,
+                )
+        return None
+
+
+class UpdateIndex:
+    """
+    Answers update checks from the binary update index written by the
+    generator to <output directory>/update-index.bin, instead of keeping
+    every RDF in memory. The generator replaces the index atomically;
+    the new index is mapped at most `reload_interval` seconds later,
+    while the requests in progress finish with the old one
+    """
+
+    def __init__(self, output_dir, reload_interval=5):
+        """
+        :param output_dir: output directory of the generator
+        :type output_dir: str
+        :param reload_interval: seconds between two checks for changes
+        :type reload_interval: float
+        """
+        self.path = os.path.join(output_dir, UPDATE_INDEX_FILE_NAME)
+        self.reload_interval = reload_interval
+        self._index = _MappedIndex(self.path)
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        logger.info(f"{self._index.count} updates mapped from {self.path}")
+
+    def reload(self):
+        """
+        Maps the index again if it was replaced
+        :return: None
+        :rtype: None
+        """
+        try:
+            stat = os.stat(self.path)
+            if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self._index.signature:
+                # the old mapping is closed once the requests using it
+                # release it
+                self._index = _MappedIndex(self.path)
+                logger.info(f"{self._index.count} updates mapped from {self.path}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not reload {self.path}: {e}")
+        self._checked_at = time.monotonic()
+
+    def is_reload_due(self):
+        """
+        Returns True if the index was last checked for changes more than
+        `reload_interval` seconds ago
+        :rtype: bool
+        """
+        return time.monotonic() - self._checked_at > self.reload_interval
+
+    def reload_if_due(self):
+        """
+        Maps the index again if it was replaced, if it is due and no
+        other thread is reloading it
+        :return: None
+        :rtype: None
+        """
+        if self.is_reload_due() and self._lock.acquire(blocking=False):
+            try:
+                self.reload()
+            finally:
+                self._lock.release()
+
+    def get(self, bundle_id, reload=True):
+        """
+        Returns the RDF of the bundle
+        :param bundle_id: bundle id
+        :type bundle_id: str
+        :param reload: map the index again first if it was replaced, if
+        it is due
+        :type reload: bool
+        :return: None if the bundle is not in the index
+        :rtype: Union[IndexedUpdate, None]
+        """
+        if reload:
+            self.reload_if_due()
+        if bundle_id is None:
+            return None
+        return self._index.find(bundle_id)
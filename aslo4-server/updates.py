@@ -0,0 +1,209 @@
+import json
+import re
+import xml.etree.ElementTree as ElementTree
+
+from config import (
+    ASLO1_DOMAIN_API_ENDPOINT,
+    ASLO4_DOMAIN_API_ENDPOINT,
+    ASLO4_MIN_APP_VERSION,
+)
+
+RDF_NAMESPACE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+EM_NAMESPACE = "http://www.mozilla.org/2004/em-rdf#"
+
+ElementTree.register_namespace("RDF", RDF_NAMESPACE)
+ElementTree.register_namespace("em", EM_NAMESPACE)
+
+_VERSION_REGEX = re.compile(r"^\d+(\.\d+)*")
+
+# fields of the targetApplication of an update, by their key in JSON
+_UPDATE_FIELDS = {
+    "link": "updateLink",
+    "size": "updateSize",
+    "hash": "updateHash",
+    "info_url": "updateInfoURL",
+    "min_version": "minVersion",
+    "max_version": "maxVersion",
+}
+
+BATCH_FORMATS = ("rdf", "json")
+
+
+def get_upstream_request(bundle_id, app_version):
+    """
+    Returns the cache key and the url of the update RDF of a bundle.
+    Sugar releases older than ASLO4_MIN_APP_VERSION are answered by
+    ASLOv1, whose answer depends on the release
+    :param bundle_id: bundle id
+    :type bundle_id: str
+    :param app_version: appVersion, as sent by sugar
+    :type app_version: str
+    :return: Tuple (key, url)
+    :rtype: tuple
+    """
+    if float(app_version) < ASLO4_MIN_APP_VERSION:
+        return (
+            (bundle_id, f"{float(app_version):.3f}"),
+            ASLO1_DOMAIN_API_ENDPOINT.format(i=bundle_id, v=app_version),
+        )
+    return (bundle_id, "aslo4"), f"{ASLO4_DOMAIN_API_ENDPOINT}/{bundle_id}.xml"
+
+
+def parse_version(version):
+    """
+    Returns a comparable activity version: "12" -> (12,),
+    "1.2.3" -> (1, 2, 3). Suffixes like "-beta" are ignored
+    :param version:
+    :type version: str
+    :return: None if the version does not start with a number
+    :rtype: Union[tuple, None]
+    """
+    match = _VERSION_REGEX.match(str(version).strip())
+    if match is None:
+        return None
+    return tuple(int(x) for x in match.group().split("."))
+
+
+def get_newest_update(xml):
+    """
+    Returns the newest update described by an update RDF
+    :param xml: update RDF
+    :type xml: Union[bytes, str]
+    :return: None if the RDF has no update
+    :rtype: Union[dict, None]
+    """
+    try:
+        root = ElementTree.fromstring(xml)
+    except ElementTree.ParseError:
+        return None
+    newest = None
+    for description in root.iter(f"{{{RDF_NAMESPACE}}}Description"):
+        version = description.findtext(f"{{{EM_NAMESPACE}}}version")
+        if version is None or parse_version(version) is None:
+            continue
+        if newest is not None and parse_version(version) <= parse_version(
+            newest["version"]
+        ):
+            continue
+        newest = {"version": version.strip()}
+        target = description.find(
+            f"{{{EM_NAMESPACE}}}targetApplication/{{{RDF_NAMESPACE}}}Description"
+        )
+        for key, field in _UPDATE_FIELDS.items():
+            value = (
+                None
+                if target is None
+                else target.findtext(f"{{{EM_NAMESPACE}}}{field}")
+            )
+            newest[key] = None if value is None else value.strip()
+    return newest
+
+
+def is_newer(update, version):
+    """
+    Returns True if update is newer than the installed version. If the
+    installed version is unknown, every update is newer
+    :param update: see get_newest_update
+    :type update: dict
+    :param version: installed version
+    :type version: str
+    :rtype: bool
+    """
+    installed = parse_version(version)
+    if installed is None:
+        return True
+    return parse_version(update["version"]) > installed
+
+
+def combine_update_rdfs(rdfs):
+    """
+    Merges update RDFs into a single RDF document
+    :param rdfs: update RDFs
+    :type rdfs: Iterable[Union[bytes, str]]
+    :return:
+    :rtype: bytes
+    """
+    combined = ElementTree.Element(f"{{{RDF_NAMESPACE}}}RDF")
+    for xml in rdfs:
+        combined.extend(list(ElementTree.fromstring(xml)))
+    return b'<?xml version="1.0"?>\n' + ElementTree.tostring(combined)
+
+
+def parse_batch_request(data, max_bundles):
+    """
+    Validates the body of a batch update check:
+        {
+            "appVersion": "0.118",
+            "bundles": [{"id": "org.sugarlabs.Foo", "version": "12"}, ...],
+            "format": "rdf"
+        }
+    the bundles can also be given as [bundle_id, version] pairs
+    :param data: decoded JSON body
+    :type data: dict
+    :param max_bundles: maximum number of bundles in a request
+    :type max_bundles: int
+    :return: Tuple (app_version, [(bundle_id, version), ...], format)
+    :rtype: tuple
+    :raises ValueError: if the request is invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError("the body must be a JSON object")
+    app_version = str(data.get("appVersion"))
+    try:
+        float(app_version)
+    except ValueError:
+        raise ValueError("appVersion must be a number") from None
+    output_format = data.get("format") or BATCH_FORMATS[0]
+    if output_format not in BATCH_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(BATCH_FORMATS)}")
+    bundles = data.get("bundles")
+    if not isinstance(bundles, list):
+        raise ValueError("bundles must be a list")
+    if len(bundles) > max_bundles:
+        raise ValueError(f"at most {max_bundles} bundles can be checked at once")
+    pairs = list()
+    for bundle in bundles:
+        if isinstance(bundle, dict):
+            bundle = (bundle.get("id"), bundle.get("version"))
+        if (
+            not isinstance(bundle, (list, tuple))
+            or len(bundle) != 2
+            or not isinstance(bundle[0], str)
+        ):
+            raise ValueError("bundles must be (bundle_id, version) pairs")
+        pairs.append((bundle[0], str(bundle[1])))
+    return app_version, pairs, output_format
+
+
+def get_batch_response(pairs, rdfs, output_format):
+    """
+    Returns the updates of the bundles which have a newer version than
+    the installed one
+    :param pairs: [(bundle_id, installed version), ...]
+    :type pairs: list
+    :param rdfs: the update RDF of each bundle, None if it has none
+    :type rdfs: Iterable[Union[bytes, None]]
+    :param output_format: one of BATCH_FORMATS
+    :type output_format: str
+    :return: Tuple (body, mimetype)
+    :rtype: tuple
+    """
+    updates = list()
+    for (bundle_id, version), xml in zip(pairs, rdfs):
+        if xml is None:
+            continue
+        update = get_newest_update(xml)
+        if update is None or not is_newer(update, version):
+            continue
+        updates.append((bundle_id, xml, update))
+
+    if output_format == "json":
+        body = json.dumps(
+            {
+                "updates": [
+                    dict(id=bundle_id, **update) for bundle_id, _, update in updates
+                ]
+            }
+        )
+        return body.encode("utf-8"), "application/json"
+    return combine_update_rdfs(xml for _, xml, _ in updates), "text/xml"
@@ -0,0 +1,265 @@
+import collections
+import http.client
+import logging
+import threading
+import time
+import urllib.parse
+
+logger = logging.getLogger("aslo4-server")
+
+# status codes which are followed, like urllib.request.urlopen does
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 5
+
+
+class UpstreamError(Exception):
+    """
+    Raised when the upstream server could not be reached, or did not
+    answer with 200 OK, in which case `status` is the status it answered
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """
+    Keeps the HTTP connections to the upstream servers open between
+    requests, so that update checks do not pay for a new TCP and TLS
+    handshake each time. Thread safe
+    """
+
+    def __init__(self, max_connections_per_host=8, timeout=10):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._idle = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _new_connection(self, scheme, netloc):
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _acquire(self, scheme, netloc):
+        with self._lock:
+            idle = self._idle[(scheme, netloc)]
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(scheme, netloc), False
+
+    def _release(self, scheme, netloc, connection):
+        with self._lock:
+            idle = self._idle[(scheme, netloc)]
+            if len(idle) < self.max_connections_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def _request(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+        connection, reused = self._acquire(parsed.scheme, parsed.netloc)
+        try:
+            connection.request("GET", path, headers={"Connection": "keep-alive"})
+            response = connection.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            if not reused:
+                raise
+            # the server closed the idle connection, try a new one
+            connection = self._new_connection(parsed.scheme, parsed.netloc)
+            try:
+                connection.request("GET", path, headers={"Connection": "keep-alive"})
+                response = connection.getresponse()
+                body = response.read()
+            except BaseException:
+                connection.close()
+                raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(parsed.scheme, parsed.netloc, connection)
+        return response.status, response.getheader("Location"), body
+
+    def get(self, url):
+        """
+        Fetches url, following redirects
+        :return: the body of the response
+        :rtype: bytes
+        :raises UpstreamError: if the response is not 200 OK
+        """
+        for _ in range(_MAX_REDIRECTS + 1):
+            try:
+                status, location, body = self._request(url)
+            except (http.client.HTTPException, OSError) as e:
+                raise UpstreamError(f"{url}: {e}") from e
+            if status in _REDIRECT_CODES and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if status != 200:
+                raise UpstreamError(f"{url}: HTTP {status}", status=status)
+            return body
+        raise UpstreamError(f"{url}: too many redirects")
+
+
+class _Flight:
+    """
+    A fetch in progress, which concurrent requests for the same key wait on
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class UpstreamCache:
+    """
+    In-process LRU cache of the responses of the upstream servers.
+
+    - a response is fresh for `ttl` seconds, and is served without
+      contacting upstream
+    - an expired response is served for `stale_ttl` more seconds while it
+      is refreshed in the background (stale-while-revalidate); it is also
+      served if upstream fails to answer
+    - concurrent misses for the same key are coalesced into a single
+      upstream fetch (single-flight)
+    - an answer other than 200 OK (e.g. 404 for a bundle upstream does
+      not have) is remembered for `negative_ttl` seconds, during which
+      the requests for the same key fail without contacting upstream
+    """
+
+    def __init__(
+        self, fetch, max_entries=4096, ttl=300, stale_ttl=86400, negative_ttl=60
+    ):
+        """
+        :param fetch: function which fetches an url, see ConnectionPool.get
+        :type fetch: Callable[[str], bytes]
+        :param max_entries: number of responses to keep
+        :type max_entries: int
+        :param ttl: seconds a response is fresh
+        :type ttl: float
+        :param stale_ttl: seconds an expired response can still be served
+        :type stale_ttl: float
+        :param negative_ttl: seconds an answer other than 200 OK is kept
+        :type negative_ttl: float
+        """
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = collections.OrderedDict()
+        # key: (time, message, status) of the failed fetches
+        self._failures = collections.OrderedDict()
+        self._flights = dict()
+        self._lock = threading.Lock()
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._failures.pop(key, None)
+
+    def _store_failure(self, key, error):
+        with self._lock:
+            self._failures[key] = (time.monotonic(), str(error), error.status)
+            self._failures.move_to_end(key)
+            while len(self._failures) > self.max_entries:
+                self._failures.popitem(last=False)
+
+    def _get_failure(self, key):
+        """
+        Returns the failure of key, if it is recent. Must be called with
+        the lock held
+        :rtype: Union[UpstreamError, None]
+        """
+        failure = self._failures.get(key)
+        if failure is None:
+            return None
+        failed_at, message, status = failure
+        if time.monotonic() - failed_at >= self.negative_ttl:
+            del self._failures[key]
+            return None
+        return UpstreamError(message, status=status)
+
+    def _fetch(self, key, url):
+        """
+        Fetches url, unless a fetch of key is already in progress, in
+        which case its result is awaited
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self.fetch(url)
+            self._store(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            if isinstance(e, UpstreamError) and e.status is not None:
+                self._store_failure(key, e)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    def _revalidate(self, key, url):
+        try:
+            self._fetch(key, url)
+        except Exception as e:
+            logger.warning(f"Could not refresh {url}: {e}")
+
+    def get(self, key, url):
+        """
+        Returns the response of url, cached under key
+        :param key: hashable identifying the response
+        :param url: url of the upstream server
+        :type url: str
+        :return: body of the response
+        :rtype: bytes
+        :raises UpstreamError: if upstream failed and nothing is cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                revalidating = key in self._flights
+            failure = self._get_failure(key)
+        if entry is not None:
+            fetched_at, value = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                if not revalidating and failure is None:
+                    threading.Thread(
+                        target=self._revalidate, args=(key, url), daemon=True
+                    ).start()
+                return value
+
+        if failure is None:
+            try:
+                return self._fetch(key, url)
+            except UpstreamError as e:
+                failure = e
+        if entry is None:
+            raise failure
+        # upstream is down, an old response is better than none
+        logger.warning(f"Serving a stale response for {key}")
+        return entry[1]
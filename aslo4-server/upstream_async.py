@@ -0,0 +1,189 @@
+import asyncio
+import collections
+import logging
+import time
+
+import aiohttp
+
+from upstream import UpstreamError
+
+logger = logging.getLogger("aslo4-server")
+
+
+class AsyncConnectionPool:
+    """
+    Non-blocking counterpart of upstream.ConnectionPool. At most
+    `max_concurrency` requests are sent to the upstream servers at the
+    same time, the others wait for a free connection
+    """
+
+    def __init__(self, max_concurrency=100, timeout=10):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._session = None
+
+    async def open(self):
+        if self._session is not None:
+            return
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(
+                limit=self.max_concurrency, limit_per_host=self.max_concurrency
+            ),
+        )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get(self, url):
+        """
+        Fetches url, following redirects
+        :return: the body of the response
+        :rtype: bytes
+        :raises UpstreamError: if the response is not 200 OK
+        """
+        # the session is opened by the lifespan of the application, or
+        # by the first request if the server does not run the lifespan
+        await self.open()
+        try:
+            async with self._session.get(url) as response:
+                if response.status != 200:
+                    raise UpstreamError(
+                        f"{url}: HTTP {response.status}", status=response.status
+                    )
+                return await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise UpstreamError(f"{url}: {e!r}") from e
+
+
+class AsyncUpstreamCache:
+    """
+    Non-blocking counterpart of upstream.UpstreamCache, with the same
+    fresh, stale-while-revalidate, single-flight and negative caching
+    behaviour. Must be used from a single event loop
+    """
+
+    def __init__(
+        self, fetch, max_entries=4096, ttl=300, stale_ttl=86400, negative_ttl=60
+    ):
+        """
+        :param fetch: coroutine function which fetches an url,
+                      see AsyncConnectionPool.get
+        :type fetch: Callable[[str], Awaitable[bytes]]
+        :param max_entries: number of responses to keep
+        :type max_entries: int
+        :param ttl: seconds a response is fresh
+        :type ttl: float
+        :param stale_ttl: seconds an expired response can still be served
+        :type stale_ttl: float
+        :param negative_ttl: seconds an answer other than 200 OK is kept
+        :type negative_ttl: float
+        """
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = collections.OrderedDict()
+        # key: (time, message, status) of the failed fetches
+        self._failures = collections.OrderedDict()
+        self._flights = dict()
+        # keeps the background revalidations from being garbage collected
+        self._revalidations = set()
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._failures.pop(key, None)
+
+    def _store_failure(self, key, error):
+        self._failures[key] = (time.monotonic(), str(error), error.status)
+        self._failures.move_to_end(key)
+        while len(self._failures) > self.max_entries:
+            self._failures.popitem(last=False)
+
+    def _get_failure(self, key):
+        """
+        Returns the failure of key, if it is recent
+        :rtype: Union[UpstreamError, None]
+        """
+        failure = self._failures.get(key)
+        if failure is None:
+            return None
+        failed_at, message, status = failure
+        if time.monotonic() - failed_at >= self.negative_ttl:
+            del self._failures[key]
+            return None
+        return UpstreamError(message, status=status)
+
+    async def _fetch_and_store(self, key, url):
+        try:
+            value = await self.fetch(url)
+            self._store(key, value)
+            return value
+        except UpstreamError as e:
+            if e.status is not None:
+                self._store_failure(key, e)
+            raise
+        finally:
+            del self._flights[key]
+
+    def _fetch(self, key, url):
+        """
+        Returns the fetch of key in progress, or starts a new one
+        :rtype: asyncio.Future
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = asyncio.ensure_future(
+                self._fetch_and_store(key, url)
+            )
+        return flight
+
+    async def _revalidate(self, key, url):
+        try:
+            await self._fetch(key, url)
+        except Exception as e:
+            logger.warning(f"Could not refresh {url}: {e}")
+
+    async def get(self, key, url):
+        """
+        Returns the response of url, cached under key
+        :param key: hashable identifying the response
+        :param url: url of the upstream server
+        :type url: str
+        :return: body of the response
+        :rtype: bytes
+        :raises UpstreamError: if upstream failed and nothing is cached
+        """
+        entry = self._entries.get(key)
+        failure = self._get_failure(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            fetched_at, value = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                if key not in self._flights and failure is None:
+                    task = asyncio.ensure_future(self._revalidate(key, url))
+                    self._revalidations.add(task)
+                    task.add_done_callback(self._revalidations.discard)
+                return value
+
+        if failure is None:
+            try:
+                # shielded, so that a client which disconnects does not
+                # cancel the fetch the other clients are waiting on
+                return await asyncio.shield(self._fetch(key, url))
+            except UpstreamError as e:
+                failure = e
+        if entry is None:
+            raise failure
+        # upstream is down, an old response is better than none
+        logger.warning(f"Serving a stale response for {key}")
+        return entry[1]
@@ -95,34 +95,165 @@ function addActivityCard(item) {
 }
 
 
+// the options of the search index, the index itself is built
+// by the generator (search-index.json)
+const miniSearchOptions = {
+  fields: ['name', 'summary'], // fields to index for full-text search
+  storeFields: ['name', 'summary', 'url', 'icon_name', 'bundle_name', 'v', 'bundle_id'], // fields to return with search results
+  searchOptions: {
+    boost: {name: 2},
+    fuzzy: 0.5,
+    prefix: true,
+  },
+};
+
+// the generator also writes the search index sharded by the first
+// characters of the terms to search/<prefix>.json, so that only the
+// shards of the terms being searched are downloaded.
+// The sharded search is prefix and exact only: a shard only has the
+// documents with a term starting with its prefix, so a fuzzy match
+// starting with other characters ("cgess" for "chess") cannot be found,
+// and the ranking is computed on the documents of the shards rather than
+// on the whole catalog. The full search-index.json is used when the
+// sharded search finds nothing, or when a term is shorter than a prefix
+const searchShardPrefixLength = 2;
+const searchShardOptions = {fuzzy: false};
+const searchShards = {};
+
+function searchActivities(query, index, options) {
+  // returns the number of results
+  const results = (index || miniSearch).search(query, options);
+  $.each(results, function(i, item) {
+    addActivityCard(item);
+  });
+  return results.length;
+}
+
+function getSearchTerms(query) {
+  // approximates the default tokenizer of MiniSearch
+  return query.toLowerCase()
+      .split(/[\n\r -#%-*,-/:;?@[-\]_{}\u00A0\u2000-\u206F\u3000-\u303F]+/)
+      .filter(function(term) {
+        return term != '';
+      });
+}
+
+function getSearchShardName(prefix) {
+  // see aslo4.lib.search.get_search_shard_name
+  if (/^[a-z0-9]+$/.test(prefix)) {
+    return prefix;
+  }
+  return 'u' + Array.from(prefix).map(function(character) {
+    return character.codePointAt(0).toString(16);
+  }).join('-');
+}
+
+function loadSearchShard(prefix) {
+  // each shard is downloaded once and only once, a missing shard
+  // means that no term starts with the prefix
+  const name = getSearchShardName(prefix);
+  if (searchShards[name] == null) {
+    searchShards[name] = $.getJSON(`search/${name}.json`).then(
+        function(shard) {
+          return shard['documents'];
+        },
+        function() {
+          return $.Deferred().resolve([]);
+        });
+  }
+  return searchShards[name];
+}
+
+function searchShardedActivities(query, fallback) {
+  // returns false if a term is too short to be looked up in the
+  // shards, in which case the full search index is used. fallback is
+  // called if the shards cannot be loaded or have no results
+  const prefixes = [];
+  const terms = getSearchTerms(query);
+  for (let i = 0; i < terms.length; i++) {
+    const characters = Array.from(terms[i]);
+    if (characters.length < searchShardPrefixLength) {
+      return false;
+    }
+    const prefix = characters.slice(0, searchShardPrefixLength).join('');
+    if (prefixes.indexOf(prefix) == -1) {
+      prefixes.push(prefix);
+    }
+  }
+  if (prefixes.length == 0) {
+    return false;
+  }
+  $.when.apply($, prefixes.map(loadSearchShard))
+      .done(function() {
+        // index the few documents of the shards only
+        const index = new MiniSearch(miniSearchOptions);
+        const indexed = {};
+        $.each(arguments, function(i, documents) {
+          $.each(documents, function(j, document) {
+            if (!indexed[document['id']]) {
+              indexed[document['id']] = true;
+              index.add(document);
+            }
+          });
+        });
+        if (searchActivities(query, index, searchShardOptions) == 0) {
+          fallback();
+        }
+      })
+      .fail(fallback);
+  return true;
+}
+
+function indexAllActivities(callback) {
+  // fallback when the prebuilt index is not available:
+  // index all documents in the browser
+  $.getJSON('index.json', function(data) {
+    console.log('minisearch indexed.');
+    miniSearch = new MiniSearch(miniSearchOptions);
+    miniSearch.addAll(data);
+    callback();
+  });
+}
+
+function loadSearchIndex(callback) {
+  // load the index once and only once
+  // reduces CPU usage
+  $.ajax({url: 'search-index.json', dataType: 'text'})
+      .done(function(data) {
+        try {
+          miniSearch = MiniSearch.loadJSON(data, miniSearchOptions);
+          console.log('minisearch index loaded.');
+        } catch (e) {
+          console.log('minisearch index could not be loaded: ' + e);
+          indexAllActivities(callback);
+          return;
+        }
+        callback();
+      })
+      .fail(function() {
+        indexAllActivities(callback);
+      });
+}
+
 function loadAllActivities() {
   // get the json file
   if ($.trim( $('#saas-search-box').val() ) != '') {
     // the user has entered something, filter the list accordingly
-    $.getJSON('index.json', function(data) {
-      console.log('Searching using miniSearch');
-      if (miniSearch == null) {
-        // index minisearch once and only once
-        // reduces CPU usage
-
-        console.log('minisearch indexed.');
-        miniSearch = new MiniSearch({
-          fields: ['name', 'summary'], // fields to index for full-text search
-          storeFields: ['name', 'summary', 'url', 'icon_name', 'bundle_name', 'v', 'bundle_id'], // fields to return with search results
-          searchOptions: {
-            boost: {name: 2},
-            fuzzy: 0.5,
-            prefix: true,
-          },
-        });
-        // Index all documents
-        miniSearch.addAll(data);
-      }
-      const results = miniSearch.search($('#saas-search-box').val());
-      $.each(results, function(i, item) {
-        addActivityCard(item);
+    const query = $('#saas-search-box').val();
+    console.log('Searching using miniSearch');
+    if (miniSearch != null) {
+      searchActivities(query);
+      return;
+    }
+    const searchAllActivities = function() {
+      loadSearchIndex(function() {
+        searchActivities(query);
       });
-    });
+    };
+    if (searchShardedActivities(query, searchAllActivities)) {
+      return;
+    }
+    searchAllActivities();
   } else {
     $.getJSON('index.json', function(data) {
       // update the UI with each card
@@ -0,0 +1,149 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import time
+import zipfile
+import zlib
+
+BUF_SIZE = 65536
+
+
+class BundleArchive:
+    """
+    Read only accessor to the members of a bundle (.xo).
+    The archive is opened once, and its central directory is indexed by
+    member name, so that members can be looked up, read or streamed to
+    the disk without extracting them to temporary directories
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path to the .xo
+        :type path: str
+        :raises zipfile.BadZipFile: if the file is not a zip archive
+        """
+        self.path = path
+        self.zipfile = zipfile.ZipFile(path)
+        self.members = {info.filename: info for info in self.zipfile.infolist()}
+
+    def __repr__(self):
+        return "BundleArchive ({}, {} members)".format(self.path, len(self.members))
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def getinfo(self, name):
+        """
+        Returns the ZipInfo of a member
+        :raises KeyError: if the member does not exist
+        """
+        return self.members[name]
+
+    def read(self, name):
+        """
+        Returns the content of a member as bytes
+        :raises KeyError: if the member does not exist
+        """
+        return self.zipfile.read(self.members[name])
+
+    def list_members(self, prefix, suffix=""):
+        """
+        Returns the sorted names of the files under `prefix` ending with
+        `suffix`
+        :param prefix: directory in the archive
+        :type prefix: str
+        :param suffix: extension of the files
+        :type suffix: str
+        :return: member names
+        :rtype: list
+        """
+        prefix = prefix.rstrip("/") + "/"
+        return sorted(
+            name
+            for name, info in self.members.items()
+            if name.startswith(prefix) and name.endswith(suffix) and not info.is_dir()
+        )
+
+    def is_extracted(self, name, output_path):
+        """
+        Returns True if output_path already has the content of the
+        member: the same size and the same CRC-32
+        :param name: name of the member
+        :type name: str
+        :param output_path: path the member is extracted to
+        :type output_path: str
+        :return:
+        :rtype: bool
+        :raises KeyError: if the member does not exist
+        """
+        info = self.members[name]
+        if (
+            not os.path.isfile(output_path)
+            or os.path.getsize(output_path) != info.file_size
+        ):
+            return False
+        crc = 0
+        with open(output_path, "rb") as fp:
+            for chunk in iter(lambda: fp.read(BUF_SIZE), b""):
+                crc = zlib.crc32(chunk, crc)
+        return crc == info.CRC
+
+    def extract_member(self, name, output_path):
+        """
+        Streams a member to output_path, without staging it in a
+        temporary directory. Nothing is written if output_path already
+        has the content of the member. output_path is replaced
+        atomically, so that a hardlink or a symlink at output_path (as
+        left by aslo4.lib.publish.publish_file) is never written through.
+        The modification time of the written file is the one recorded in
+        the archive
+        :param name: name of the member
+        :type name: str
+        :param output_path: path to write the member to
+        :type output_path: str
+        :return: output_path
+        :rtype: str
+        :raises KeyError: if the member does not exist
+        """
+        if self.is_extracted(name, output_path):
+            return output_path
+        info = self.members[name]
+        # the member is written next to output_path, and then moved over
+        # output_path
+        temp_path = os.path.join(
+            os.path.dirname(os.path.abspath(output_path)),
+            ".{}.aslo4-extract".format(os.path.basename(output_path)),
+        )
+        try:
+            with self.zipfile.open(info) as src, open(temp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, BUF_SIZE)
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(temp_path, (mtime, mtime))
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.lexists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return output_path
+
+    def close(self):
+        self.zipfile.close()
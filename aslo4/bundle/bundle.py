@@ -18,16 +18,23 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import functools
 import hashlib
 import os
 import subprocess
 import tempfile
 import zipfile
 import logging
+from collections import Counter
 from configparser import ConfigParser
 from pathlib import Path
 
+from aslo4.bundle.archive import BundleArchive
+from aslo4.bundle.metadata import BundleMetadata
+from aslo4.bundle.metadata import memoized
 from aslo4.constants import ACTIVITY_BUILD_CLASSIFIER
+from aslo4.lib.git import get_git_provider
+from aslo4.lib.publish import COPY, publish_file
 from aslo4.lib.utils import split as _s, git_checkout_latest_tag, git_checkout
 from aslo4.platform import get_executable_path
 
@@ -35,6 +42,30 @@ from aslo4.platform import get_executable_path
 # get the logger
 logger = logging.getLogger("aslo4-builder")
 
+# authors which are ignored
+BOTS_FILE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "bots.txt"
+)
+
+# icon used when the activity does not provide one
+FALLBACK_ICON_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "assets", "activity-helloworld.svg"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_bots():
+    """
+    Returns the names of the bots which are not listed as authors
+    of the activities, read once from data/bots.txt
+    :return:
+    :rtype: frozenset
+    """
+    if not os.path.exists(BOTS_FILE_PATH):
+        return frozenset()
+    with open(BOTS_FILE_PATH, "r") as fp:
+        return frozenset(fp.read().split("\n"))
+
 
 def get_latest_bundle(bundle_path):
     """
@@ -94,34 +125,99 @@ class InvalidBundleError(BundleError):
 
 
 class Bundle:
-    def __init__(self, activity_path):
+    __slots__ = (
+        "_is_xo",
+        "_is_invalid",
+        "activity_path",
+        "_archive",
+        "bundle_prefix",
+        "activity_info_path",
+        "metadata",
+        "_bundle_path",
+        "temp",
+    )
+
+    # reads the metadata of the git repository of the activity,
+    # see aslo4.lib.git
+    git_provider = get_git_provider()
+
+    def __init__(self, activity_path, metadata=None, bundle_path=None):
         """
         Generates a information
         :param activity_path: A full realpath to the bundle.
         The bundle should have activity/activity.info
+        :param metadata: the activity.info, if it was already read, see
+        aslo4.bundle.scan. The .xo is then only opened when needed
+        :type metadata: BundleMetadata
+        :param bundle_path: the latest bundle of the dist directory of an
+        activity directory, if it was already searched, see
+        get_latest_bundle
+        :type bundle_path: Union[str, bool]
         """
-        # initialize config parser
-        config = ConfigParser()
         self._is_xo = False
         self._is_invalid = False
+        self._archive = None
         # path to activity dir / .xo
         self.activity_path = activity_path
 
         if str(activity_path).endswith(".xo"):
             self._is_xo = True
-            # its a zipped .xo
-            # read the contents from the zip file
-            self.archive = zipfile.ZipFile(activity_path)
 
             # extract temporary activity name from the archive
             __activity_name = "-".join(
                 activity_path.split(os.path.sep)[-1].split("-")[:-1]
             )
-
             self.bundle_prefix = "{}.activity".format(__activity_name)
             self.activity_info_path = os.path.join(
                 self.bundle_prefix, "activity", "activity.info"
             )
+        else:
+            # not a bundle. This is a directory
+            self.activity_info_path = os.path.join(
+                activity_path, "activity", "activity.info"
+            )
+
+        if metadata is None:
+            metadata = self._read_activity_info()
+            if metadata is None:
+                return
+        self.metadata = metadata
+
+        # bundle specific variables
+        if self.is_xo:
+            self._bundle_path = self.activity_path
+        elif bundle_path is not None:
+            self._bundle_path = bundle_path
+        else:
+            self._bundle_path = get_latest_bundle(
+                os.path.join(self.get_activity_dir(), "dist")
+            )
+
+        self.temp = list()
+
+    def _read_activity_info(self):
+        """
+        Reads the activity.info of the activity directory or .xo
+        :return: None if the .xo is invalid
+        :rtype: Union[BundleMetadata, None]
+        :raises BundleError: if the activity.info has no [Activity] section
+        """
+        # initialize config parser
+        config = ConfigParser()
+        if self.is_xo:
+            __activity_name = self.bundle_prefix[: -len(".activity")]
+            # its a zipped .xo
+            # read the contents from the zip file
+            try:
+                self._archive = BundleArchive(self.activity_path)
+            except zipfile.BadZipFile:
+                self._is_invalid = True
+                logger.error(
+                    "[ERR][BUNDLE] {} is an invalid bundle. "
+                    "Provided bundle is not a zip file".format(__activity_name)
+                )
+                return None
+
             try:
                 activity_info_file = self.archive.read(self.activity_info_path).decode()
             except KeyError:
@@ -134,15 +230,9 @@ class Bundle:
                         __activity_name
                     )
                 )
-                return
+                return None
             config.read_string(activity_info_file)
-
         else:
-            self._is_xo = False
-            self.activity_info_path = os.path.join(
-                activity_path, "activity", "activity.info"
-            )
-            # not a bundle. This is a directory
             config.read(self.activity_info_path)
 
         # Read the activity.info and derive attributes
@@ -155,35 +245,7 @@ class Bundle:
                     self.activity_info_path
                 )
             )
-        bundle_activity_section = config["Activity"]
-        self._name = bundle_activity_section.get("name")
-        self._activity_version = bundle_activity_section.get(
-            "activity_version"
-        ) or bundle_activity_section.get("activity-version")
-        self._bundle_id = bundle_activity_section.get("bundle_id")
-        self.icon = bundle_activity_section.get("icon", "activity-helloworld")
-        self._exec = bundle_activity_section.get("exec")
-        self.license = bundle_activity_section.get("license", "").split(";")
-        self.repository = bundle_activity_section.get("repository")
-        self.summary = bundle_activity_section.get("summary")
-        self.description = bundle_activity_section.get("description")
-        self.url = bundle_activity_section.get("url", "")
-        self.tags = (
-            bundle_activity_section.get("tags", "").split(";")
-            or bundle_activity_section.get("category", "").split(";")
-            or bundle_activity_section.get("tag", "").split(";")
-            or bundle_activity_section.get("categories", "").split(";")
-        )
-        self.screenshots = bundle_activity_section.get("screenshots", "").split()
-
-        # bundle specific variables
-        self._bundle_path = (
-            self.activity_path
-            if self.is_xo
-            else get_latest_bundle(os.path.join(self.get_activity_dir(), "dist"))
-        )
-
-        self.temp = list()
+        return BundleMetadata.from_activity_section(config["Activity"])
 
     def __repr__(self):
         """
@@ -194,9 +256,30 @@ class Bundle:
         :rtype:
         """
         return "{name} ({path}, xo={is_xo})".format(
-            name=self._name, path=self.activity_info_path, is_xo=self.is_xo
+            name=self.get_name(), path=self.activity_info_path, is_xo=self.is_xo
         )
 
+    @property
+    def archive(self):
+        """
+        The BundleArchive of a .xo, opened the first time it is needed
+        :return:
+        :rtype: BundleArchive
+        """
+        if self._archive is None and self.is_xo:
+            self._archive = BundleArchive(self.activity_path)
+        return self._archive
+
+    # read only attributes of the activity.info, see BundleMetadata
+    icon = property(lambda self: self.metadata.icon)
+    license = property(lambda self: self.metadata.license)
+    repository = property(lambda self: self.metadata.repository)
+    summary = property(lambda self: self.metadata.summary)
+    description = property(lambda self: self.metadata.description)
+    url = property(lambda self: self.metadata.url)
+    tags = property(lambda self: self.metadata.tags)
+    screenshots = property(lambda self: self.metadata.screenshots)
+
     @property
     def is_xo(self):
         """
@@ -269,21 +352,21 @@ class Bundle:
         Get the name of the bundle
         :return:
         """
-        return self._name
+        return self.metadata.name
 
     def get_version(self):
         """
         Get the version of the bundle
         :return:
         """
-        return self._activity_version
+        return self.metadata.activity_version
 
     def get_bundle_id(self):
         """
         Get the unique identifier of the activity bundle
         :return:
         """
-        return self._bundle_id
+        return self.metadata.bundle_id
 
     def get_icon_name(self):
         """
@@ -296,35 +379,89 @@ class Bundle:
         """
         Get the path to the icon path
         If the icon does not exist, a fallback icon is used
+        The icon of a .xo has to be extracted to a temporary directory to
+        have a path; prefer write_icon or get_icon_bytes
         :return:
         """
         icon_path = os.path.join(
             os.path.dirname(self.activity_info_path), "{}.svg".format(self.icon)
         )
-        if self.icon and os.path.exists(icon_path):
+        if not self.is_xo and self.icon and os.path.exists(icon_path):
             return icon_path
-        elif self.is_xo and self.icon:
+        elif self._get_icon_member():
             temp_folder = tempfile.TemporaryDirectory(prefix="saas-icon")
-            self.archive.extract(
-                os.path.join(
-                    self.bundle_prefix, "activity", "{}.svg".format(self.icon)
-                ),
-                path=temp_folder.name,
-            )
             self.temp.append(temp_folder)
-            return os.path.join(
-                temp_folder.name,
-                self.bundle_prefix,
-                "activity",
-                "{}.svg".format(self.icon),
+            return self.write_icon(
+                os.path.join(temp_folder.name, "{}.svg".format(self.icon))
             )
         else:
             # return a dummy icon because the current icon was missing
-            return os.path.join(
-                os.path.dirname(os.path.dirname(__file__)),
-                "assets",
-                "activity-helloworld.svg",
-            )
+            return FALLBACK_ICON_PATH
+
+    def _get_icon_member(self):
+        """
+        Returns the name of the icon in the .xo, None if the .xo does not
+        have one
+        :return:
+        :rtype: Union[str, None]
+        """
+        if not self.is_xo or not self.icon:
+            return None
+        member = "{}/activity/{}.svg".format(self.bundle_prefix, self.icon)
+        return member if member in self.archive else None
+
+    def get_icon_file_name(self):
+        """
+        Returns the file name of the icon, as written by write_icon.
+        Unlike get_icon_path, nothing is extracted from the .xo
+        :return:
+        :rtype: str
+        """
+        if self.is_xo:
+            if self._get_icon_member():
+                return "{}.svg".format(self.icon)
+            return os.path.basename(FALLBACK_ICON_PATH)
+        return os.path.basename(self.get_icon_path())
+
+    @memoized("icon_bytes")
+    def get_icon_bytes(self):
+        """
+        Returns the content of the icon (or of the fallback icon)
+        :return:
+        :rtype: bytes
+        """
+        member = self._get_icon_member()
+        if member:
+            return self.archive.read(member)
+        icon_path = FALLBACK_ICON_PATH if self.is_xo else self.get_icon_path()
+        with open(icon_path, "rb") as r:
+            return r.read()
+
+    def write_icon(self, output_path, strategy=COPY, hash_cache=None):
+        """
+        Writes the icon (or the fallback icon) to output_path, unless
+        output_path already has its content.
+        Icons of a .xo are streamed from the archive
+        :param output_path: path to write the icon to
+        :type output_path: str
+        :param strategy: how icons on the disk are published,
+        see aslo4.lib.publish
+        :type strategy: str
+        :param hash_cache: cache of the sha256 of the files
+        :type hash_cache: aslo4.lib.cache.HashCache
+        :return: output_path
+        :rtype: str
+        """
+        member = self._get_icon_member()
+        if member:
+            return self.archive.extract_member(member, output_path)
+        publish_file(
+            FALLBACK_ICON_PATH if self.is_xo else self.get_icon_path(),
+            output_path,
+            strategy=strategy,
+            hash_cache=hash_cache,
+        )
+        return output_path
 
     def get_screenshots(self, use_activity_info=False):
         """
@@ -339,21 +476,11 @@ class Bundle:
             screenshots = []
 
             if self.is_xo:
-                temp_folder = tempfile.TemporaryDirectory(prefix="saas-scr")
-                try:
-                    self.archive.extract(
-                        os.path.join(self.bundle_prefix, "screenshots"),
-                        path=temp_folder.name,
-                    )
-                except KeyError:
-                    # the screenshots directory does not exists
-                    # skip it
-                    return []
-
-                screenshot_directory = os.path.join(
-                    temp_folder.name, self.bundle_prefix, "screenshots"
+                # the names of the screenshots in the .xo; use
+                # write_screenshot or get_screenshot_bytes to read them
+                return self.archive.list_members(
+                    "{}/screenshots".format(self.bundle_prefix), suffix=".png"
                 )
-                self.temp.append(temp_folder)
             else:
                 screenshot_directory = os.path.join(
                     self.get_activity_dir(), "screenshots"
@@ -363,6 +490,43 @@ class Bundle:
                 screenshots.append(path.resolve())
             return screenshots
 
+    def get_screenshot_bytes(self, screenshot):
+        """
+        Returns the content of a screenshot returned by get_screenshots
+        :param screenshot: path to the screenshot, or its name in the .xo
+        :type screenshot: Union[str, Path]
+        :return:
+        :rtype: bytes
+        """
+        if self.is_xo:
+            return self.archive.read(screenshot)
+        with open(screenshot, "rb") as r:
+            return r.read()
+
+    def write_screenshot(self, screenshot, output_path, strategy=COPY, hash_cache=None):
+        """
+        Writes a screenshot returned by get_screenshots to output_path,
+        unless output_path already has its content.
+        Screenshots of a .xo are streamed from the archive
+        :param screenshot: path to the screenshot, or its name in the .xo
+        :type screenshot: Union[str, Path]
+        :param output_path: path to write the screenshot to
+        :type output_path: str
+        :param strategy: how screenshots on the disk are published,
+        see aslo4.lib.publish
+        :type strategy: str
+        :param hash_cache: cache of the sha256 of the files
+        :type hash_cache: aslo4.lib.cache.HashCache
+        :return: output_path
+        :rtype: str
+        """
+        if self.is_xo:
+            return self.archive.extract_member(screenshot, output_path)
+        publish_file(
+            str(screenshot), output_path, strategy=strategy, hash_cache=hash_cache
+        )
+        return output_path
+
     def get_license(self):
         """
         Return the str of open source license by which the
@@ -409,6 +573,74 @@ class Bundle:
         """
         return self.activity_path
 
+    def get_git_head(self):
+        """
+        Returns the sha of the commit checked out in the activity
+        directory, None if the activity is not a git repository
+        :return: commit sha
+        :rtype: Union[str, None]
+        """
+        if self.is_xo:
+            return None
+        return self.git_provider.get_head(self.get_activity_dir())
+
+    def get_source_tree_hash(self):
+        """
+        Returns a sha256 of all the files in the activity directory,
+        excluding dist/ and .git/. Used to identify the sources of
+        activities which are not git repositories
+        :return: hex digest
+        :rtype: str
+        """
+        sha256 = hashlib.sha256()
+        activity_dir = self.get_activity_dir()
+        for root, dirs, files in os.walk(activity_dir):
+            if root == activity_dir:
+                dirs[:] = [x for x in dirs if x not in ("dist", ".git")]
+            dirs.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                sha256.update(os.path.relpath(file_path, activity_dir).encode())
+                try:
+                    with open(file_path, "rb") as fp:
+                        for chunk in iter(lambda: fp.read(65536), b""):
+                            sha256.update(chunk)
+                except OSError:
+                    # dangling symlinks, sockets etc.
+                    continue
+        return sha256.hexdigest()
+
+    def get_source_fingerprint(
+        self, entrypoint_build_command=None, checkout_latest_tag=False
+    ):
+        """
+        Returns a digest which identifies the sources a .xo would be
+        built from. It is made of the git HEAD (or a hash of the source
+        tree for non git directories), the activity.info and the
+        build entrypoint script, if any.
+        Uncommitted changes in a git repository are not taken into account
+        :param entrypoint_build_command: path to the build entrypoint script
+        :type entrypoint_build_command: str
+        :param checkout_latest_tag: if the latest tag is checked out before
+        the build
+        :type checkout_latest_tag: bool
+        :return: hex digest
+        :rtype: str
+        """
+        sha256 = hashlib.sha256()
+        head = self.get_git_head()
+        if head:
+            sha256.update("git:{}".format(head).encode())
+        else:
+            sha256.update("tree:{}".format(self.get_source_tree_hash()).encode())
+        sha256.update("tag:{}".format(bool(checkout_latest_tag)).encode())
+        with open(self.activity_info_path, "rb") as fp:
+            sha256.update(hashlib.sha256(fp.read()).digest())
+        if entrypoint_build_command:
+            with open(entrypoint_build_command, "rb") as fp:
+                sha256.update(hashlib.sha256(fp.read()).digest())
+        return sha256.hexdigest()
+
     def do_generate_bundle(
         self,
         override_dist_xo=False,
@@ -448,38 +680,41 @@ class Bundle:
         if override_dist_xo and not entrypoint_build_command:
             raise ValueError("entrypoint_build_command was not provided")
 
-        if checkout_latest_tag and not self.is_xo:
+        if (
+            checkout_latest_tag
+            and not self.is_xo
+            and not self.git_provider.get_tags(self.get_activity_dir())
+        ):
+            logger.info(
+                "[BUILD] {} has no tags. Building from HEAD".format(self.get_name())
+            )
+        elif checkout_latest_tag and not self.is_xo:
             # checkout the latest tag on the activity build
             try:
                 git_checkout_latest_tag(self.get_activity_dir())
             except Exception as e:
                 logger.warn("WARN: git checkout to latest tag failed. E: {}".format(e))
 
-        current_path_ = os.getcwd()
         if entrypoint_build_command and isinstance(entrypoint_build_command, str):
             # read the shell / python script
             with open(entrypoint_build_command, "r") as r:
                 commands_to_pre_execute = r.read()
 
-            # change dir, if necessary:
-            if build_command_chdir:
-                os.chdir(self.get_activity_dir())
-
-            # execute the commands, format the f-strings before execution
-            exit_code = os.system(
+            # execute the commands, format the f-strings before execution.
+            # the working directory is passed to the child process instead
+            # of calling os.chdir, so that several bundles can be built
+            # in parallel from the same process
+            exit_code = subprocess.call(
                 commands_to_pre_execute.format(
                     name=self.get_name(),
                     v=self.get_version(),
                     activity_dir=self.get_activity_dir(),
                     icon_path=self.get_icon_path(),
-                )
+                ),
+                shell=True,
+                cwd=self.get_activity_dir() if build_command_chdir else None,
             )
 
-            # restore the current working directory in the case directory was
-            # changed
-            if build_command_chdir:
-                os.chdir(current_path_)
-
             if override_dist_xo:
                 return exit_code, "", ""
 
@@ -572,6 +807,10 @@ class Bundle:
         out, err = proc.communicate()
         return exit_code, out.decode(), err.decode()
 
+    @memoized(
+        "fingerprint",
+        key=lambda self, unique_icons=False: (unique_icons, self.get_bundle_path()),
+    )
     def generate_fingerprint_json(self, unique_icons=False):
         """
         Creates a json file which uniquely identifies each activity
@@ -611,7 +850,8 @@ class Bundle:
         :return:
         :rtype:
         """
-        if isinstance(self._exec, str) and "sugar-activity3" in self._exec:
+        exec_ = self.metadata.exec
+        if isinstance(exec_, str) and "sugar-activity3" in exec_:
             return True
         else:
             return False
@@ -645,22 +885,11 @@ class Bundle:
         :return: string of all the authors
         :rtype: str
         """
-        author_raw = subprocess.Popen(
-            _s(
-                '{git} -C {activity_path} -P log --pretty=format:"%an"'.format(
-                    git=get_executable_path("git"),
-                    activity_path=self.get_activity_dir(),
-                )
-            ),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        author_raw.wait(timeout=10)
-        out, _ = author_raw.communicate()
-        authors = out.decode()
-        return authors
+        # walking the history requires git, whatever the provider is
+        return self.git_provider.get_log_authors(self.get_activity_dir())
 
-    def get_authors(self):
+    @memoized("authors")
+    def get_authors(self, author_index=None):
         """
         Does minor checking if the word is like a NAME; Might have bugs.
         Returns a set `<set>`
@@ -689,7 +918,10 @@ class Bundle:
         inherited from git and then create bootstrap badges in the static
         files generated
 
-        :return set
+        :param author_index: if provided, only the commits made since the
+        last run are walked
+        :type author_index: aslo4.lib.cache.AuthorIndex
+        :return {author: number of commits}
         """
         if self.is_xo:
             # bundles does not have .git directory, skip
@@ -703,24 +935,21 @@ class Bundle:
             if not os.path.exists(saas_activity_xo_authors):
                 return dict()
             with open(saas_activity_xo_authors, "r") as fp:
-                authors = fp.read().split("\n")
+                authors = Counter(fp.read().split("\n"))
 
         else:
-            authors = self.create_authors_log_file().split("\n")
+            authors = None
+            if author_index is not None:
+                authors = author_index.get_authors(
+                    self.get_activity_dir(), self.git_provider
+                )
+            if authors is None:
+                authors = Counter(self.create_authors_log_file().split("\n"))
 
-        bots_file = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)), "data", "bots.txt"
-        )
-        if os.path.exists(bots_file):
-            with open(bots_file, "r") as fp:
-                bots = fp.read().split("\n")
-        else:
-            bots = set()
-        unique_authors = set(authors).difference(bots)
-        author_db = dict()
-        for author in unique_authors:
-            author_db[author] = authors.count(author)
-        return author_db
+        bots = get_bots()
+        return {
+            author: commits for author, commits in authors.items() if author not in bots
+        }
 
     def get_activity_type(self):
         """
@@ -729,12 +958,13 @@ class Bundle:
         :return:
         :rtype: str
         """
-        if not isinstance(self._exec, str):
+        if not isinstance(self.metadata.exec, str):
             return None
         return ACTIVITY_BUILD_CLASSIFIER.get(
-            self._exec.split()[0].split(os.path.sep)[-1], "other"
+            self.metadata.exec.split()[0].split(os.path.sep)[-1], "other"
         )
 
+    @memoized("news")
     def get_news(self):
         """
         Returns the NEWS corresponding to the current tagged release
@@ -763,6 +993,7 @@ class Bundle:
 
         return
 
+    @memoized("changelog")
     def get_changelog(self):
         """
         Reads the NEWS file in a directory; if it does not exist return None
@@ -782,9 +1013,11 @@ class Bundle:
 
         return news_file_instance
 
+    @memoized("git_url")
     def get_git_url(self):
         """
-        Returns git url  by `git config --get remote.origin.url`
+        Returns the url of the origin remote, as in
+        `git config --get remote.origin.url`
 
         If the provided bundle inherits properties from a .xo file, then
         using git to extract commits is not sensible. A developer can tweak
@@ -820,22 +1053,7 @@ class Bundle:
             with open(saas_activity_xo_giturl, "r") as r:
                 url = r.read()
             return url
-        url_process = subprocess.Popen(
-            _s(
-                "{git} -C {path} config --get remote.origin.url".format(
-                    git=get_executable_path("git"), path=self.get_activity_dir()
-                )
-            ),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        ecode = url_process.wait(timeout=5)
-        if ecode != 0:
-            # process did not complete successfully
-            # hence no git url
+        url = self.git_provider.get_remote_url(self.get_activity_dir())
+        if url is None:
             return None
-        out, _ = url_process.communicate()
-        url = out.decode().split("\n")
-        if len(url) >= 1:
-            url = url[0].replace('git@github.com:', 'https://github.com/')
-            return url
+        return url.replace("git@github.com:", "https://github.com/")
@@ -0,0 +1,198 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import functools
+
+# marks a lazy field which was not computed yet
+_UNSET = object()
+
+
+class BundleMetadata:
+    """
+    Immutable record of the attributes of an activity.info, along with
+    lazily computed values derived from the activity (git url, authors,
+    NEWS, icon, fingerprint) which are computed at most once.
+    Slotted to keep the memory used per bundle small on large catalogs
+    """
+
+    FIELDS = (
+        "name",
+        "activity_version",
+        "bundle_id",
+        "icon",
+        "exec",
+        "license",
+        "repository",
+        "summary",
+        "description",
+        "url",
+        "tags",
+        "screenshots",
+    )
+    LAZY_FIELDS = (
+        "git_url",
+        "authors",
+        "changelog",
+        "news",
+        "icon_bytes",
+        "fingerprint",
+    )
+
+    _LAZY_SLOTS = tuple("_{}".format(x) for x in LAZY_FIELDS)
+    __slots__ = FIELDS + _LAZY_SLOTS
+
+    def __init__(self, **fields):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, fields.pop(field, None))
+        if fields:
+            raise TypeError(
+                "Unexpected fields for BundleMetadata: {}".format(", ".join(fields))
+            )
+        for field in self._LAZY_SLOTS:
+            object.__setattr__(self, field, _UNSET)
+
+    @classmethod
+    def from_activity_section(cls, bundle_activity_section):
+        """
+        Creates the record from the [Activity] section of an activity.info
+        :param bundle_activity_section: the [Activity] section
+        :type bundle_activity_section: configparser.SectionProxy
+        :return:
+        :rtype: BundleMetadata
+        """
+        return cls(
+            name=bundle_activity_section.get("name"),
+            activity_version=bundle_activity_section.get("activity_version")
+            or bundle_activity_section.get("activity-version"),
+            bundle_id=bundle_activity_section.get("bundle_id"),
+            icon=bundle_activity_section.get("icon", "activity-helloworld"),
+            exec=bundle_activity_section.get("exec"),
+            license=tuple(bundle_activity_section.get("license", "").split(";")),
+            repository=bundle_activity_section.get("repository"),
+            summary=bundle_activity_section.get("summary"),
+            description=bundle_activity_section.get("description"),
+            url=bundle_activity_section.get("url", ""),
+            tags=tuple(
+                bundle_activity_section.get("tags", "").split(";")
+                or bundle_activity_section.get("category", "").split(";")
+                or bundle_activity_section.get("tag", "").split(";")
+                or bundle_activity_section.get("categories", "").split(";")
+            ),
+            screenshots=tuple(bundle_activity_section.get("screenshots", "").split()),
+        )
+
+    def to_json(self):
+        """
+        Returns the attributes of the activity.info, without the lazy
+        fields, in a form which can be serialized to JSON
+        :return:
+        :rtype: dict
+        """
+        return {
+            field: list(value) if isinstance(value, tuple) else value
+            for field, value in ((x, getattr(self, x)) for x in self.FIELDS)
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Creates the record from the result of to_json
+        :param data: see to_json
+        :type data: dict
+        :return:
+        :rtype: BundleMetadata
+        """
+        # the listing of a large catalog creates one record per activity
+        # from the scan cache, see aslo4.bundle.scan, so the checks of
+        # __init__ are skipped
+        metadata = cls.__new__(cls)
+        set_field = object.__setattr__
+        for field in cls.FIELDS:
+            value = data.get(field)
+            set_field(metadata, field, tuple(value) if type(value) is list else value)
+        for field in cls._LAZY_SLOTS:
+            set_field(metadata, field, _UNSET)
+        return metadata
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BundleMetadata is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("BundleMetadata is immutable")
+
+    def __repr__(self):
+        return "BundleMetadata ({}, {})".format(self.bundle_id, self.activity_version)
+
+    def memoize(self, field, compute, key=None):
+        """
+        Returns the value of a lazy field, computing it with `compute`
+        the first time it is requested. If a key is provided, the value is
+        computed again when the key differs from the one it was computed
+        with
+        :param field: one of BundleMetadata.LAZY_FIELDS
+        :type field: str
+        :param compute: function which computes the value of the field
+        :type compute: Callable
+        :param key: hashable identifying the inputs of compute
+        :return: the value of the field
+        """
+        slot = "_{}".format(field)
+        memoized = getattr(self, slot)
+        if memoized is _UNSET or memoized[0] != key:
+            memoized = (key, compute())
+            object.__setattr__(self, slot, memoized)
+        return memoized[1]
+
+    def is_computed(self, field):
+        """
+        Returns True if the lazy field was already computed
+        :param field: one of BundleMetadata.LAZY_FIELDS
+        :type field: str
+        :return:
+        :rtype: bool
+        """
+        return getattr(self, "_{}".format(field)) is not _UNSET
+
+
+def memoized(field, key=None):
+    """
+    Decorates a method of Bundle, so that its result is stored in
+    the lazy `field` of the bundle metadata and computed at most once.
+    :param field: one of BundleMetadata.LAZY_FIELDS
+    :type field: str
+    :param key: function called with the arguments of the method which
+    returns a hashable identifying the inputs of the result; the result
+    is computed again when the key changes
+    :type key: Callable
+    :return:
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            return self.metadata.memoize(
+                field,
+                lambda: function(self, *args, **kwargs),
+                key=key(self, *args, **kwargs) if key else None,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,155 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import concurrent.futures
+import logging
+import os
+
+from aslo4.bundle.bundle import Bundle, get_latest_bundle
+from aslo4.bundle.metadata import BundleMetadata
+
+logger = logging.getLogger("aslo4-builder")
+
+ACTIVITY_INFO_PATH = "{}{sep}activity{sep}activity.info"
+DIST_PATH = "{}{sep}dist"
+
+
+def _get_signature(stat):
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def read_metadata(path):
+    """
+    Reads the activity.info of an activity directory or a .xo. Runs in
+    the worker processes of scan_activities
+    :param path: path to the activity directory or .xo
+    :type path: str
+    :return: see BundleMetadata.to_json, None if the .xo is invalid
+    :rtype: Union[dict, None]
+    """
+    bundle = Bundle(path)
+    if bundle.is_invalid:
+        return None
+    return bundle.metadata.to_json()
+
+
+def scan_activities(directory, do_not_search_for_xo=False, scan_cache=None, jobs=1):
+    """
+    Lists the activity directories (with an activity/activity.info) and
+    the .xo bundles of directory, with one os.scandir. The activity.info
+    of the activities which are not in scan_cache, or which changed, are
+    read by `jobs` processes; the others are not read again, and their
+    .xo is only opened when it is needed
+    :param directory: input directory
+    :type directory: str
+    :param do_not_search_for_xo: only list the activity directories
+    :type do_not_search_for_xo: bool
+    :param scan_cache: cache of the activity.info
+    :type scan_cache: aslo4.lib.cache.ScanCache
+    :param jobs: number of processes reading the activity.info
+    :type jobs: int
+    :return: the valid activities, in the reverse order of their names
+    :rtype: list
+    """
+    # the paths of the cache are absolute, so that it does not depend on
+    # the working directory; they are built without os.path, which is
+    # slow enough to matter on large catalogs
+    prefix = os.path.abspath(directory) + os.sep
+    candidates = list()
+    with os.scandir(directory) as it:
+        entries = sorted(it, key=lambda x: x.name, reverse=True)
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                # If an activity.info exists, its a valid sugar directory.
+                # We do not need to add other directories
+                stat = os.stat(ACTIVITY_INFO_PATH.format(entry.path, sep=os.sep))
+            elif entry.name.endswith(".xo") and not do_not_search_for_xo:
+                stat = entry.stat()
+            else:
+                continue
+        except OSError:
+            continue
+        candidates.append((entry.path, prefix + entry.name, _get_signature(stat)))
+
+    metadata = dict()
+    misses = list()
+    for path, key, signature in candidates:
+        entry = None if scan_cache is None else scan_cache.lookup(key, signature)
+        if entry is None:
+            misses.append((path, key, signature))
+        else:
+            metadata[path] = entry["metadata"]
+
+    if misses:
+        logger.debug("[SCAN] Reading {} activity.info".format(len(misses)))
+        paths = [path for path, _, _ in misses]
+        if jobs > 1 and len(misses) > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+                parsed = list(
+                    pool.map(
+                        read_metadata,
+                        paths,
+                        chunksize=max(len(paths) // (jobs * 4), 1),
+                    )
+                )
+        else:
+            parsed = [read_metadata(path) for path in paths]
+        for (path, key, signature), data in zip(misses, parsed):
+            metadata[path] = data
+            if scan_cache is not None:
+                scan_cache.update(key, signature, data)
+
+    # the latest bundle of the dist directory of the activity directories,
+    # searched again only when an entry was added to or removed from it
+    bundle_paths = dict()
+    if scan_cache is not None:
+        for path, key, _ in candidates:
+            if metadata[path] is None or path.endswith(".xo"):
+                continue
+            dist_path = DIST_PATH.format(path, sep=os.sep)
+            try:
+                dist_signature = _get_signature(os.stat(dist_path))
+            except OSError:
+                dist_signature = None
+            dist = scan_cache.lookup_dist(key, dist_signature)
+            if dist is None:
+                bundle_path = get_latest_bundle(dist_path)
+                bundle_name = bundle_path and os.path.basename(bundle_path)
+                scan_cache.update_dist(key, dist_signature, bundle_name)
+            else:
+                bundle_name = dist["bundle"]
+            bundle_paths[path] = bundle_name and dist_path + os.sep + bundle_name
+
+        if not do_not_search_for_xo:
+            scan_cache.prune(directory, (key for _, key, _ in candidates))
+        scan_cache.save()
+
+    # bundles which are not valid zip files, or do not have an
+    # activity.info are skipped to prevent conflict
+    return [
+        Bundle(
+            path,
+            metadata=BundleMetadata.from_json(metadata[path]),
+            bundle_path=bundle_paths.get(path),
+        )
+        for path, _, _ in candidates
+        if metadata[path] is not None
+    ]
@@ -164,3 +164,15 @@ SITEMAP_URL = """<url>
   <priority>0.8</priority>
 </url>
 """
+
+SITEMAP_INDEX_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+{content}
+</sitemapindex>
+"""
+
+SITEMAP_INDEX_ITEM = """<sitemap>
+  <loc>{url}</loc>
+  <lastmod>{lastmod}</lastmod>
+</sitemap>
+"""
@@ -22,13 +22,16 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
 import argparse
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
 import html
 import json
 import os
 import time
 import shutil
 import sys
-import zipfile
 import logging
 import smtplib
 
@@ -36,20 +39,32 @@ from email.message import EmailMessage
 from logging.handlers import RotatingFileHandler
 from jinja2 import FileSystemLoader
 
-from .bundle.bundle import Bundle
+from .bundle.bundle import Bundle, get_latest_bundle
+from .bundle.scan import scan_activities
 from .catalog import catalog
 from .constants import CHANGELOG_HTML_TEMPLATE, NEW_FEATURE_HTML_TEMPLATE
-from .constants import SITEMAP_HEADER
-from .constants import SITEMAP_URL
 from .constants import FLATPAK_HTML_TEMPLATE
 from .constants import CAROUSEL_ITEM_HTML_TEMPLATE
 from .constants import CAROUSEL_INDICATOR_HTML_TEMPLATE
 from .constants import CAROUSEL_HTML_TEMPLATE
+from .lib.cache import AuthorIndex, BuildCache, BuildManifest, HashCache, JsonCache
+from .lib.cache import LastmodIndex, ScanCache
+from .lib.compress import BROTLI, GZIP, get_precompressed_source
+from .lib.compress import precompress_directory
+from .lib.publish import AUTO, COPY, PUBLISH_STRATEGIES, publish_file
+from .lib.git import FileGitProvider, GIT_PROVIDERS, get_git_provider
+from .lib.profiler import PROFILE_SCOPE_BUNDLES, PROFILE_SCOPE_RUN, PROFILE_SCOPES
+from .lib.profiler import Profiler
 from .lib.progressbar import progressbar
+from .lib.ndjson import IndexWriter
+from .lib.search import build_search_index, build_search_shards
+from .lib.sitemap import SitemapWriter
 from .lib.termcolors import cprint
-from .lib.utils import read_parse_and_write_template
+from .lib.timing import BundleTimings, ProfileReport
+from .lib.utils import TemplateEngine, map_bounded
 from .platform import get_executable_path
 from . import __version__
+from .rdf.index import write_update_index
 from .rdf.rdf import RDF
 
 
@@ -89,6 +104,35 @@ parser.add_argument(
 parser.add_argument(
     "--build-chdir", action="store_true", help="Changes directory to Activity dir"
 )
+parser.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    help="Number of activities to scan, build (--build-xo) or render "
+    "(--generate-static-html), and of files to precompress (--precompress), "
+    "in parallel (default: 1)",
+)
+parser.add_argument(
+    "--build-cache",
+    default="",
+    help="Path to a build cache file. Activities whose sources did not change "
+    "since they were last built are not rebuilt",
+)
+parser.add_argument(
+    "--scan-cache",
+    default="",
+    help="Path to a scan cache file. The activity.info of the activities "
+    "which did not change since they were last listed are not read again",
+)
+parser.add_argument(
+    "--git-backend",
+    default=FileGitProvider.name,
+    choices=sorted(GIT_PROVIDERS),
+    help="How the metadata of the git repositories of the activities is read: "
+    "'files' reads the .git directory, 'subprocess' spawns git "
+    "(default: files)",
+)
 parser.add_argument(
     "-l",
     "--list-activities",
@@ -108,6 +152,86 @@ parser.add_argument(
     default="",
     help="Generate a sitemap.xml file to the output directory",
 )
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Only regenerate the pages, RDFs, icons and bundles of the output "
+    "directory whose inputs changed since the last run, and remove the "
+    "ones which are no longer part of the catalog",
+)
+parser.add_argument(
+    "--publish-strategy",
+    default=COPY,
+    choices=(AUTO,) + PUBLISH_STRATEGIES,
+    help="How bundles, icons and screenshots are published to the output "
+    "directory. Unsupported strategies fall back to the next ones of "
+    "reflink, hardlink, symlink, copy; 'auto' starts with reflink. Files "
+    "which did not change are not published again (default: copy)",
+)
+parser.add_argument(
+    "--precompress",
+    action="store_true",
+    help="Write gzip compressed copies (.gz) of the HTML, JSON, XML, CSS, JS "
+    "and SVG files of the output directory, for web servers which serve "
+    "precompressed files. Uses --jobs processes",
+)
+parser.add_argument(
+    "--brotli",
+    action="store_true",
+    help="With --precompress, also write brotli compressed copies (.br). "
+    "Requires the brotli python module",
+)
+parser.add_argument(
+    "--template-cache-dir",
+    default="",
+    help="Directory to cache the compiled jinja templates in, "
+    "to speed up the next runs",
+)
+parser.add_argument(
+    "--profile-report",
+    default="",
+    help="Write the wall and CPU time of each stage of the generation of "
+    "each bundle (-g), with totals, percentiles and the slowest bundles, "
+    "to a JSON file",
+)
+parser.add_argument(
+    "--profile-slowest",
+    type=int,
+    default=10,
+    help="Number of the slowest bundles in --profile-report (default: 10)",
+)
+parser.add_argument(
+    "--cprofile",
+    action="store_true",
+    help="Profile the run with cProfile. The statistics are written to "
+    "--profile-dir as <mode>.pstats, with a summary in <mode>.txt",
+)
+parser.add_argument(
+    "--tracemalloc",
+    action="store_true",
+    help="Trace the memory allocations of the run with tracemalloc. The "
+    "snapshot is written to --profile-dir as <mode>.tracemalloc, with a "
+    "summary in <mode>.txt",
+)
+parser.add_argument(
+    "--profile-dir",
+    default="aslo4-profile",
+    help="Directory to write the captures of --cprofile and --tracemalloc "
+    "to (default: aslo4-profile)",
+)
+parser.add_argument(
+    "--profile-scope",
+    default=PROFILE_SCOPE_RUN,
+    choices=PROFILE_SCOPES,
+    help="'run' captures the whole run, 'bundles' captures only the "
+    "per-bundle loops of -b, -g and -x (default: run)",
+)
+parser.add_argument(
+    "--profile-top",
+    type=int,
+    default=20,
+    help="Number of functions and allocations in the summaries (default: 20)",
+)
 parser.add_argument("-v", "--verbose", action="store_true", help="More verbose logging")
 parser.add_argument(
     "-p",
@@ -178,6 +302,25 @@ args = parser.parse_args()
 
 DEPENDENCIES_PYTHON2 = ("python2",)
 
+# directories of the output directory which are generated per bundle
+STATIC_DIRECTORIES = ("icons", "bundles", "app", "api")
+
+# name of the build manifest used by --incremental
+BUILD_MANIFEST_FILE_NAME = ".aslo4-manifest.json"
+
+# name of the cache of the sha256 of the bundles
+HASH_CACHE_FILE_NAME = ".aslo4-hashes.json"
+AUTHOR_INDEX_FILE_NAME = ".aslo4-authors.json"
+# dates the bundles last changed, for the lastmod of the sitemap
+LASTMOD_INDEX_FILE_NAME = ".aslo4-lastmod.json"
+COMPRESS_CACHE_FILE_NAME = ".aslo4-compressed.json"
+SEARCH_INDEX_FILE_NAME = "search-index.json"
+# index.json, one fingerprint per line
+INDEX_NDJSON_FILE_NAME = "index.ndjson"
+SEARCH_SHARDS_DIRECTORY = "search"
+# binary index of the updates of the bundles, see aslo4.rdf.index
+UPDATE_INDEX_FILE_NAME = "update-index.bin"
+
 DEPENDENCIES = (
     "git",
     "python3",
@@ -276,6 +419,10 @@ class SaaSBuild:
         self.file_system_loader = FileSystemLoader(
             os.path.join(args.pull_static_css_js_html, "templates")
         )
+        self.template_engine = TemplateEngine(
+            self.file_system_loader, bytecode_cache_dir=args.template_cache_dir
+        )
+        Bundle.git_provider = get_git_provider(args.git_backend)
 
         dependencies = DEPENDENCIES
         if python2:
@@ -285,26 +432,73 @@ class SaaSBuild:
         self.include_screenshots = args.include_screenshots or include_screenshots
         self.include_flatpaks = args.include_flatpaks or include_flatpaks
         self.progress_bar_disabled = args.disable_progress_bar or progress_bar_disabled
-        if args.list_activities or list_activities:
-            activities = self.list_activities()
-            if not activities:
-                # return a bad exit code, if no activities were found
-                print("No activities found")
-                sys.exit(-1)
-            print(activities)
-        else:
-            if args.build_xo or build_xo:
-                self.generate_xo_all()
-            if args.generate_static_html or generate_static_html:
-                self.index = list()
-                self.generate_web_page()
-            if args.generate_sitemap:
-                self.generate_sitemap()
+        # (bundle id, lastmod) of the pages generated by generate_web_page
+        self.sitemap_entries = None
+        # the activity.info read by list_activities, kept in memory for
+        # the other listings of the run, and saved with --scan-cache
+        self.scan_cache = ScanCache(args.scan_cache or None)
+        self.profiler = None
+        if args.cprofile or args.tracemalloc:
+            self.profiler = Profiler(
+                args.profile_dir,
+                cprofile=args.cprofile,
+                trace_malloc=args.tracemalloc,
+                top=args.profile_top,
+            )
+        with self._capture_profile("run", PROFILE_SCOPE_RUN):
+            if args.list_activities or list_activities:
+                activities = self.list_activities(scan_cache=self.scan_cache)
+                if not activities:
+                    # return a bad exit code, if no activities were found
+                    print("No activities found")
+                    sys.exit(-1)
+                print(activities)
+            else:
+                if args.build_xo or build_xo:
+                    self.generate_xo_all()
+                if args.generate_static_html or generate_static_html:
+                    self.index = list()
+                    self.generate_web_page()
+                if args.generate_sitemap:
+                    self.generate_sitemap()
+                if args.precompress:
+                    self.precompress_output()
+
+    def _capture_profile(self, label, scope):
+        """
+        Returns a context manager capturing its block with --cprofile
+        and --tracemalloc as label, if scope is --profile-scope
+        :param label: name of the capture
+        :type label: str
+        :param scope: one of PROFILE_SCOPES
+        :type scope: str
+        :return:
+        :rtype: contextlib.AbstractContextManager
+        """
+        if self.profiler is None or args.profile_scope != scope:
+            return contextlib.nullcontext()
+        return self.profiler.capture(label)
+
+    def _wrap_profile(self, function):
+        """
+        Returns function, profiled by --cprofile when it is run by a
+        thread pool
+        """
+        if self.profiler is None:
+            return function
+        return self.profiler.wrap(function)
 
     @staticmethod
-    def list_activities(path_to_search_xo=None, do_not_search_for_xo=False):
+    def list_activities(
+        path_to_search_xo=None,
+        do_not_search_for_xo=False,
+        scan_cache=None,
+        jobs=args.jobs,
+    ):
         """
         Generates a list<Bundle> of detected activities
+        The activity.info are read by `jobs` processes, unless they are
+        in scan_cache, see aslo4.bundle.scan
         >>> sb = SaaSBuild()
         >>> sb.list_activities()
         :return:
@@ -312,29 +506,12 @@ class SaaSBuild:
         if path_to_search_xo is None:
             path_to_search_xo = args.input_directory
 
-        collected_sugar_activity_dirs = list()
-
-        directory_items = os.listdir(path_to_search_xo)
-        directory_items.sort(reverse=True)
-
-        for bundle_dir in directory_items:
-            # iterate through each activity in the directory
-            full_path = os.path.join(path_to_search_xo, bundle_dir)
-            if os.path.isdir(full_path):
-                activity_info_path = os.path.join(
-                    full_path, "activity", "activity.info"
-                )
-                if os.path.exists(activity_info_path):
-                    # If an activity.info exists, its a valid sugar directory.
-                    # We do not need to add other directories
-                    collected_sugar_activity_dirs.append(Bundle(full_path))
-            elif full_path.endswith(".xo") and not do_not_search_for_xo:
-                if zipfile.is_zipfile(full_path):
-                    # only add the bundle if its a valid zip file
-                    __bundle = Bundle(full_path)
-                    if not __bundle.is_invalid:
-                        # skip invalid bundles to prevent conflict
-                        collected_sugar_activity_dirs.append(__bundle)
+        collected_sugar_activity_dirs = scan_activities(
+            path_to_search_xo,
+            do_not_search_for_xo=do_not_search_for_xo,
+            scan_cache=scan_cache,
+            jobs=jobs,
+        )
 
         logger.debug(
             "[ACTIVITIES] Collected \n{}\n".format(collected_sugar_activity_dirs)
@@ -361,24 +538,70 @@ class SaaSBuild:
         """
         self.index = index
 
+    @staticmethod
+    def _build_activity(activity, build_cache=None, **kwargs):
+        """
+        Builds a single activity and measures the time taken by the build.
+        If a build cache is provided and it has a .xo built from the same
+        sources, the build is skipped and the cached .xo is used instead
+        :param activity: the activity to build
+        :type activity: Bundle
+        :param build_cache: cache of previously built bundles
+        :type build_cache: BuildCache
+        :return: Tuple (activity, e_code, stderr, build time, cached)
+        :rtype: tuple
+        """
+        fingerprint = None
+        if build_cache is not None and not activity.is_xo:
+            fingerprint = activity.get_source_fingerprint(
+                entrypoint_build_command=kwargs.get("entrypoint_build_command"),
+                checkout_latest_tag=kwargs.get("checkout_latest_tag"),
+            )
+            cached_bundle_path = build_cache.lookup(
+                activity.get_activity_dir(), fingerprint
+            )
+            if cached_bundle_path:
+                logger.info("[BUILD] Using cached build of {}".format(activity))
+                activity.set_bundle_path(cached_bundle_path)
+                return activity, 0, "", 0, True
+
+        logger.info("[BUILD] Building {}".format(activity))
+        start_time = time.time()
+        ecode, _, err = activity.do_generate_bundle(**kwargs)
+        build_time = time.time() - start_time
+
+        if fingerprint and not ecode:
+            bundle_path = get_latest_bundle(
+                os.path.join(activity.get_activity_dir(), "dist")
+            )
+            if bundle_path:
+                build_cache.update(
+                    activity.get_activity_dir(), fingerprint, bundle_path
+                )
+        return activity, ecode, err, build_time, False
+
     def generate_xo_all(
         self,
         path_to_search_xo=None,
         checkout_latest_tag=args.always_checkout_latest_tag,
+        jobs=args.jobs,
     ):
         """
         Iteratively generate bundle .xo files for all detected activities
         given by self.list_activities()
+        Upto `jobs` activities are built at the same time
         >>> sb = SaaSBuild()
         >>> sb.generate_xo_all()
         :return:
         """
         # list activities and store as variable
-        activities = self.list_activities(path_to_search_xo)
+        activities = self.list_activities(path_to_search_xo, scan_cache=self.scan_cache)
         logger.debug("Beginning to process... This might take some time..")
         num_encountered_errors = 0
         num_completed_success = 0
         num_completed_warnings = 0
+        num_cached = 0
+        total_build_time = 0
         override = False
         entrypoint_build_script = None
 
@@ -388,52 +611,84 @@ class SaaSBuild:
             if args.build_override:
                 override = True
 
-        for i in check_progressbar(
-            range(len(activities)),
-            redirect_stdout=True,
-            enable_progressbar=not self.progress_bar_disabled,
-        ):
-            logger.info("[BUILD] Building {}".format(activities[i]))
-            # Add an option to provide additional build script
-            ecode, _, err = activities[i].do_generate_bundle(
-                override_dist_xo=override,
-                entrypoint_build_command=entrypoint_build_script,
-                build_command_chdir=args.build_chdir,
-                checkout_latest_tag=checkout_latest_tag,
-            )
-            if err:
-                logger.warning(
-                    "[BUILD][W] {} build completed "
-                    "with warnings.".format(activities[i])
+        build_cache = BuildCache(args.build_cache) if args.build_cache else None
+
+        wall_time_start = time.time()
+        with self._capture_profile(
+            "build-xo", PROFILE_SCOPE_BUNDLES
+        ), concurrent.futures.ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+            futures = [
+                pool.submit(
+                    self._wrap_profile(self._build_activity),
+                    activity,
+                    build_cache=build_cache,
+                    # Add an option to provide additional build script
+                    override_dist_xo=override,
+                    entrypoint_build_command=entrypoint_build_script,
+                    build_command_chdir=args.build_chdir,
+                    checkout_latest_tag=checkout_latest_tag,
                 )
-                num_completed_warnings += 1
-            elif ecode:
-                logger.error(
-                    "[BUILD][E] Error while building {activity} "
-                    "E: {err}. Build exited with exit code: {ecode}".format(
-                        activity=activities[i], err=err, ecode=ecode
+                for activity in activities
+            ]
+            for future in check_progressbar(
+                concurrent.futures.as_completed(futures),
+                max_value=len(futures),
+                redirect_stdout=True,
+                enable_progressbar=not self.progress_bar_disabled,
+            ):
+                activity, ecode, err, build_time, cached = future.result()
+                total_build_time += build_time
+                num_cached += cached
+                if err:
+                    logger.warning(
+                        "[BUILD][W] {} build completed "
+                        "with warnings.".format(activity)
                     )
-                )
-                num_encountered_errors += 1
-            else:
-                num_completed_success += 1
+                    num_completed_warnings += 1
+                elif ecode:
+                    logger.error(
+                        "[BUILD][E] Error while building {activity} "
+                        "E: {err}. Build exited with exit code: {ecode}".format(
+                            activity=activity, err=err, ecode=ecode
+                        )
+                    )
+                    num_encountered_errors += 1
+                else:
+                    num_completed_success += 1
+
+        if build_cache is not None:
+            build_cache.save()
         logger.info(
-            "[BUILD] Created {success} bundles successfully, "
+            "[BUILD] Created {success} bundles successfully "
+            "({cached} from the build cache), "
             "{warn} bundles with warnings and "
             "{failed} with errors".format(
                 success=num_completed_success,
+                cached=num_cached,
                 warn=num_completed_warnings,
                 failed=num_encountered_errors,
             )
         )
+        logger.info(
+            "[BUILD] Wall time: {wall:.2f}s, total build time: {total:.2f}s "
+            "({jobs} jobs)".format(
+                wall=time.time() - wall_time_start,
+                total=total_build_time,
+                jobs=max(jobs, 1),
+            )
+        )
 
     @staticmethod
-    def create_web_static_directories(output_dir):
+    def create_web_static_directories(output_dir, incremental=False):
         """
         Creates the necessary directories
+        Existing directories are removed, unless incremental is True
         """
-        for directory_path in ("icons", "bundles", "app", "api"):
+        for directory_path in STATIC_DIRECTORIES:
             rel_path = os.path.join(output_dir, directory_path)
+            if incremental:
+                os.makedirs(rel_path, exist_ok=True)
+                continue
             if os.path.exists(rel_path):
                 if not args.noconfirm:
                     # ask user for confirmation before removing directory
@@ -471,17 +726,19 @@ class SaaSBuild:
         return tags_html_list
 
     @staticmethod
-    def _process_authors_html(bundle):
+    def _process_authors_html(bundle, author_index=None):
         """
         Retrieves authors from get_authors, and creates_html
         :param bundle: Bundle
         :type bundle: Bundle
+        :param author_index: cache of the authors of the git repositories
+        :type author_index: AuthorIndex
         :return:
         :rtype:
         """
         # Get the authors and process it
 
-        authors = bundle.get_authors()
+        authors = bundle.get_authors(author_index=author_index)
         authors_html_list = []
         for author in authors:
             authors_html_list.append(
@@ -541,14 +798,59 @@ class SaaSBuild:
         return html_parsed_licenses
 
     @staticmethod
-    def _process_screenshot_carousel_html(bundle, screenshots_list, output_dir):
+    def _copy_screenshots(
+        bundle, screenshots_list, output_dir, strategy=COPY, hash_cache=None
+    ):
+        """
+        Copies the screenshots of the bundle to app/<bundle_id>/, and
+        removes the screenshots which are no longer part of the bundle
+        :param bundle:
+        :type bundle: Bundle
+        :param screenshots_list: screenshots returned by get_screenshots
+        :type screenshots_list: list
+        :param output_dir: output directory
+        :type output_dir: str
+        :param strategy: how the screenshots are published,
+        see aslo4.lib.publish
+        :type strategy: str
+        :param hash_cache: cache of the sha256 of the files
+        :type hash_cache: HashCache
+        :return: None
+        :rtype: None
+        """
+        screenshot_dir = os.path.join(output_dir, "app", bundle.get_bundle_id())
+        os.makedirs(screenshot_dir, exist_ok=True)
+        file_names = set()
+        for screenshot in screenshots_list:
+            file_names.add(os.path.basename(screenshot))
+            bundle.write_screenshot(
+                screenshot,
+                os.path.join(screenshot_dir, os.path.basename(screenshot)),
+                strategy=strategy,
+                hash_cache=hash_cache,
+            )
+        for file_name in os.listdir(screenshot_dir):
+            if file_name not in file_names:
+                path = os.path.join(screenshot_dir, file_name)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+
+    @staticmethod
+    def _process_screenshot_carousel_html(bundle, screenshots_list):
+        """
+        Creates the carousel HTML for the screenshots, which are expected
+        to be copied to app/<bundle_id>/ by _copy_screenshots
+        :param bundle:
+        :type bundle: Bundle
+        :param screenshots_list: paths to the screenshots
+        :type screenshots_list: list
+        :return:
+        :rtype: str
+        """
         carousel_indicators = list()
         carousel_images = list()
-        # copy files to their respective folders
-        screenshot_dir = os.path.join(output_dir, "app", bundle.get_bundle_id())
-        if os.path.exists(screenshot_dir):
-            shutil.rmtree(screenshot_dir, ignore_errors=True)
-        os.makedirs(screenshot_dir)
         for i, screenshot in enumerate(screenshots_list):
             active = ""
             if i == 0:
@@ -557,10 +859,8 @@ class SaaSBuild:
                 CAROUSEL_INDICATOR_HTML_TEMPLATE.format(i=i + 1, active=active)
             )
 
-            _screenshot_path = os.path.sep.join(
-                shutil.copy2(screenshot, screenshot_dir, follow_symlinks=True).split(
-                    os.path.sep
-                )[-2:]
+            _screenshot_path = os.path.join(
+                bundle.get_bundle_id(), os.path.basename(screenshot)
             )
 
             carousel_images.append(
@@ -577,176 +877,307 @@ class SaaSBuild:
         )
         return carousel_div
 
-    def generate_sitemap(self, domain=args.generate_sitemap):
+    @staticmethod
+    def precompress_output(
+        output_dir=args.output_directory, brotli=args.brotli, jobs=args.jobs
+    ):
         """
-        Generates sitemap.xml
+        Writes precompressed copies of the text files of the output
+        directory, skipping the files which did not change since the
+        last run
+        :param output_dir: output directory
+        :type output_dir: str
+        :param brotli: also write .br files
+        :type brotli: bool
+        :param jobs: number of processes
+        :type jobs: int
+        :return: None
+        :rtype: None
         """
-        output_dir = args.output_directory
+        logger.info("[COMPRESS] Precompressing {}".format(output_dir))
+        start_time = time.time()
+        hash_cache = HashCache(os.path.join(output_dir, HASH_CACHE_FILE_NAME))
+        cache = JsonCache(os.path.join(output_dir, COMPRESS_CACHE_FILE_NAME))
+        compressed, skipped = precompress_directory(
+            output_dir,
+            cache,
+            hash_cache,
+            formats=(GZIP, BROTLI) if brotli else (GZIP,),
+            jobs=jobs,
+        )
+        cache.save()
+        hash_cache.save()
+        logger.info(
+            "[COMPRESS] {} files compressed, {} unchanged files skipped "
+            "in {:.2f}s".format(compressed, skipped, time.time() - start_time)
+        )
 
-        # get the bundles
-        bundles = self.list_activities()
-        sitemap_content = list()
-        current_formatted_time = time.strftime("%Y-%m-%d")
-        for bundle in check_progressbar(
-            bundles,
-            redirect_stdout=True,
-            enable_progressbar=not self.progress_bar_disabled,
-        ):
+    @staticmethod
+    def _get_bundle_created_date(bundle, bundle_path):
+        """
+        Returns the W3C date the bundle was created: the date of its
+        activity.info for a .xo, else the modification time of the .xo
+        :param bundle:
+        :type bundle: Bundle
+        :param bundle_path: path to the .xo of the bundle
+        :type bundle_path: str
+        :return: YYYY-MM-DD
+        :rtype: str
+        """
+        created = bundle.get_bundle_created_time()
+        if created is not None:
+            return "{:04d}-{:02d}-{:02d}".format(*created[:3])
+        return time.strftime("%Y-%m-%d", time.gmtime(os.stat(bundle_path).st_mtime))
 
-            # get the bundle and icon path
-            # bundle_path = bundle.get_bundle_path()
-            # icon_path = bundle.get_icon_path()
-            sitemap_content.append(
-                SITEMAP_URL.format(
-                    url="{domain}/app/{bundle_name}.html".format(
-                        domain=domain, bundle_name=bundle.get_bundle_id()
+    def generate_sitemap(
+        self, domain=args.generate_sitemap, output_dir=args.output_directory
+    ):
+        """
+        Generates sitemap.xml, from the pages generated by
+        generate_web_page in this run, or else in the last run. The urls
+        are streamed to the sitemap, which is split into shards listed by
+        a sitemap index past 50,000 urls or 50 MB, see aslo4.lib.sitemap
+        """
+        entries = self.sitemap_entries
+        if entries is None:
+            lastmod_index = LastmodIndex(
+                os.path.join(output_dir, LASTMOD_INDEX_FILE_NAME)
+            )
+            entries = [(k, v["lastmod"]) for k, v in lastmod_index.data.items()]
+        if not entries:
+            logger.warning(
+                "[SITEMAP] No pages were generated in {}, "
+                "listing the activities".format(output_dir)
+            )
+            entries = [
+                (
+                    bundle.get_bundle_id(),
+                    self._get_bundle_created_date(bundle, bundle.get_bundle_path()),
+                )
+                for bundle in self.list_activities(scan_cache=self.scan_cache)
+                if bundle.get_bundle_path()
+            ]
+
+        with self._capture_profile(
+            "generate-sitemap", PROFILE_SCOPE_BUNDLES
+        ), SitemapWriter(output_dir, domain) as sitemap:
+            for bundle_id, lastmod in check_progressbar(
+                entries,
+                redirect_stdout=True,
+                enable_progressbar=not self.progress_bar_disabled,
+            ):
+                sitemap.add(
+                    "{domain}/app/{bundle_name}.html".format(
+                        domain=domain, bundle_name=bundle_id
                     ),
-                    lastmod=current_formatted_time,
-                    changefreq="weekly",
+                    lastmod,
                 )
+        logger.info("sitemap.xml written successfully ({} urls)".format(sitemap.count))
+
+    @staticmethod
+    def _get_site_inputs_digest(
+        hash_cache, flatpak_file=None, include_screenshots=False
+    ):
+        """
+        Returns a digest of the inputs shared by the pages of all the
+        bundles: the templates, the catalog configuration, flatpak.json
+        and the options which change the generated pages
+        :param hash_cache: cache of the sha256 of the files
+        :type hash_cache: HashCache
+        :param flatpak_file: path to flatpak.json, if flatpaks are included
+        :type flatpak_file: str
+        :param include_screenshots: if screenshots are included
+        :type include_screenshots: bool
+        :return: hex digest
+        :rtype: str
+        """
+        sha256 = hashlib.sha256()
+        sha256.update(
+            json.dumps(
+                {
+                    "version": __version__,
+                    "unique_icons": args.unique_icons,
+                    "include_screenshots": include_screenshots,
+                    "domain": args.generate_sitemap,
+                }
+            ).encode()
+        )
+        input_files = list()
+        templates_dir = os.path.join(args.pull_static_css_js_html, "templates")
+        if os.path.isdir(templates_dir):
+            input_files.extend(
+                os.path.join(templates_dir, x)
+                for x in sorted(os.listdir(templates_dir))
             )
-        with open(os.path.join(output_dir, "sitemap.xml"), "w") as w:
-            w.write(SITEMAP_HEADER.format(content="".join(sitemap_content)))
-        logger.info("sitemap.xml written successfully")
+        if os.getenv("ASLOv4_CONFIG_YML"):
+            input_files.append(os.getenv("ASLOv4_CONFIG_YML"))
+        if flatpak_file:
+            input_files.append(flatpak_file)
+        for input_file in input_files:
+            sha256.update(input_file.encode())
+            if os.path.isfile(input_file):
+                sha256.update(hash_cache.get_sha256(input_file).encode())
+        return sha256.hexdigest()
 
-    def generate_web_page(
+    @staticmethod
+    def _get_bundle_inputs_digest(bundle, site_inputs_digest, hash_cache):
+        """
+        Returns a digest of the inputs of the pages of a bundle, and
+        a digest of its .xo
+        :param bundle:
+        :type bundle: Bundle
+        :param site_inputs_digest: see _get_site_inputs_digest
+        :type site_inputs_digest: str
+        :param hash_cache: cache of the sha256 of the files
+        :type hash_cache: HashCache
+        :return: Tuple (inputs digest, .xo digest)
+        :rtype: tuple
+        """
+        bundle_digest = hash_cache.get_sha256(bundle.get_bundle_path())
+        sha256 = hashlib.sha256()
+        sha256.update(site_inputs_digest.encode())
+        sha256.update(bundle.get_activity_dir().encode())
+        sha256.update(bundle_digest.encode())
+        if not bundle.is_xo:
+            # the NEWS and git metadata are read from the activity
+            # directory, not from the .xo
+            sha256.update(str(bundle.get_git_head()).encode())
+            sha256.update(str(bundle.get_changelog()).encode())
+            with open(bundle.activity_info_path, "rb") as fp:
+                sha256.update(fp.read())
+        return sha256.hexdigest(), bundle_digest
+
+    def _render_bundle(
         self,
-        output_dir=args.output_directory,
-        include_flatpaks=False,
-        include_screenshots=False,
+        bundle,
+        output_dir,
+        flatpak_bundle_info,
+        include_screenshots,
+        hash_cache,
+        manifest=None,
+        site_inputs_digest=None,
+        author_index=None,
     ):
         """
-        Generates web page static files
+        Collects the information of the bundle and renders its HTML page
+        and RDF. Nothing is written to the output directory, so that
+        bundles can be rendered concurrently; see _write_rendered_bundle
+        If a build manifest is provided, bundles whose outputs are up to
+        date are not rendered again
+        :param bundle:
+        :type bundle: Bundle
+        :param hash_cache: cache of the sha256 of the files
+        :type hash_cache: HashCache
+        :param manifest: build manifest of the output directory
+        :type manifest: BuildManifest
+        :param site_inputs_digest: digest of the inputs shared by all bundles
+        :type site_inputs_digest: str
+        :param author_index: cache of the authors of the git repositories
+        :type author_index: AuthorIndex
+        :return: the rendered bundle, None if the bundle has no .xo
+        :rtype: Union[dict, None]
         """
-        include_flatpaks = include_flatpaks or self.include_flatpaks
-        include_screenshots = include_screenshots or self.include_screenshots
-        flatpak_file = os.path.join(os.path.dirname(__file__), "data", "flatpak.json")
-        flatpak_bundle_info = dict()
-
-        os.makedirs(output_dir, exist_ok=True)
+        logger.debug("[STATIC][{}] Starting build".format(bundle.get_name()))
+        # get the bundle and icon path
+        bundle_path = bundle.get_bundle_path()
 
-        # check if feed.json exists, if not create it
-        feed_json = os.path.join(output_dir, "feed.json")
-        if not os.path.exists(feed_json):
-            with open(feed_json, "w") as fp:
-                json.dump(
-                    {
-                        "generated": time.time(),
-                        "bundles": {},
-                    },
-                    fp,
-                )
-
-        with open(feed_json) as fp:
-            feed_json_data = json.load(fp)
-
-        logger.info("[STATIC] Starting Web Page Static Generation")
-
-        if include_flatpaks and os.path.exists(flatpak_file):
-            logger.info("[STATIC] Reading flatpak.json")
-            with open(flatpak_file, "r") as r:
-                flatpak_bundle_info = json.load(r)
-        elif include_flatpaks:
-            logger.error(
-                "[ERR] flatpak.json was not found in data/.; "
-                "Please get a new copy from the source"
+        if not bundle_path:
+            logger.debug(
+                "[STATIC][{}] Valid dist *.xo was not found. "
+                "Skipping .".format(bundle.get_name())
             )
-            logger.error("[ERR] Ignoring error and continuing to process bundles. ")
-
-        output_icon_dir = os.path.join(output_dir, "icons")
-        output_bundles_dir = os.path.join(output_dir, "bundles")
-        logger.info("[STATIC] Output directory:{}".format(output_dir))
-        logger.info("[STATIC] Output icon directory:{}".format(output_icon_dir))
-        logger.info("[STATIC] Output bundle directory:{}".format(output_bundles_dir))
-
-        # create the directories
-        logger.info("[STATIC] Creating static directories: [icons, bundles, app]")
-        self.create_web_static_directories(output_dir)
-
-        # get the bundles
-        bundles = self.list_activities()
-        for bundle in check_progressbar(
-            bundles,
-            redirect_stdout=True,
-            enable_progressbar=not self.progress_bar_disabled,
-        ):
-            logger.debug("[STATIC][{}] Starting build".format(bundle.get_name()))
-            # get the bundle and icon path
-            bundle_path = bundle.get_bundle_path()
-            icon_path = bundle.get_icon_path()
-
-            if not bundle_path:
-                logger.debug(
-                    "[STATIC][{}] Valid dist *.xo was not found. "
-                    "Skipping .".format(bundle.get_name())
+            # the path to a bundle does not exist
+            # possibly the bundle was not generated / had bugs
+            return None
+
+        # timed stages of the bundle, see --profile-report
+        timings = BundleTimings(bundle.get_bundle_id())
+        inputs_digest = None
+        bundle_digest = None
+        if manifest is not None:
+            with timings.stage("digest"):
+                inputs_digest, bundle_digest = self._get_bundle_inputs_digest(
+                    bundle, site_inputs_digest, hash_cache
                 )
-                # the path to a bundle does not exist
-                # possibly the bundle was not generated / had bugs
-                continue
-
-            logger.debug("[STATIC][{}] Processing tags".format(bundle.get_name()))
+                up_to_date = manifest.is_up_to_date(
+                    bundle.get_activity_dir(), inputs_digest, output_dir
+                )
+            if up_to_date:
+                logger.debug("[STATIC][{}] Up to date".format(bundle.get_name()))
+                with timings.stage("rdf"):
+                    update = self._get_rdf(bundle, bundle_path, hash_cache).get_update()
+                with timings.stage("json"):
+                    fingerprint = bundle.generate_fingerprint_json(
+                        unique_icons=args.unique_icons
+                    )
+                return {
+                    "up_to_date": True,
+                    "update": update,
+                    "fingerprint": fingerprint,
+                    "timings": timings,
+                }
+
+        logger.debug("[STATIC][{}] Processing tags".format(bundle.get_name()))
+        with timings.stage("tags"):
             tags_html_list = self._process_tags_html(bundle)
 
-            # Get the authors and process it
-            logger.debug("[STATIC][{}] Processing authors".format(bundle.get_name()))
-            authors_html_list = self._process_authors_html(bundle)
+        # Get the authors and process it
+        logger.debug("[STATIC][{}] Processing authors".format(bundle.get_name()))
+        with timings.stage("authors"):
+            authors_html_list = self._process_authors_html(
+                bundle, author_index=author_index
+            )
 
-            # Changelog gen
-            logger.debug("[STATIC][{}] Processing news".format(bundle.get_name()))
+        # Changelog gen
+        logger.debug("[STATIC][{}] Processing news".format(bundle.get_name()))
+        with timings.stage("news"):
             changelog_latest_version = bundle.get_news()
             new_in_this_version_raw_html = self._process_changelog_html(
                 changelog_latest_version
             )
 
-            # changelog all
-            logger.debug(
-                "[STATIC][{}] " "Processing changelog".format(bundle.get_name())
-            )
+        # changelog all
+        logger.debug("[STATIC][{}] " "Processing changelog".format(bundle.get_name()))
+        with timings.stage("changelog"):
             changelog = bundle.get_changelog()
             if changelog:
                 changelog = html.escape(changelog)
 
-            # get Licenses
-            logger.debug("[STATIC][{}] Processing Licenses".format(bundle.get_name()))
+        # get Licenses
+        logger.debug("[STATIC][{}] Processing Licenses".format(bundle.get_name()))
+        with timings.stage("licenses"):
             html_parsed_licenses = self._process_licenses_html(bundle)
 
-            # copy deps to respective folders
-            logger.debug(
-                "[STATIC][{}] " "Copying Dependencies".format(bundle.get_name())
-            )
-            _bundle_path = shutil.copy2(
-                bundle_path, output_bundles_dir, follow_symlinks=True
+        # the dependencies are copied by _write_rendered_bundle
+        _bundle_path = os.path.join(
+            output_dir, "bundles", os.path.basename(bundle_path)
+        )
+        if args.unique_icons:
+            _icon_path = os.path.join(
+                output_dir, "icons", "{}.svg".format(bundle.get_bundle_id())
             )
-            if args.unique_icons:
-                _icon_path = shutil.copy2(
-                    icon_path,
-                    os.path.join(
-                        output_icon_dir, "{}.svg".format(bundle.get_bundle_id())
-                    ),
-                    follow_symlinks=True,
-                )
-            else:
-                _icon_path = shutil.copy2(
-                    icon_path, output_icon_dir, follow_symlinks=True
-                )
+        else:
+            _icon_path = os.path.join(output_dir, "icons", bundle.get_icon_file_name())
 
-            # get git url
-            logger.debug(
-                "[STATIC][{}] "
-                "Getting URL to git repository".format(bundle.get_name())
-            )
-            bundle_git_url_stripped = bundle.get_git_url()
-            if (
-                isinstance(bundle_git_url_stripped, str)
-                and bundle_git_url_stripped[-4:] == ".git"
-            ):
-                bundle_git_url_stripped = bundle_git_url_stripped[:-4]
+        # get git url
+        logger.debug(
+            "[STATIC][{}] " "Getting URL to git repository".format(bundle.get_name())
+        )
+        with timings.stage("git url"):
+            bundle_git_url = bundle.get_git_url()
+        bundle_git_url_stripped = bundle_git_url
+        if (
+            isinstance(bundle_git_url_stripped, str)
+            and bundle_git_url_stripped[-4:] == ".git"
+        ):
+            bundle_git_url_stripped = bundle_git_url_stripped[:-4]
 
-            # check if flatpak is supported
-            logger.debug(
-                "[STATIC][{}] " "Checking flatpak support".format(bundle.get_name())
-            )
-            if include_flatpaks and flatpak_bundle_info.get(bundle_git_url_stripped):
+        # check if flatpak is supported
+        logger.debug(
+            "[STATIC][{}] " "Checking flatpak support".format(bundle.get_name())
+        )
+        with timings.stage("flatpak"):
+            if flatpak_bundle_info.get(bundle_git_url_stripped):
                 flatpak_html_div = FLATPAK_HTML_TEMPLATE.format(
                     activity_name=bundle.get_name(),
                     bundle_id=flatpak_bundle_info.get(bundle_git_url_stripped)[
@@ -756,45 +1187,38 @@ class SaaSBuild:
             else:
                 flatpak_html_div = ""
 
-            # if screenshots need to be added as in a carousel, add them
-            logger.debug("[STATIC][{}] Adding screenshots".format(bundle.get_name()))
-            carousel_div = ""
-            screenshots_list = bundle.get_screenshots()
-            if include_screenshots and len(screenshots_list) >= 1:
+        # if screenshots need to be added as in a carousel, add them
+        logger.debug("[STATIC][{}] Adding screenshots".format(bundle.get_name()))
+        carousel_div = ""
+        with timings.stage("screenshots"):
+            screenshots_list = bundle.get_screenshots() if include_screenshots else []
+            if len(screenshots_list) >= 1:
                 carousel_div = self._process_screenshot_carousel_html(
-                    bundle, screenshots_list, output_dir
-                )
-
-            if len(new_in_this_version_raw_html):
-                new_in_this_version_parsed = NEW_FEATURE_HTML_TEMPLATE.format(
-                    new_features="".join(new_in_this_version_raw_html)
+                    bundle, screenshots_list
                 )
-            else:
-                new_in_this_version_parsed = ""
 
-            if changelog and isinstance(changelog, str) and changelog.strip():
-                changelog_formatted_html = CHANGELOG_HTML_TEMPLATE.format(
-                    changelog=changelog
-                )
-            else:
-                changelog_formatted_html = ""
-
-            # get the HTML_TEMPLATE and annotate with the saved
-            # information
-            logger.debug(
-                "[STATIC][{}] Generating static HTML".format(bundle.get_name())
+        if len(new_in_this_version_raw_html):
+            new_in_this_version_parsed = NEW_FEATURE_HTML_TEMPLATE.format(
+                new_features="".join(new_in_this_version_raw_html)
             )
-            output_html_file_name_path = os.path.join(
-                output_dir, "app", "{}.html".format(bundle.get_bundle_id())
+        else:
+            new_in_this_version_parsed = ""
+
+        if changelog and isinstance(changelog, str) and changelog.strip():
+            changelog_formatted_html = CHANGELOG_HTML_TEMPLATE.format(
+                changelog=changelog
             )
-            # write the html file to specified path
-            logger.debug("[STATIC][{}] Writing static HTML".format(bundle.get_name()))
-            read_parse_and_write_template(
-                file_system_loader=self.file_system_loader,
+        else:
+            changelog_formatted_html = ""
+
+        # get the HTML_TEMPLATE and annotate with the saved
+        # information
+        logger.debug("[STATIC][{}] Generating static HTML".format(bundle.get_name()))
+        with timings.stage("render"):
+            rendered_html = self.template_engine.render(
                 html_template_path=os.path.join(
                     args.pull_static_css_js_html, "templates", "app.html"
                 ),
-                html_output_path=output_html_file_name_path,
                 title=bundle.get_name(),
                 version=bundle.get_version(),
                 summary=bundle.get_summary(),
@@ -808,80 +1232,380 @@ class SaaSBuild:
                 icon_path="/icons/{}".format(_icon_path.split(os.path.sep)[-1]),
                 new_feature_html_div=new_in_this_version_parsed,
                 changelog_html_div=changelog_formatted_html,
-                git_url=bundle.get_git_url(),
+                git_url=bundle_git_url,
                 flatpak_html_div=flatpak_html_div,
                 carousel=carousel_div,
             )
 
-            logger.debug("[STATIC][{}] Generating RDF data".format(bundle.get_name()))
-            domain = (
-                args.generate_sitemap
-                if args.generate_sitemap
-                else "https://activities.sugarlabs.org"
+        logger.debug("[STATIC][{}] Generating RDF data".format(bundle.get_name()))
+        with timings.stage("rdf"):
+            rdf = self._get_rdf(bundle, bundle_path, hash_cache)
+            update = rdf.get_update()
+            parsed_rdf = rdf.parse(update)
+
+        with timings.stage("json"):
+            fingerprint = bundle.generate_fingerprint_json(
+                unique_icons=args.unique_icons
             )
-            rdf = RDF(
-                bundle_id=bundle.get_bundle_id(),
-                bundle_version=bundle.get_version(),
-                bundle_path=bundle_path,
-                min_version="0.116",
-                max_version="0.117",
-                base_url="{domain}/bundles".format(domain=domain),
-                info_url="{domain}/app".format(domain=domain),
+
+        return {
+            "up_to_date": False,
+            "inputs_digest": inputs_digest,
+            "bundle_digest": bundle_digest,
+            "bundle_path": bundle_path,
+            "output_bundle_path": _bundle_path,
+            "output_icon_path": _icon_path,
+            "screenshots": screenshots_list,
+            "html": rendered_html,
+            "rdf": parsed_rdf,
+            "update": update,
+            "fingerprint": fingerprint,
+            "timings": timings,
+        }
+
+    @staticmethod
+    def _get_rdf(bundle, bundle_path, hash_cache=None):
+        """
+        Returns the RDF of the bundle
+        :param bundle:
+        :type bundle: Bundle
+        :param bundle_path: path to the .xo of the bundle
+        :type bundle_path: str
+        :param hash_cache: cache of the sha256 of the files
+        :type hash_cache: HashCache
+        :return:
+        :rtype: RDF
+        """
+        domain = (
+            args.generate_sitemap
+            if args.generate_sitemap
+            else "https://activities.sugarlabs.org"
+        )
+        return RDF(
+            bundle_id=bundle.get_bundle_id(),
+            bundle_version=bundle.get_version(),
+            bundle_path=bundle_path,
+            min_version="0.116",
+            max_version="0.117",
+            base_url="{domain}/bundles".format(domain=domain),
+            info_url="{domain}/app".format(domain=domain),
+            hash_cache=hash_cache,
+        )
+
+    def _write_rendered_bundle(
+        self,
+        bundle,
+        rendered_bundle,
+        output_dir,
+        manifest=None,
+        publish_strategy=COPY,
+        hash_cache=None,
+    ):
+        """
+        Copies the dependencies of a bundle rendered by _render_bundle and
+        writes its HTML page and RDF to the output directory
+        The written files are recorded in the build manifest, if provided
+        :param bundle:
+        :type bundle: Bundle
+        :param rendered_bundle: the bundle rendered by _render_bundle
+        :type rendered_bundle: dict
+        :param output_dir: output directory
+        :type output_dir: str
+        :param manifest: build manifest of the output directory
+        :type manifest: BuildManifest
+        :param publish_strategy: how the bundle, its icon and screenshots
+        are published, see aslo4.lib.publish
+        :type publish_strategy: str
+        :param hash_cache: cache of the sha256 of the files
+        :type hash_cache: HashCache
+        :return: None
+        :rtype: None
+        """
+        if rendered_bundle["up_to_date"]:
+            return
+
+        html_path = os.path.join(
+            output_dir, "app", "{}.html".format(bundle.get_bundle_id())
+        )
+        rdf_path = os.path.join(
+            output_dir, "api", "{}.xml".format(bundle.get_bundle_id())
+        )
+        output_bundle_path = os.path.relpath(
+            rendered_bundle["output_bundle_path"], output_dir
+        )
+
+        timings = rendered_bundle["timings"]
+
+        # copy deps to respective folders
+        logger.debug("[STATIC][{}] " "Copying Dependencies".format(bundle.get_name()))
+        with timings.stage("copy"):
+            if (
+                manifest is None
+                or manifest.get_output_digest(output_bundle_path)
+                != rendered_bundle["bundle_digest"]
+                or not os.path.exists(rendered_bundle["output_bundle_path"])
+            ):
+                publish_file(
+                    rendered_bundle["bundle_path"],
+                    rendered_bundle["output_bundle_path"],
+                    strategy=publish_strategy,
+                    hash_cache=hash_cache,
+                )
+            bundle.write_icon(
+                rendered_bundle["output_icon_path"],
+                strategy=publish_strategy,
+                hash_cache=hash_cache,
             )
-            parsed_rdf = rdf.parse()
+            if rendered_bundle["screenshots"]:
+                self._copy_screenshots(
+                    bundle,
+                    rendered_bundle["screenshots"],
+                    output_dir,
+                    strategy=publish_strategy,
+                    hash_cache=hash_cache,
+                )
+
+        # write the html file to specified path
+        logger.debug("[STATIC][{}] Writing static HTML".format(bundle.get_name()))
+        with timings.stage("write"):
+            with open(html_path, "w") as w:
+                w.write(rendered_bundle["html"])
 
             logger.debug("[STATIC][{}] Writing RDF".format(bundle.get_name()))
-            with open(
-                os.path.join(
-                    output_dir, "api", "{}.xml".format(bundle.get_bundle_id())
-                ),
-                "w",
-            ) as w:
-                w.write(parsed_rdf)
-
-            # update the index files
-            logger.debug("[STATIC][{}] Adding JSON".format(bundle.get_name()))
-            self.index.append(
-                bundle.generate_fingerprint_json(unique_icons=args.unique_icons)
+            with open(rdf_path, "w") as w:
+                w.write(rendered_bundle["rdf"])
+
+        if manifest is not None:
+            inputs_digest = rendered_bundle["inputs_digest"]
+            outputs = {
+                output_bundle_path: rendered_bundle["bundle_digest"],
+                os.path.relpath(html_path, output_dir): inputs_digest,
+                os.path.relpath(rdf_path, output_dir): inputs_digest,
+                os.path.relpath(
+                    rendered_bundle["output_icon_path"], output_dir
+                ): inputs_digest,
+            }
+            for screenshot in rendered_bundle["screenshots"]:
+                outputs[
+                    os.path.join(
+                        "app", bundle.get_bundle_id(), os.path.basename(screenshot)
+                    )
+                ] = inputs_digest
+            manifest.update(bundle.get_activity_dir(), inputs_digest, outputs)
+
+    def generate_web_page(
+        self,
+        output_dir=args.output_directory,
+        include_flatpaks=False,
+        include_screenshots=False,
+        jobs=args.jobs,
+        incremental=args.incremental,
+        publish_strategy=args.publish_strategy,
+        profile_report=args.profile_report,
+    ):
+        """
+        Generates web page static files
+        Upto `jobs` bundles are rendered at the same time
+        If incremental is True, only the bundles whose inputs changed since
+        the last run are rendered again
+        The bundles, icons and screenshots are published to the output
+        directory with publish_strategy, see aslo4.lib.publish
+        If profile_report is a path, the time spent in each stage of each
+        bundle is written to it, see aslo4.lib.timing
+        """
+        report = ProfileReport(slowest=args.profile_slowest) if profile_report else None
+        include_flatpaks = include_flatpaks or self.include_flatpaks
+        include_screenshots = include_screenshots or self.include_screenshots
+        flatpak_file = os.path.join(os.path.dirname(__file__), "data", "flatpak.json")
+        flatpak_bundle_info = dict()
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        # check if feed.json exists, if not create it
+        feed_json = os.path.join(output_dir, "feed.json")
+        if not os.path.exists(feed_json):
+            with open(feed_json, "w") as fp:
+                json.dump(
+                    {
+                        "generated": time.time(),
+                        "bundles": {},
+                    },
+                    fp,
+                )
+
+        with open(feed_json) as fp:
+            feed_json_data = json.load(fp)
+
+        logger.info("[STATIC] Starting Web Page Static Generation")
+
+        if include_flatpaks and os.path.exists(flatpak_file):
+            logger.info("[STATIC] Reading flatpak.json")
+            with open(flatpak_file, "r") as r:
+                flatpak_bundle_info = json.load(r)
+        elif include_flatpaks:
+            logger.error(
+                "[ERR] flatpak.json was not found in data/.; "
+                "Please get a new copy from the source"
             )
+            logger.error("[ERR] Ignoring error and continuing to process bundles. ")
 
-            # check the database and then update if necessary
-            # this will help to check if new bundles are created, and then
-            # accordingly call a hook.
-            bundle_id = bundle.get_bundle_id()
-            bundle_version = bundle.get_version()
+        output_icon_dir = os.path.join(output_dir, "icons")
+        output_bundles_dir = os.path.join(output_dir, "bundles")
+        logger.info("[STATIC] Output directory:{}".format(output_dir))
+        logger.info("[STATIC] Output icon directory:{}".format(output_icon_dir))
+        logger.info("[STATIC] Output bundle directory:{}".format(output_bundles_dir))
 
-            saved_bundle_version = feed_json_data["bundles"].get(bundle_id)
-            saved_bundle_version = (
-                0 if saved_bundle_version is None else saved_bundle_version
+        # create the directories
+        logger.info("[STATIC] Creating static directories: [icons, bundles, app]")
+        self.create_web_static_directories(output_dir, incremental=incremental)
+
+        hash_cache = HashCache(os.path.join(output_dir, HASH_CACHE_FILE_NAME))
+        author_index = AuthorIndex(os.path.join(output_dir, AUTHOR_INDEX_FILE_NAME))
+        lastmod_index = LastmodIndex(os.path.join(output_dir, LASTMOD_INDEX_FILE_NAME))
+        self.sitemap_entries = list()
+        # the fingerprints are written to the disk as the bundles are
+        # rendered, instead of being kept in memory until the end
+        index = IndexWriter(
+            os.path.join(output_dir, "index.json"),
+            os.path.join(output_dir, INDEX_NDJSON_FILE_NAME),
+        )
+        index.extend(self.get_index())
+        self.index = index
+        manifest = None
+        site_inputs_digest = None
+        if incremental:
+            manifest = BuildManifest(os.path.join(output_dir, BUILD_MANIFEST_FILE_NAME))
+            site_inputs_digest = self._get_site_inputs_digest(
+                hash_cache,
+                flatpak_file=flatpak_file if include_flatpaks else None,
+                include_screenshots=include_screenshots,
             )
-            should_create_release_email = saved_bundle_version != bundle_version
-            try:
-                should_create_release_email = float(saved_bundle_version) < float(
-                    bundle_version
+
+        # get the bundles
+        bundles = self.list_activities(scan_cache=self.scan_cache)
+        updates = list()
+        render_bundle = functools.partial(
+            self._wrap_profile(self._render_bundle),
+            output_dir=output_dir,
+            flatpak_bundle_info=flatpak_bundle_info if include_flatpaks else {},
+            include_screenshots=include_screenshots,
+            hash_cache=hash_cache,
+            manifest=manifest,
+            site_inputs_digest=site_inputs_digest,
+            author_index=author_index,
+        )
+        with self._capture_profile(
+            "generate-static-html", PROFILE_SCOPE_BUNDLES
+        ), concurrent.futures.ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+            # the bundles are rendered concurrently, but the results are
+            # written in the order of the bundles, so that the output is
+            # the same as if the bundles were rendered one after another.
+            # Only a few bundles are rendered ahead of the one being
+            # written, so that the memory used does not grow with the
+            # catalog when writing is slower than rendering
+            rendered_bundles = map_bounded(
+                pool, render_bundle, bundles, max_pending=2 * max(jobs, 1)
+            )
+            for bundle, rendered_bundle in check_progressbar(
+                zip(bundles, rendered_bundles),
+                max_value=len(bundles),
+                redirect_stdout=True,
+                enable_progressbar=not self.progress_bar_disabled,
+            ):
+                if rendered_bundle is None:
+                    continue
+                self._write_rendered_bundle(
+                    bundle,
+                    rendered_bundle,
+                    output_dir,
+                    manifest=manifest,
+                    publish_strategy=publish_strategy,
+                    hash_cache=hash_cache,
                 )
-            except ValueError:
-                pass
 
-            if should_create_release_email:
-                print(
-                    "[STATIC][FEED][{}] New release detected {}".format(
-                        bundle_id, bundle_version
+                # update the index files
+                logger.debug("[STATIC][{}] Adding JSON".format(bundle.get_name()))
+                self.index.append(rendered_bundle["fingerprint"])
+                updates.append(rendered_bundle["update"])
+                if report is not None:
+                    report.add(rendered_bundle["timings"])
+
+                # check the database and then update if necessary
+                # this will help to check if new bundles are created, and then
+                # accordingly call a hook.
+                bundle_id = bundle.get_bundle_id()
+                self.sitemap_entries.append(
+                    (
+                        bundle_id,
+                        lastmod_index.get_lastmod(
+                            bundle_id,
+                            rendered_bundle["update"]["sha256"],
+                            self._get_bundle_created_date(
+                                bundle, bundle.get_bundle_path()
+                            ),
+                        ),
                     )
                 )
-                feed_json_data["bundles"][bundle_id] = bundle_version
-                # handle any items like sending emails to the respective
-                self.new_version_detected_hook(bundle)
+                bundle_version = bundle.get_version()
+
+                saved_bundle_version = feed_json_data["bundles"].get(bundle_id)
+                saved_bundle_version = (
+                    0 if saved_bundle_version is None else saved_bundle_version
+                )
+                should_create_release_email = saved_bundle_version != bundle_version
+                try:
+                    should_create_release_email = float(saved_bundle_version) < float(
+                        bundle_version
+                    )
+                except ValueError:
+                    pass
+
+                if should_create_release_email:
+                    print(
+                        "[STATIC][FEED][{}] New release detected {}".format(
+                            bundle_id, bundle_version
+                        )
+                    )
+                    feed_json_data["bundles"][bundle_id] = bundle_version
+                    # handle any items like sending emails to the respective
+                    self.new_version_detected_hook(bundle)
+
+        if manifest is not None:
+            # remove the pages, icons, etc. of bundles which are no longer
+            # part of the catalog
+            for removed in manifest.remove_orphans(
+                output_dir,
+                STATIC_DIRECTORIES,
+                (bundle.get_activity_dir() for bundle in bundles),
+            ):
+                logger.info("[STATIC] Removed orphaned {}".format(removed))
+            manifest.save()
+        hash_cache.prune()
+        hash_cache.save()
+        author_index.prune()
+        author_index.save()
+        lastmod_index.prune(bundle_id for bundle_id, _ in self.sitemap_entries)
+        lastmod_index.save()
 
         logger.info("[STATIC] Writing Index file (index.json)")
         # write the json to the file
-        with open(os.path.join(output_dir, "index.json"), "w") as w:
-            json.dump(self.index, w)
+        self.index.close()
         logger.info(
             "Index file containing {n} items have been written "
             "successfully".format(n=len(self.index))
         )
 
+        logger.info("[STATIC] Writing update index ({})".format(UPDATE_INDEX_FILE_NAME))
+        # read by aslo4-server to answer update checks without the RDFs
+        write_update_index(os.path.join(output_dir, UPDATE_INDEX_FILE_NAME), updates)
+
+        logger.info("[STATIC] Writing search index ({})".format(SEARCH_INDEX_FILE_NAME))
+        # the search index is built once here, instead of in the browser
+        # of every visitor
+        with open(os.path.join(output_dir, SEARCH_INDEX_FILE_NAME), "w") as w:
+            json.dump(build_search_index(self.index), w)
+        self.write_search_shards(output_dir)
+
         # pull the files and unpack it if necessary
         if args.pull_static_css_js_html:
             logger.debug("[STATIC] Copying dependant js and css")
@@ -893,6 +1617,38 @@ class SaaSBuild:
         with open(feed_json, "w") as fp:
             json.dump(feed_json_data, fp)
 
+        if report is not None:
+            report.write(profile_report)
+            logger.info("[STATIC] Profile report written to {}".format(profile_report))
+
+    def write_search_shards(self, output_dir):
+        """
+        Writes the search index sharded by the prefix of the terms
+        to search/<prefix>.json, and removes the shards of the prefixes
+        which no longer exist
+        :param output_dir: output directory
+        :type output_dir: str
+        :return: None
+        :rtype: None
+        """
+        shards_dir = os.path.join(output_dir, SEARCH_SHARDS_DIRECTORY)
+        os.makedirs(shards_dir, exist_ok=True)
+        shards = build_search_shards(self.index)
+        for shard_name, shard in shards.items():
+            with open(os.path.join(shards_dir, "{}.json".format(shard_name)), "w") as w:
+                json.dump(shard, w)
+        for file_name in os.listdir(shards_dir):
+            # the .gz/.br siblings of --precompress follow their shard
+            shard_file_name = get_precompressed_source(file_name) or file_name
+            shard_name, extension = os.path.splitext(shard_file_name)
+            if extension != ".json" or shard_name not in shards:
+                os.remove(os.path.join(shards_dir, file_name))
+        logger.info(
+            "[STATIC] {} search index shards written to {}".format(
+                len(shards), shards_dir
+            )
+        )
+
     def unpack_static(self, extract_dir):
         """
         copies static js/, css/ from upstream along with bundle
@@ -941,8 +1697,7 @@ class SaaSBuild:
             # needs additional processing
             _file = os.path.join(args.pull_static_css_js_html, i)
             _extract_file = os.path.join(extract_dir, i)
-            read_parse_and_write_template(
-                file_system_loader=self.file_system_loader,
+            self.template_engine.render(
                 html_template_path=_file,
                 html_output_path=_extract_file,
             )
@@ -955,8 +1710,7 @@ class SaaSBuild:
         )
         news_email_formatted = bundle.get_news()
 
-        content = read_parse_and_write_template(
-            file_system_loader=self.file_system_loader,
+        content = self.template_engine.render(
             html_template_path=release_template,
             news_email_formatted=news_email_formatted,
             release_time=time.asctime(),
@@ -0,0 +1,494 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+
+from aslo4.lib.compress import get_precompressed_source
+from aslo4.rdf.rdf import get_sha256
+
+logger = logging.getLogger("aslo4-builder")
+
+
+class JsonCache:
+    """
+    A dictionary which is persisted as a json file, so that expensive
+    results can be remembered between two runs of the generator.
+    A missing or corrupted cache file is treated as an empty cache
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path to the json file backing the cache
+        :type path: str
+        """
+        self.path = path
+        self.data = dict()
+        self._lock = threading.Lock()
+        self.load()
+
+    def __repr__(self):
+        return "{} ({}, {} entries)".format(
+            self.__class__.__name__, self.path, len(self.data)
+        )
+
+    def load(self):
+        """
+        Reads the cache from the disk
+        :return: None
+        :rtype: None
+        """
+        try:
+            with open(self.path, "r") as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            data = dict()
+        except ValueError:
+            logger.warning("[CACHE] {} is corrupted. Ignoring.".format(self.path))
+            data = dict()
+        self.data = data if isinstance(data, dict) else dict()
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self.data[key] = value
+
+    def remove(self, key):
+        with self._lock:
+            self.data.pop(key, None)
+
+    def save(self):
+        """
+        Atomically writes the cache to the disk
+        :return: None
+        :rtype: None
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".aslo4-cache")
+            try:
+                with os.fdopen(fd, "w") as fp:
+                    json.dump(self.data, fp)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+
+class BuildCache(JsonCache):
+    """
+    Remembers the .xo built for each activity directory along with the
+    fingerprint of the sources it was built from.
+    See Bundle.get_source_fingerprint
+    """
+
+    def lookup(self, activity_dir, fingerprint):
+        """
+        Returns the path to the cached .xo if the activity was already
+        built from the same sources, else None
+        :param activity_dir: path to the activity directory
+        :type activity_dir: str
+        :param fingerprint: digest of the current sources
+        :type fingerprint: str
+        :return: path to the .xo
+        :rtype: Union[str, None]
+        """
+        entry = self.get(os.path.abspath(activity_dir))
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        bundle_path = entry.get("bundle")
+        if not bundle_path or not os.path.isfile(bundle_path):
+            # the .xo was removed from dist/ since the last build
+            return None
+        return bundle_path
+
+    def update(self, activity_dir, fingerprint, bundle_path):
+        """
+        Records the .xo built for the activity
+        :param activity_dir: path to the activity directory
+        :type activity_dir: str
+        :param fingerprint: digest of the sources the .xo was built from
+        :type fingerprint: str
+        :param bundle_path: path to the built .xo
+        :type bundle_path: str
+        :return: None
+        :rtype: None
+        """
+        self.set(
+            os.path.abspath(activity_dir),
+            {"fingerprint": fingerprint, "bundle": os.path.abspath(bundle_path)},
+        )
+
+
+class BuildManifest(JsonCache):
+    """
+    Records, for every file written to the output directory, the digest
+    of the inputs it was generated from, along with the files generated
+    for each bundle. Used to regenerate only the stale parts of the
+    static website
+    """
+
+    def load(self):
+        super().load()
+        self.data.setdefault("outputs", dict())
+        self.data.setdefault("bundles", dict())
+
+    def get_output_digest(self, output):
+        """
+        Returns the digest of the inputs the output was generated from
+        :param output: path to the output, relative to the output directory
+        :type output: str
+        :return: digest
+        :rtype: Union[str, None]
+        """
+        return self.data["outputs"].get(output)
+
+    def get_outputs(self, key):
+        """
+        Returns the outputs generated for the bundle during the last run
+        :param key: key identifying the bundle
+        :type key: str
+        :return: paths relative to the output directory
+        :rtype: list
+        """
+        return self.data["bundles"].get(key, dict()).get("outputs", [])
+
+    def is_up_to_date(self, key, inputs_digest, output_dir):
+        """
+        Returns True if the outputs of the bundle were generated from
+        the same inputs during the last run and all of them still exist
+        :param key: key identifying the bundle
+        :type key: str
+        :param inputs_digest: digest of the current inputs of the bundle
+        :type inputs_digest: str
+        :param output_dir: output directory
+        :type output_dir: str
+        :return:
+        :rtype: bool
+        """
+        entry = self.data["bundles"].get(key)
+        if not entry or entry.get("inputs") != inputs_digest:
+            return False
+        return all(
+            os.path.exists(os.path.join(output_dir, output))
+            for output in entry.get("outputs", [])
+        )
+
+    def update(self, key, inputs_digest, outputs):
+        """
+        Records the outputs generated for a bundle
+        :param key: key identifying the bundle
+        :type key: str
+        :param inputs_digest: digest of the inputs of the bundle
+        :type inputs_digest: str
+        :param outputs: mapping of paths relative to the output directory
+        to the digest of the inputs each of them was generated from
+        :type outputs: dict
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            self.data["outputs"].update(outputs)
+            self.data["bundles"][key] = {
+                "inputs": inputs_digest,
+                "outputs": sorted(outputs),
+            }
+
+    def remove_orphans(self, output_dir, directories, keys):
+        """
+        Removes the files in `directories` of the output directory which
+        were not generated for any of the bundles in `keys`, and forgets
+        about the bundles which are no longer part of the catalog. The
+        precompressed siblings of a file (see aslo4.lib.compress) are
+        removed along with it
+        :param output_dir: output directory
+        :type output_dir: str
+        :param directories: directories managed by the generator, relative
+        to the output directory
+        :type directories: Iterable[str]
+        :param keys: keys of the bundles in the catalog
+        :type keys: Iterable[str]
+        :return: list of removed files, relative to the output directory
+        :rtype: list
+        """
+        keys = set(keys)
+        with self._lock:
+            self.data["bundles"] = {
+                k: v for k, v in self.data["bundles"].items() if k in keys
+            }
+            claimed_outputs = set()
+            for entry in self.data["bundles"].values():
+                claimed_outputs.update(entry.get("outputs", []))
+            self.data["outputs"] = {
+                k: v for k, v in self.data["outputs"].items() if k in claimed_outputs
+            }
+
+        removed = list()
+        for directory in directories:
+            for root, dirs, files in os.walk(
+                os.path.join(output_dir, directory), topdown=False
+            ):
+                for file_name in files:
+                    output = os.path.relpath(os.path.join(root, file_name), output_dir)
+                    source = get_precompressed_source(output)
+                    if source is not None and source in claimed_outputs:
+                        continue
+                    if output not in claimed_outputs:
+                        os.remove(os.path.join(root, file_name))
+                        removed.append(output)
+                if root != os.path.join(output_dir, directory) and not os.listdir(root):
+                    os.rmdir(root)
+        return removed
+
+
+class HashCache(JsonCache):
+    """
+    Remembers the sha256 of files, so that large files like bundles
+    are not read again when they did not change. A file is assumed to
+    be unchanged as long as its size, modification time and inode are
+    the same
+    """
+
+    @staticmethod
+    def _get_signature(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def get_sha256(self, path):
+        """
+        Returns the sha256 of the file, reading it only if it changed
+        since its sha256 was cached
+        :param path: path to the file
+        :type path: str
+        :return: hex digest
+        :rtype: str
+        """
+        key = os.path.abspath(path)
+        signature = self._get_signature(key)
+        entry = self.get(key)
+        if entry and entry.get("signature") == signature:
+            return entry["sha256"]
+        sha256 = get_sha256(key)["sha256"]
+        self.set(key, {"signature": signature, "sha256": sha256})
+        return sha256
+
+    def prune(self):
+        """
+        Forgets about the files which no longer exist
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            self.data = {k: v for k, v in self.data.items() if os.path.exists(k)}
+
+
+class AuthorIndex(JsonCache):
+    """
+    Remembers the number of commits of each author of a git repository,
+    along with the last commit which was walked, so that only the
+    commits made since then (last..HEAD) are walked on the next runs
+    """
+
+    def get_authors(self, path, git_provider):
+        """
+        Returns the number of commits of each author of the repository
+        :param path: path to the repository
+        :type path: str
+        :param git_provider: see aslo4.lib.git
+        :type git_provider: SubprocessGitProvider
+        :return: {author: number of commits}, None if the repository
+        has no commits
+        :rtype: Union[Counter, None]
+        """
+        head = git_provider.get_head(path)
+        if head is None:
+            return None
+        key = os.path.abspath(path)
+        entry = self.get(key)
+        if entry and entry.get("head") == head:
+            return Counter(entry["authors"])
+
+        if entry and git_provider.is_ancestor(path, entry["head"], head):
+            authors = Counter(entry["authors"])
+            log = git_provider.get_log_authors(path, since=entry["head"])
+        else:
+            # first run, or the history was rewritten
+            authors = Counter()
+            log = git_provider.get_log_authors(path)
+        authors.update(log.splitlines())
+        self.set(key, {"head": head, "authors": dict(authors)})
+        return authors
+
+    def prune(self):
+        """
+        Forgets about the repositories which no longer exist
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            self.data = {k: v for k, v in self.data.items() if os.path.isdir(k)}
+
+
+class LastmodIndex(JsonCache):
+    """
+    Remembers when the bundle of each bundle id last changed, for the
+    lastmod of the sitemap. The date of a bundle is kept as long as its
+    sha256 is the same, so that crawlers only fetch the pages again when
+    the bundle changed
+    """
+
+    def get_lastmod(self, bundle_id, sha256, created):
+        """
+        Returns the date the bundle last changed
+        :param bundle_id: bundle id
+        :type bundle_id: str
+        :param sha256: sha256 of the bundle
+        :type sha256: str
+        :param created: W3C date of the bundle, used if it changed
+        :type created: str
+        :return: W3C date
+        :rtype: str
+        """
+        entry = self.get(bundle_id)
+        if entry and entry.get("sha256") == sha256:
+            return entry["lastmod"]
+        self.set(bundle_id, {"sha256": sha256, "lastmod": created})
+        return created
+
+    def prune(self, bundle_ids):
+        """
+        Forgets about the bundles which are not in bundle_ids
+        :param bundle_ids: bundle ids of the catalog
+        :type bundle_ids: Iterable[str]
+        :return: None
+        :rtype: None
+        """
+        bundle_ids = set(bundle_ids)
+        with self._lock:
+            self.data = {k: v for k, v in self.data.items() if k in bundle_ids}
+
+
+class ScanCache(JsonCache):
+    """
+    Remembers the activity.info of the activity directories and bundles
+    of the input directory, see aslo4.bundle.scan, by their absolute
+    path. An entry is valid as long as the size, modification time and
+    inode of the activity.info (or of the .xo) are the same. Without a
+    path, the cache is only kept in memory, for the listings of the same
+    run
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: path to the json file backing the cache
+        :type path: Union[str, None]
+        """
+        self.changed = False
+        super().__init__(path)
+
+    def load(self):
+        if self.path:
+            super().load()
+
+    def save(self):
+        if self.path and self.changed:
+            super().save()
+            self.changed = False
+
+    def lookup(self, path, signature):
+        """
+        Returns the cached entry of path, {"signature", "metadata"}
+        :param path: absolute path to the activity directory or .xo
+        :type path: str
+        :param signature: [size, mtime_ns, inode] of its activity.info
+        :type signature: list
+        :return: None if it is not cached, or changed
+        :rtype: Union[dict, None]
+        """
+        entry = self.get(path)
+        if entry and entry.get("signature") == signature:
+            return entry
+        return None
+
+    def update(self, path, signature, metadata):
+        """
+        :param metadata: see BundleMetadata.to_json, None if the bundle
+        is invalid
+        :type metadata: Union[dict, None]
+        """
+        self.set(path, {"signature": signature, "metadata": metadata})
+        self.changed = True
+
+    def lookup_dist(self, path, signature):
+        """
+        Returns the latest bundle of the dist directory of an activity
+        directory, see update_dist
+        :return: None if it is not cached, or the dist directory changed
+        :rtype: Union[dict, None]
+        """
+        entry = self.get(path)
+        dist = entry and entry.get("dist")
+        if dist and dist["signature"] == signature:
+            return dist
+        return None
+
+    def update_dist(self, path, signature, bundle_name):
+        """
+        Remembers the latest bundle of the dist directory of an activity
+        directory, which is already in the cache
+        :param signature: [size, mtime_ns, inode] of the dist directory,
+        None if there is no dist directory
+        :type signature: Union[list, None]
+        :param bundle_name: file name of the latest bundle, False if the
+        dist directory is empty
+        :type bundle_name: Union[str, bool]
+        """
+        entry = self.get(path)
+        entry["dist"] = {"signature": signature, "bundle": bundle_name}
+        self.changed = True
+
+    def prune(self, directory, paths):
+        """
+        Forgets about the entries of directory which are not in paths
+        :param directory: input directory
+        :type directory: str
+        :param paths: absolute paths of the activities found in directory
+        :type paths: Iterable[str]
+        :return: None
+        :rtype: None
+        """
+        directory = os.path.abspath(directory)
+        paths = set(paths)
+        with self._lock:
+            data = {
+                k: v
+                for k, v in self.data.items()
+                if os.path.dirname(k) != directory or k in paths
+            }
+            if len(data) != len(self.data):
+                self.data = data
+                self.changed = True
@@ -0,0 +1,212 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import concurrent.futures
+import gzip
+import logging
+import os
+import tempfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger("aslo4-builder")
+
+# text files served by the web server; images, bundles and fonts
+# are already compressed
+COMPRESSIBLE_EXTENSIONS = (
+    ".html",
+    ".json",
+    ".xml",
+    ".css",
+    ".js",
+    ".svg",
+    ".txt",
+    ".map",
+)
+# files smaller than this do not benefit from compression
+MIN_COMPRESS_SIZE = 256
+
+GZIP = "gz"
+BROTLI = "br"
+# extensions of the siblings written by compress_file
+PRECOMPRESSED_EXTENSIONS = tuple(".{}".format(x) for x in (GZIP, BROTLI))
+
+
+def get_precompressed_source(file_name):
+    """
+    Returns the file a precompressed sibling was written for
+    >>> get_precompressed_source("index.html.gz")
+    'index.html'
+
+    :param file_name: file name or path
+    :type file_name: str
+    :return: None if file_name is not a precompressed sibling
+    :rtype: Union[str, None]
+    """
+    if not file_name.endswith(PRECOMPRESSED_EXTENSIONS):
+        return None
+    return os.path.splitext(file_name)[0]
+
+
+def _write_atomic(path, data, mtime):
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".aslo4-compress")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+        # the web server serves the sibling when it is as new as the file
+        os.utime(temp_path, (mtime, mtime))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _remove_sibling(directory, file_name, compression_format):
+    sibling = os.path.join(directory, "{}.{}".format(file_name, compression_format))
+    if os.path.exists(sibling):
+        os.remove(sibling)
+
+
+def compress_file(path, formats=(GZIP,)):
+    """
+    Writes the precompressed siblings of a file (path.gz, path.br).
+    Runs in the worker processes of precompress_directory
+    :param path: path to the file
+    :type path: str
+    :param formats: GZIP and/or BROTLI
+    :type formats: Iterable[str]
+    :return: path
+    :rtype: str
+    """
+    with open(path, "rb") as fp:
+        data = fp.read()
+    mtime = os.stat(path).st_mtime
+    for compression_format in formats:
+        if compression_format == GZIP:
+            # mtime=0 keeps the .gz the same for the same content
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        elif compression_format == BROTLI:
+            compressed = brotli.compress(data, mode=brotli.MODE_TEXT)
+        else:
+            raise ValueError("Unknown compression format {}".format(compression_format))
+        _write_atomic("{}.{}".format(path, compression_format), compressed, mtime)
+    return path
+
+
+def list_compressible_files(directory):
+    """
+    Returns the files of the directory which are worth precompressing
+    :param directory:
+    :type directory: str
+    :return: paths relative to the directory
+    :rtype: list
+    """
+    files = list()
+    for root, dirs, file_names in os.walk(directory):
+        # the caches of the generator are not served
+        dirs[:] = [x for x in dirs if not x.startswith(".")]
+        for file_name in file_names:
+            if file_name.startswith(".") or not file_name.endswith(
+                COMPRESSIBLE_EXTENSIONS
+            ):
+                continue
+            path = os.path.join(root, file_name)
+            if os.path.getsize(path) < MIN_COMPRESS_SIZE:
+                continue
+            files.append(os.path.relpath(path, directory))
+    return sorted(files)
+
+
+def precompress_directory(directory, cache, hash_cache, formats=(GZIP,), jobs=1):
+    """
+    Writes .gz (and .br) siblings of the text files of the directory,
+    compressing the files in parallel across `jobs` processes.
+    Files whose content did not change since they were compressed
+    during the last run are skipped, and the siblings of the files
+    which no longer exist are removed
+    :param directory: output directory
+    :type directory: str
+    :param cache: remembers the sha256 each file was compressed at
+    :type cache: aslo4.lib.cache.JsonCache
+    :param hash_cache: cache of the sha256 of the files
+    :type hash_cache: aslo4.lib.cache.HashCache
+    :param formats: GZIP and/or BROTLI
+    :type formats: Iterable[str]
+    :param jobs: number of processes
+    :type jobs: int
+    :return: Tuple (number of compressed files, number of skipped files)
+    :rtype: tuple
+    """
+    formats = tuple(formats)
+    if BROTLI in formats and brotli is None:
+        logger.warning(
+            "[COMPRESS] brotli is not installed (pip install brotli). "
+            "Skipping .br files."
+        )
+        formats = tuple(x for x in formats if x != BROTLI)
+
+    files = list_compressible_files(directory)
+    stale = list()
+    sha256s = dict()
+    for file_name in files:
+        path = os.path.join(directory, file_name)
+        sha256s[file_name] = hash_cache.get_sha256(path)
+        entry = cache.get(file_name)
+        if (
+            entry
+            and entry.get("sha256") == sha256s[file_name]
+            and set(formats).issubset(entry.get("formats", []))
+            and all(os.path.exists("{}.{}".format(path, x)) for x in entry["formats"])
+        ):
+            continue
+        stale.append(file_name)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        futures = {
+            pool.submit(
+                compress_file, os.path.join(directory, file_name), formats
+            ): file_name
+            for file_name in stale
+        }
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+            file_name = futures[future]
+            # remove the siblings of the formats which are no longer used
+            for compression_format in set(
+                (cache.get(file_name) or dict()).get("formats", [])
+            ).difference(formats):
+                _remove_sibling(directory, file_name, compression_format)
+            cache.set(
+                file_name, {"sha256": sha256s[file_name], "formats": list(formats)}
+            )
+
+    # remove the siblings of the files which were removed
+    for file_name in list(cache.data):
+        if file_name in sha256s:
+            continue
+        for compression_format in cache.get(file_name).get("formats", []):
+            _remove_sibling(directory, file_name, compression_format)
+        cache.remove(file_name)
+
+    return len(stale), len(files) - len(stale)
@@ -0,0 +1,341 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import subprocess
+import zlib
+
+from aslo4.lib.utils import split as _s
+from aslo4.platform import get_executable_path
+
+# [section] or [section "subsection"] headers of a git config file
+GIT_CONFIG_SECTION_REGEX = re.compile(r'^\[\s*([^\s"\]]+)(?:\s+"(.*)")?\s*\]')
+GIT_SHA_REGEX = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+
+class SubprocessGitProvider:
+    """
+    Reads the metadata of the git repository of an activity by
+    spawning `git`
+    """
+
+    name = "subprocess"
+
+    def _run(self, path, command, timeout=10):
+        """
+        Runs a git command in the repository at path
+        :return: stdout, None if git exited with a non zero exit code
+        :rtype: Union[str, None]
+        """
+        proc = subprocess.Popen(
+            _s(
+                "{git} -C {path} {command}".format(
+                    git=get_executable_path("git"), path=path, command=command
+                )
+            ),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        out, _ = proc.communicate(timeout=timeout)
+        if proc.returncode != 0:
+            return None
+        return out.decode()
+
+    def get_remote_url(self, path, remote="origin"):
+        """
+        Returns the url of the remote, like
+        `git config --get remote.origin.url`
+        :param path: path to the repository
+        :type path: str
+        :param remote: name of the remote
+        :type remote: str
+        :return: url, None if the remote is not configured
+        :rtype: Union[str, None]
+        """
+        out = self._run(path, "config --get remote.{}.url".format(remote), timeout=5)
+        if out is None:
+            return None
+        return out.split("\n")[0]
+
+    def get_head(self, path):
+        """
+        Returns the sha of the commit checked out, like `git rev-parse HEAD`
+        :param path: path to the repository
+        :type path: str
+        :return: commit sha, None if it could not be resolved
+        :rtype: Union[str, None]
+        """
+        out = self._run(path, "rev-parse HEAD", timeout=5)
+        if out is None:
+            return None
+        return out.strip() or None
+
+    def get_tags(self, path):
+        """
+        Returns the tags of the repository, mapped to the sha of the
+        commit they point to
+        :param path: path to the repository
+        :type path: str
+        :return: {tag: commit sha}
+        :rtype: dict
+        """
+        out = self._run(path, "show-ref --tags -d") or ""
+        tags = dict()
+        for line in out.splitlines():
+            sha, _, ref = line.partition(" ")
+            tag = ref.partition("refs/tags/")[2]
+            if tag.endswith("^{}"):
+                # annotated tag, peeled to the commit
+                tags[tag[:-3]] = sha
+            else:
+                tags.setdefault(tag, sha)
+        return tags
+
+    def get_log_authors(self, path, since=None):
+        """
+        Returns the author of each commit, one per line, like
+        `git log --pretty=format:"%an"`
+        :param path: path to the repository
+        :type path: str
+        :param since: if provided, only the commits after this one
+        (since..HEAD) are walked
+        :type since: str
+        :return: authors
+        :rtype: str
+        """
+        revisions = "{}..HEAD".format(since) if since else ""
+        return (
+            self._run(path, '-P log --pretty=format:"%an" {}'.format(revisions)) or ""
+        )
+
+    def is_ancestor(self, path, ancestor, commit="HEAD"):
+        """
+        Returns True if ancestor is an ancestor of commit, like
+        `git merge-base --is-ancestor`
+        :param path: path to the repository
+        :type path: str
+        :return:
+        :rtype: bool
+        """
+        return (
+            self._run(path, "merge-base --is-ancestor {} {}".format(ancestor, commit))
+            is not None
+        )
+
+
+class FileGitProvider(SubprocessGitProvider):
+    """
+    Reads the remote url, HEAD and tags straight from the files in the
+    .git directory (config, HEAD, refs/ and packed-refs), without
+    spawning any process. Walking the history still requires git, as
+    well as repositories whose layout is not understood (reftable,
+    config includes), for which the subprocess provider is used
+    """
+
+    name = "files"
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "r") as fp:
+                return fp.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def _get_git_dirs(self, path):
+        """
+        Returns the git directory of the repository, and the common
+        directory which holds the config and the refs (they differ for
+        linked worktrees)
+        :return: (git dir, common dir), (None, None) if path is not a
+        repository
+        :rtype: tuple
+        """
+        git_dir = os.path.join(path, ".git")
+        if os.path.isfile(git_dir):
+            # submodules and worktrees: "gitdir: <path>"
+            content = self._read(git_dir) or ""
+            if not content.startswith("gitdir:"):
+                return None, None
+            git_dir = os.path.join(path, content.partition("gitdir:")[2].strip())
+        if not os.path.isdir(git_dir):
+            return None, None
+        common_dir = self._read(os.path.join(git_dir, "commondir"))
+        if common_dir:
+            common_dir = os.path.normpath(os.path.join(git_dir, common_dir.strip()))
+        return git_dir, common_dir or git_dir
+
+    def _read_config(self, common_dir):
+        """
+        Parses the repository config as a {(section, subsection): {key: value}}
+        mapping. Returns None if the config uses includes, which are
+        only resolved by git
+        """
+        content = self._read(os.path.join(common_dir, "config"))
+        if content is None:
+            return None
+        config = dict()
+        section = None
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line[0] in "#;":
+                continue
+            match = GIT_CONFIG_SECTION_REGEX.match(line)
+            if match:
+                # section names are case insensitive, subsections are not
+                section = (match.group(1).lower(), match.group(2))
+                if section[0] in ("include", "includeif"):
+                    return None
+                config.setdefault(section, dict())
+                continue
+            if section is None:
+                continue
+            key, _, value = line.partition("=")
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            # the last value of a multivar wins, as for `git config --get`
+            config[section][key.strip().lower()] = value
+        return config
+
+    def _read_packed_refs(self, common_dir):
+        """
+        Returns the refs of packed-refs as {ref: sha}, along with the
+        commits annotated tags are peeled to as {ref: sha}
+        """
+        refs = dict()
+        peeled = dict()
+        last_ref = None
+        for line in (self._read(os.path.join(common_dir, "packed-refs")) or "").split(
+            "\n"
+        ):
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("^"):
+                if last_ref:
+                    peeled[last_ref] = line[1:].strip()
+                continue
+            sha, _, ref = line.partition(" ")
+            refs[ref.strip()] = sha
+            last_ref = ref.strip()
+        return refs, peeled
+
+    def _resolve_ref(self, git_dir, common_dir, ref, depth=0):
+        if depth > 5:
+            return None
+        # HEAD and per worktree refs live in the git dir, the rest in the
+        # common dir
+        for directory in (git_dir, common_dir):
+            content = self._read(os.path.join(directory, ref))
+            if content is None:
+                continue
+            content = content.strip()
+            if content.startswith("ref:"):
+                return self._resolve_ref(
+                    git_dir, common_dir, content.partition("ref:")[2].strip(), depth + 1
+                )
+            return content if GIT_SHA_REGEX.match(content) else None
+        refs, _ = self._read_packed_refs(common_dir)
+        return refs.get(ref)
+
+    def get_remote_url(self, path, remote="origin"):
+        git_dir, common_dir = self._get_git_dirs(path)
+        if git_dir is None:
+            return None
+        config = self._read_config(common_dir)
+        if config is None:
+            return super().get_remote_url(path, remote=remote)
+        return config.get(("remote", remote), dict()).get("url")
+
+    def get_head(self, path):
+        git_dir, common_dir = self._get_git_dirs(path)
+        if git_dir is None:
+            return None
+        if os.path.isdir(os.path.join(common_dir, "reftable")):
+            return super().get_head(path)
+        return self._resolve_ref(git_dir, common_dir, "HEAD")
+
+    def get_tags(self, path):
+        git_dir, common_dir = self._get_git_dirs(path)
+        if git_dir is None:
+            return dict()
+        if os.path.isdir(os.path.join(common_dir, "reftable")):
+            return super().get_tags(path)
+        refs, peeled = self._read_packed_refs(common_dir)
+        tags = {
+            ref: peeled.get(ref, sha)
+            for ref, sha in refs.items()
+            if ref.startswith("refs/tags/")
+        }
+        tags_dir = os.path.join(common_dir, "refs", "tags")
+        for root, _, files in os.walk(tags_dir):
+            for file_name in files:
+                ref = os.path.relpath(os.path.join(root, file_name), common_dir)
+                sha = (self._read(os.path.join(root, file_name)) or "").strip()
+                if not GIT_SHA_REGEX.match(sha):
+                    continue
+                commit = self._peel(common_dir, sha)
+                if commit is None:
+                    # the object is packed, only git can read it
+                    return super().get_tags(path)
+                # loose refs take precedence over packed refs
+                tags[ref.replace(os.path.sep, "/")] = commit
+        return {ref.partition("refs/tags/")[2]: sha for ref, sha in tags.items()}
+
+    def _peel(self, common_dir, sha, depth=0):
+        """
+        Returns the sha of the commit a loose object points to, following
+        annotated tags. None if the object is not a loose commit or tag
+        """
+        if depth > 5:
+            return None
+        object_path = os.path.join(common_dir, "objects", sha[:2], sha[2:])
+        try:
+            with open(object_path, "rb") as fp:
+                decompressor = zlib.decompressobj()
+                content = decompressor.decompress(fp.read(4096))
+        except (OSError, zlib.error):
+            return None
+        if content.startswith(b"commit "):
+            return sha
+        if content.startswith(b"tag "):
+            # tag <size>\0object <sha>\ntype ...
+            header = content.split(b"\0", 1)[-1].split(b"\n", 1)[0].decode()
+            if header.startswith("object "):
+                return self._peel(common_dir, header.partition("object ")[2], depth + 1)
+        return None
+
+
+GIT_PROVIDERS = {
+    FileGitProvider.name: FileGitProvider,
+    SubprocessGitProvider.name: SubprocessGitProvider,
+}
+
+
+def get_git_provider(name=FileGitProvider.name):
+    """
+    Returns an instance of the git metadata provider called name
+    :param name: one of GIT_PROVIDERS
+    :type name: str
+    :return:
+    :rtype: SubprocessGitProvider
+    """
+    return GIT_PROVIDERS[name]()
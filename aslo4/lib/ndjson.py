@@ -0,0 +1,105 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import tempfile
+
+
+class IndexWriter:
+    """
+    Writes index.json one fingerprint at a time, so that the index is
+    never held in memory. The fingerprints are appended to a partial
+    NDJSON file (one JSON document per line) as they are produced, and
+    flushed, so that they are on the disk if the run crashes. close()
+    writes index.json from it, and publishes the NDJSON variant next to
+    it; both are replaced atomically.
+    Iterating the writer reads the fingerprints back from the disk
+    """
+
+    def __init__(self, json_path, ndjson_path):
+        """
+        :param json_path: path to index.json
+        :type json_path: str
+        :param ndjson_path: path to the NDJSON variant of index.json
+        :type ndjson_path: str
+        """
+        self.json_path = json_path
+        self.ndjson_path = ndjson_path
+        self.partial_path = os.path.join(
+            os.path.dirname(os.path.abspath(ndjson_path)),
+            ".aslo4-{}.partial".format(os.path.basename(ndjson_path)),
+        )
+        self.count = 0
+        self._fp = open(self.partial_path, "w")
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        path = self.partial_path if self._fp is not None else self.ndjson_path
+        with open(path) as fp:
+            for line in fp:
+                yield json.loads(line)
+
+    def append(self, fingerprint):
+        """
+        Appends a fingerprint to the index
+        :param fingerprint: see Bundle.generate_fingerprint_json
+        :type fingerprint: dict
+        :return: None
+        :rtype: None
+        """
+        self._fp.write(json.dumps(fingerprint))
+        self._fp.write("\n")
+        self._fp.flush()
+        self.count += 1
+
+    def extend(self, fingerprints):
+        for fingerprint in fingerprints:
+            self.append(fingerprint)
+
+    def close(self):
+        """
+        Writes index.json, the same as json.dump of the list of the
+        fingerprints, and replaces index.json and the NDJSON variant
+        :return: number of fingerprints in the index
+        :rtype: int
+        """
+        self._fp.close()
+        directory = os.path.dirname(os.path.abspath(self.json_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".aslo4-index")
+        try:
+            with os.fdopen(fd, "w") as w, open(self.partial_path) as r:
+                w.write("[")
+                for i, line in enumerate(r):
+                    if i:
+                        w.write(", ")
+                    w.write(line.rstrip("\n"))
+                w.write("]")
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self.json_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        os.chmod(self.partial_path, 0o644)
+        os.replace(self.partial_path, self.ndjson_path)
+        self._fp = None
+        return self.count
@@ -0,0 +1,201 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import contextlib
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+
+logger = logging.getLogger("aslo4-builder")
+
+# what --cprofile and --tracemalloc capture: the whole run, or only the
+# loops over the bundles of -b, -g and -x
+PROFILE_SCOPE_RUN = "run"
+PROFILE_SCOPE_BUNDLES = "bundles"
+PROFILE_SCOPES = (PROFILE_SCOPE_RUN, PROFILE_SCOPE_BUNDLES)
+
+# frames kept for each allocation traced by tracemalloc
+TRACEMALLOC_FRAMES = 10
+
+# since Python 3.12, cProfile is built on sys.monitoring: a profile
+# records the calls of every thread, and no other profile can be enabled
+# while it is
+CPROFILE_IS_PROCESS_WIDE = sys.version_info >= (3, 12)
+
+
+class Profiler:
+    """
+    Captures a block under cProfile and/or tracemalloc, and writes to
+    output_dir, for a block captured as `label`:
+        <label>.pstats      cProfile statistics, see pstats.Stats
+        <label>.tracemalloc tracemalloc snapshot, see
+                            tracemalloc.Snapshot.load
+        <label>.txt         the top functions by cumulative time and the
+                            top allocations
+    Before Python 3.12, cProfile only profiles the thread which enables
+    it; the functions run by the thread pools of --jobs are profiled with
+    wrap()
+    """
+
+    def __init__(self, output_dir, cprofile=True, trace_malloc=False, top=20):
+        """
+        :param output_dir: directory to write the captures to
+        :type output_dir: str
+        :param cprofile: capture with cProfile
+        :type cprofile: bool
+        :param trace_malloc: capture with tracemalloc
+        :type trace_malloc: bool
+        :param top: number of entries of the text summaries
+        :type top: int
+        """
+        self.output_dir = output_dir
+        self.cprofile = cprofile
+        self.trace_malloc = trace_malloc
+        self.top = top
+        # profiles of the other threads during the current capture
+        self._thread_profiles = None
+        self._capture_thread = None
+        self._thread_local = threading.local()
+        self._lock = threading.Lock()
+
+    def wrap(self, function):
+        """
+        Returns function, profiled when it runs in another thread during
+        a capture
+        """
+
+        if CPROFILE_IS_PROCESS_WIDE:
+            # the profile of the capture already records every thread
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            thread_profiles = self._thread_profiles
+            if (
+                thread_profiles is None
+                or threading.current_thread() is self._capture_thread
+            ):
+                # the thread of the capture is already profiled
+                return function(*args, **kwargs)
+            # one profile per thread and capture
+            if getattr(self._thread_local, "profiles", None) is not thread_profiles:
+                self._thread_local.profiles = thread_profiles
+                self._thread_local.profile = cProfile.Profile()
+                self._thread_local.enabled = False
+            profile = self._thread_local.profile
+            try:
+                profile.enable()
+            except ValueError:
+                # another profiler is active, e.g. python -m cProfile
+                return function(*args, **kwargs)
+            if not self._thread_local.enabled:
+                # only the profiles which ran are written
+                self._thread_local.enabled = True
+                with self._lock:
+                    thread_profiles.append(profile)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.disable()
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def capture(self, label):
+        """
+        Captures the block as label
+        :param label: name of the files of the capture
+        :type label: str
+        """
+        profile = None
+        if self.trace_malloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        if self.cprofile:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                logger.warning(
+                    "[PROFILE] {} is not profiled with cProfile: {}".format(label, e)
+                )
+                profile = None
+            else:
+                self._capture_thread = threading.current_thread()
+                self._thread_profiles = list()
+        try:
+            yield
+        finally:
+            snapshot = None
+            peak = 0
+            if profile is not None:
+                profile.disable()
+            if self.trace_malloc:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            thread_profiles, self._thread_profiles = self._thread_profiles, None
+            self.write(label, profile, thread_profiles or [], snapshot, peak)
+
+    def write(self, label, profile, thread_profiles, snapshot, peak=0):
+        """
+        Writes a capture to the output directory
+        :param peak: peak of the memory traced by tracemalloc, in bytes
+        :type peak: int
+        :return: None
+        :rtype: None
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        base_path = os.path.join(self.output_dir, label)
+        summary = io.StringIO()
+        if profile is not None:
+            stats = pstats.Stats(profile, *thread_profiles, stream=summary)
+            stats.dump_stats("{}.pstats".format(base_path))
+            summary.write(
+                "cProfile, top {} functions by cumulative time ({})\n".format(
+                    self.top,
+                    "all threads"
+                    if CPROFILE_IS_PROCESS_WIDE
+                    else "{} threads".format(len(thread_profiles) + 1),
+                )
+            )
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        if snapshot is not None:
+            snapshot.dump("{}.tracemalloc".format(base_path))
+            statistics = snapshot.statistics("lineno")
+            summary.write(
+                "tracemalloc, peak {:.1f} KiB, {:.1f} KiB in {} blocks "
+                "still allocated, top {} lines\n".format(
+                    peak / 1024,
+                    sum(x.size for x in statistics) / 1024,
+                    sum(x.count for x in statistics),
+                    self.top,
+                )
+            )
+            for statistic in statistics[: self.top]:
+                summary.write("{}\n".format(statistic))
+        with open("{}.txt".format(base_path), "w") as fp:
+            fp.write(summary.getvalue())
+        logger.info("[PROFILE] {} written to {}".format(label, self.output_dir))
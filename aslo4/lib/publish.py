@@ -0,0 +1,147 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from aslo4.rdf.rdf import get_sha256
+
+logger = logging.getLogger("aslo4-builder")
+
+# ioctl which clones the extents of a file on copy-on-write filesystems
+# (btrfs, xfs), see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+SYMLINK = "symlink"
+COPY = "copy"
+# the strategies, from the cheapest to the most expensive one. When a
+# strategy is not supported (e.g. hardlinks across file systems) the
+# next one is used
+PUBLISH_STRATEGIES = (REFLINK, HARDLINK, SYMLINK, COPY)
+AUTO = "auto"
+
+# publishing a file did not write anything
+UNCHANGED = "unchanged"
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src, "rb") as src_fp, open(dst, "wb") as dst_fp:
+        fcntl.ioctl(dst_fp.fileno(), FICLONE, src_fp.fileno())
+    shutil.copystat(src, dst)
+
+
+def _hardlink(src, dst):
+    os.link(src, dst)
+
+
+def _symlink(src, dst):
+    os.symlink(os.path.abspath(src), dst)
+
+
+def _copy(src, dst):
+    shutil.copy2(src, dst, follow_symlinks=True)
+
+
+PUBLISHERS = {
+    REFLINK: _reflink,
+    HARDLINK: _hardlink,
+    SYMLINK: _symlink,
+    COPY: _copy,
+}
+
+
+def is_published(src, dst, hash_cache=None):
+    """
+    Returns True if dst already has the content of src: it is the same
+    file (hardlink or symlink), or it has the same size and sha256
+    :param src: path to the source file
+    :type src: str
+    :param dst: path to the published file
+    :type dst: str
+    :param hash_cache: cache of the sha256 of the files
+    :type hash_cache: aslo4.lib.cache.HashCache
+    :return:
+    :rtype: bool
+    """
+    if not os.path.exists(dst):
+        return False
+    if os.path.samefile(src, dst):
+        return True
+    if os.path.getsize(src) != os.path.getsize(dst):
+        return False
+    if hash_cache is not None:
+        return hash_cache.get_sha256(src) == hash_cache.get_sha256(dst)
+    return get_sha256(src)["sha256"] == get_sha256(dst)["sha256"]
+
+
+def publish_file(src, dst, strategy=COPY, hash_cache=None):
+    """
+    Publishes src to dst with the cheapest supported strategy, starting
+    from `strategy` and falling back to the next ones of
+    PUBLISH_STRATEGIES. Nothing is written if dst already has the
+    content of src. dst is replaced atomically
+    :param src: path to the source file
+    :type src: str
+    :param dst: path to publish the file to
+    :type dst: str
+    :param strategy: one of PUBLISH_STRATEGIES or AUTO
+    :type strategy: str
+    :param hash_cache: cache of the sha256 of the files
+    :type hash_cache: aslo4.lib.cache.HashCache
+    :return: the strategy which was used, or UNCHANGED
+    :rtype: str
+    """
+    if is_published(src, dst, hash_cache=hash_cache):
+        return UNCHANGED
+
+    if strategy == AUTO:
+        strategy = PUBLISH_STRATEGIES[0]
+    # the file is published next to dst, and then moved over dst
+    temp_path = os.path.join(
+        os.path.dirname(os.path.abspath(dst)),
+        ".{}.aslo4-publish".format(os.path.basename(dst)),
+    )
+    start = PUBLISH_STRATEGIES.index(strategy)
+    for fallback in PUBLISH_STRATEGIES[start:]:
+        if os.path.lexists(temp_path):
+            os.unlink(temp_path)
+        try:
+            PUBLISHERS[fallback](src, temp_path)
+        except OSError as e:
+            if os.path.lexists(temp_path):
+                os.unlink(temp_path)
+            if fallback == COPY:
+                raise
+            logger.debug(
+                "[PUBLISH] {} is not supported for {} ({}).".format(fallback, dst, e)
+            )
+            continue
+        os.replace(temp_path, dst)
+        return fallback
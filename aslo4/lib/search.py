@@ -0,0 +1,250 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+import unicodedata
+
+# the options of the MiniSearch index of aslo4-static/js/search.js.
+# the boosts, prefix and fuzzy search options are applied when searching,
+# so they are not part of the index
+SEARCH_INDEX_FIELDS = ("name", "summary")
+SEARCH_INDEX_STORE_FIELDS = (
+    "name",
+    "summary",
+    "url",
+    "icon_name",
+    "bundle_name",
+    "v",
+    "bundle_id",
+)
+SEARCH_INDEX_ID_FIELD = "id"
+
+# the sharded search index is split by the first characters of the terms
+SEARCH_SHARD_PREFIX_LENGTH = 2
+SEARCH_SHARD_NAME_REGEX = re.compile(r"^[a-z0-9]+$")
+
+# key of the values in the nodes of a MiniSearch radix tree
+LEAF = ""
+
+
+def is_separator(character):
+    """
+    Returns True if the character separates two terms, as the default
+    tokenizer of MiniSearch does: new lines, spaces and punctuation
+    :param character:
+    :type character: str
+    :return:
+    :rtype: bool
+    """
+    if character in "\n\r":
+        return True
+    category = unicodedata.category(character)
+    return category in ("Zs", "Zl", "Zp") or category.startswith("P")
+
+
+def tokenize(text):
+    """
+    Splits text into terms, like the default tokenizer of MiniSearch.
+    Consecutive separators are collapsed, but an empty term is
+    returned for leading and trailing separators, as String.split does
+    :param text:
+    :type text: str
+    :return:
+    :rtype: list
+    """
+    tokens = [""]
+    previous_is_separator = False
+    for character in text:
+        if is_separator(character):
+            if not previous_is_separator:
+                tokens.append("")
+            previous_is_separator = True
+        else:
+            tokens[-1] += character
+            previous_is_separator = False
+    return tokens
+
+
+def _common_prefix(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return a[:length]
+
+
+def _create_path(tree, key):
+    """
+    Returns the node of the radix tree for key, creating (and splitting)
+    the edges which lead to it, as SearchableMap does
+    """
+    while key:
+        edge = next((k for k in tree if k != LEAF and k[0] == key[0]), None)
+        if edge is None:
+            tree[key] = dict()
+            return tree[key]
+        prefix = _common_prefix(key, edge)
+        size = len(prefix)
+        if size < len(edge):
+            # split the edge
+            tree[prefix] = {edge[size:]: tree.pop(edge)}
+        tree = tree[prefix]
+        key = key[size:]
+    return tree
+
+
+def build_search_index(
+    documents,
+    fields=SEARCH_INDEX_FIELDS,
+    store_fields=SEARCH_INDEX_STORE_FIELDS,
+    id_field=SEARCH_INDEX_ID_FIELD,
+):
+    """
+    Indexes the documents the way MiniSearch.addAll does, and returns
+    the index in the format of JSON.stringify(miniSearch), so that the
+    website can load it with MiniSearch.loadJSON instead of indexing
+    index.json in the browser
+    :param documents: fingerprints of the bundles, as in index.json
+    :type documents: Iterable[dict]
+    :param fields: fields indexed for full-text search
+    :type fields: Iterable[str]
+    :param store_fields: fields returned with search results
+    :type store_fields: Iterable[str]
+    :param id_field: field which uniquely identifies a document
+    :type id_field: str
+    :return:
+    :rtype: dict
+    """
+    field_ids = {field: i for i, field in enumerate(fields)}
+    tree = dict()
+    document_ids = dict()
+    field_length = dict()
+    average_field_length = dict()
+    stored_fields = dict()
+    total_field_length = dict()
+    document_count = 0
+
+    for short_id, document in enumerate(documents):
+        document_count += 1
+        document_ids[short_id] = document[id_field]
+        for field, field_id in field_ids.items():
+            value = document.get(field)
+            if value is None:
+                continue
+            tokens = tokenize(str(value))
+            field_length.setdefault(short_id, dict())[field_id] = len(tokens)
+            total_field_length[field_id] = total_field_length.get(field_id, 0) + len(
+                tokens
+            )
+            average_field_length[field_id] = (
+                total_field_length[field_id] / document_count
+            )
+            for term in tokens:
+                term = term.lower()
+                if not term:
+                    continue
+                node = _create_path(tree, term)
+                field_index = node.setdefault(LEAF, dict()).setdefault(
+                    field_id, {"df": 0, "ds": dict()}
+                )
+                if short_id not in field_index["ds"]:
+                    field_index["df"] += 1
+                field_index["ds"][short_id] = field_index["ds"].get(short_id, 0) + 1
+        stored_fields[short_id] = {
+            field: document[field] for field in store_fields if field in document
+        }
+
+    return {
+        "index": {"_tree": tree, "_prefix": ""},
+        "documentCount": document_count,
+        "nextId": document_count,
+        "documentIds": document_ids,
+        "fieldIds": field_ids,
+        "fieldLength": field_length,
+        "averageFieldLength": average_field_length,
+        "storedFields": stored_fields,
+    }
+
+
+def get_search_shard_name(prefix):
+    """
+    Returns the name of the shard of the terms starting with prefix.
+    Prefixes which are not made of lowercase ascii letters and digits
+    are encoded as the hex code points of their characters, so that
+    they are safe to use in file names and urls
+    :param prefix: lowercase prefix of a term
+    :type prefix: str
+    :return:
+    :rtype: str
+    """
+    if SEARCH_SHARD_NAME_REGEX.match(prefix):
+        return prefix
+    return "u{}".format("-".join("{:x}".format(ord(x)) for x in prefix))
+
+
+def build_search_shards(
+    documents,
+    prefix_length=SEARCH_SHARD_PREFIX_LENGTH,
+    fields=SEARCH_INDEX_FIELDS,
+    store_fields=SEARCH_INDEX_STORE_FIELDS,
+    id_field=SEARCH_INDEX_ID_FIELD,
+):
+    """
+    Splits the documents into shards by the prefix of the terms of their
+    indexed fields, so that the website only downloads the shards of
+    the terms being searched. A document is part of the shard of every
+    prefix its terms start with. Terms shorter than prefix_length are
+    only part of the full search index, see build_search_index.
+    The shards are only searched for prefix and exact matches: fuzzy
+    matches, and queries the shards have no results for, are searched
+    in the full search index
+    :param documents: fingerprints of the bundles, as in index.json
+    :type documents: Iterable[dict]
+    :param prefix_length: number of characters of the prefix of a shard
+    :type prefix_length: int
+    :param fields: fields indexed for full-text search
+    :type fields: Iterable[str]
+    :param store_fields: fields returned with search results
+    :type store_fields: Iterable[str]
+    :param id_field: field which uniquely identifies a document
+    :type id_field: str
+    :return: {shard name: shard}
+    :rtype: dict
+    """
+    keep_fields = set(fields).union(store_fields, (id_field,))
+    shards = dict()
+    for document in documents:
+        prefixes = set()
+        for field in fields:
+            value = document.get(field)
+            if value is None:
+                continue
+            for term in tokenize(str(value)):
+                term = term.lower()
+                if len(term) >= prefix_length:
+                    prefixes.add(term[:prefix_length])
+        stored = {k: v for k, v in document.items() if k in keep_fields}
+        for prefix in prefixes:
+            shard = shards.setdefault(
+                get_search_shard_name(prefix), {"prefix": prefix, "documents": []}
+            )
+            shard["documents"].append(stored)
+    return shards
@@ -0,0 +1,201 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+import re
+import tempfile
+from xml.sax.saxutils import escape
+
+from aslo4.constants import SITEMAP_HEADER, SITEMAP_INDEX_HEADER
+from aslo4.constants import SITEMAP_INDEX_ITEM, SITEMAP_URL
+
+logger = logging.getLogger("aslo4-builder")
+
+SITEMAP_FILE_NAME = "sitemap.xml"
+# shards of the sitemap, listed by sitemap.xml when there is more than one
+SITEMAP_SHARD_FILE_NAME = "sitemap-{}.xml"
+SITEMAP_SHARD_REGEX = re.compile(r"^sitemap-\d+\.xml$")
+
+# limits of a sitemap file, see https://www.sitemaps.org/protocol.html
+SITEMAP_MAX_URLS = 50000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+SITEMAP_HEAD, SITEMAP_TAIL = (
+    x.encode("utf-8") for x in SITEMAP_HEADER.split("{content}")
+)
+
+
+class SitemapWriter:
+    """
+    Writes the sitemap of the output directory one url at a time, so that
+    the sitemap is never held in memory. Once a sitemap file reaches
+    max_urls or max_bytes, the urls go to the next shard, and
+    sitemap.xml becomes a sitemap index of the shards. The files are
+    replaced atomically when the writer is closed
+
+    >>> with SitemapWriter(output_dir, "https://example.org") as sitemap:
+    ...     sitemap.add("https://example.org/app/org.sugarlabs.Pippy.html",
+    ...                 "2020-08-01")
+    """
+
+    def __init__(
+        self,
+        output_dir,
+        domain,
+        max_urls=SITEMAP_MAX_URLS,
+        max_bytes=SITEMAP_MAX_BYTES,
+    ):
+        """
+        :param output_dir: directory to write sitemap.xml to
+        :type output_dir: str
+        :param domain: url of the output directory, for the sitemap index
+        :type domain: str
+        :param max_urls: maximum number of urls of a sitemap file
+        :type max_urls: int
+        :param max_bytes: maximum size of a sitemap file
+        :type max_bytes: int
+        """
+        self.output_dir = output_dir
+        self.domain = domain
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.count = 0
+        # [(temporary path, latest lastmod)] of the finished shards
+        self._shards = list()
+        self._fp = None
+        self._temp_path = None
+        self._shard_urls = 0
+        self._shard_bytes = 0
+        self._shard_lastmod = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _open_shard(self):
+        fd, self._temp_path = tempfile.mkstemp(
+            dir=self.output_dir, prefix=".aslo4-sitemap"
+        )
+        self._fp = os.fdopen(fd, "wb")
+        self._fp.write(SITEMAP_HEAD)
+        self._shard_urls = 0
+        self._shard_bytes = len(SITEMAP_HEAD) + len(SITEMAP_TAIL)
+        self._shard_lastmod = ""
+
+    def _close_shard(self):
+        self._fp.write(SITEMAP_TAIL)
+        self._fp.close()
+        os.chmod(self._temp_path, 0o644)
+        self._shards.append((self._temp_path, self._shard_lastmod))
+        self._fp = None
+        self._temp_path = None
+
+    def add(self, url, lastmod, changefreq="weekly"):
+        """
+        Adds an url to the sitemap
+        :param url: absolute url of the page
+        :type url: str
+        :param lastmod: W3C date of the last change of the page
+        :type lastmod: str
+        :param changefreq: how often the page is likely to change
+        :type changefreq: str
+        :return: None
+        :rtype: None
+        """
+        entry = SITEMAP_URL.format(
+            url=escape(url), lastmod=lastmod, changefreq=changefreq
+        ).encode("utf-8")
+        if self._fp is not None and (
+            self._shard_urls >= self.max_urls
+            or self._shard_bytes + len(entry) > self.max_bytes
+        ):
+            self._close_shard()
+        if self._fp is None:
+            self._open_shard()
+        self._fp.write(entry)
+        self._shard_urls += 1
+        self._shard_bytes += len(entry)
+        self._shard_lastmod = max(self._shard_lastmod, lastmod)
+        self.count += 1
+
+    def close(self):
+        """
+        Replaces sitemap.xml, and its shards if there is more than one,
+        and removes the shards of the previous sitemap which are no
+        longer needed
+        :return: number of sitemap files written
+        :rtype: int
+        """
+        if self._fp is None and not self._shards:
+            # an empty sitemap is still a valid sitemap
+            self._open_shard()
+        if self._fp is not None:
+            self._close_shard()
+
+        sitemap_path = os.path.join(self.output_dir, SITEMAP_FILE_NAME)
+        shard_file_names = list()
+        if len(self._shards) == 1:
+            os.replace(self._shards[0][0], sitemap_path)
+        else:
+            items = list()
+            for i, (temp_path, lastmod) in enumerate(self._shards, start=1):
+                shard_file_name = SITEMAP_SHARD_FILE_NAME.format(i)
+                os.replace(temp_path, os.path.join(self.output_dir, shard_file_name))
+                shard_file_names.append(shard_file_name)
+                items.append(
+                    SITEMAP_INDEX_ITEM.format(
+                        url=escape("{}/{}".format(self.domain, shard_file_name)),
+                        lastmod=lastmod,
+                    )
+                )
+            fd, temp_path = tempfile.mkstemp(
+                dir=self.output_dir, prefix=".aslo4-sitemap"
+            )
+            with os.fdopen(fd, "w") as fp:
+                fp.write(SITEMAP_INDEX_HEADER.format(content="".join(items)))
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, sitemap_path)
+        self._shards = list()
+
+        for file_name in os.listdir(self.output_dir):
+            if (
+                SITEMAP_SHARD_REGEX.match(file_name)
+                and file_name not in shard_file_names
+            ):
+                os.remove(os.path.join(self.output_dir, file_name))
+        return max(len(shard_file_names), 1)
+
+    def abort(self):
+        """
+        Removes the shards written so far, leaving the previous sitemap
+        :return: None
+        :rtype: None
+        """
+        if self._fp is not None:
+            self._close_shard()
+        for temp_path, _ in self._shards:
+            os.remove(temp_path)
+        self._shards = list()
@@ -0,0 +1,173 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import contextlib
+import json
+import math
+import threading
+import time
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile
+    :param sorted_values: values, in ascending order
+    :type sorted_values: list
+    :param p: percentile, between 0 and 100
+    :type p: float
+    :return: 0 if there are no values
+    :rtype: float
+    """
+    if not sorted_values:
+        return 0
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(values):
+    """
+    Returns the total, mean, percentiles and maximum of values
+    :type values: Iterable[float]
+    :rtype: dict
+    """
+    values = sorted(values)
+    summary = {
+        "total": sum(values),
+        "mean": sum(values) / len(values) if values else 0,
+    }
+    for p in PERCENTILES:
+        summary["p{}".format(p)] = percentile(values, p)
+    summary["max"] = values[-1] if values else 0
+    return summary
+
+
+class BundleTimings:
+    """
+    Wall and CPU time of the stages of the generation of a bundle.
+    The CPU time is the one of the thread running the stage, so that the
+    bundles rendered concurrently with --jobs are not counted together
+    """
+
+    def __init__(self, bundle_id):
+        self.bundle_id = bundle_id
+        self.stages = dict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Times the block as the stage `name`. A stage which is timed
+        several times accumulates
+        """
+        start_time = time.perf_counter()
+        start_cpu_time = time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = self.stages.get(name, (0, 0))
+            self.stages[name] = (
+                wall + time.perf_counter() - start_time,
+                cpu + time.thread_time() - start_cpu_time,
+            )
+
+    def get_wall_time(self):
+        return sum(wall for wall, _ in self.stages.values())
+
+    def get_cpu_time(self):
+        return sum(cpu for _, cpu in self.stages.values())
+
+    def to_json(self):
+        return {
+            "bundle_id": self.bundle_id,
+            "wall": self.get_wall_time(),
+            "cpu": self.get_cpu_time(),
+            "stages": {
+                name: {"wall": wall, "cpu": cpu}
+                for name, (wall, cpu) in self.stages.items()
+            },
+        }
+
+
+class ProfileReport:
+    """
+    Collects the BundleTimings of a run of generate_web_page, and writes
+    them with the totals and percentiles of each stage, and the slowest
+    bundles, as JSON
+    """
+
+    def __init__(self, slowest=10):
+        """
+        :param slowest: number of the slowest bundles to report
+        :type slowest: int
+        """
+        self.slowest = slowest
+        self.bundles = list()
+        self._lock = threading.Lock()
+        self._start_time = time.perf_counter()
+        self._start_cpu_time = time.process_time()
+
+    def add(self, timings):
+        """
+        :type timings: BundleTimings
+        """
+        with self._lock:
+            self.bundles.append(timings)
+
+    def to_json(self):
+        stage_names = list()
+        for timings in self.bundles:
+            for name in timings.stages:
+                if name not in stage_names:
+                    stage_names.append(name)
+        stages = dict()
+        for name in stage_names:
+            timed = [x.stages[name] for x in self.bundles if name in x.stages]
+            stages[name] = {
+                "bundles": len(timed),
+                "wall": summarize(wall for wall, _ in timed),
+                "cpu": summarize(cpu for _, cpu in timed),
+            }
+        slowest = sorted(self.bundles, key=lambda x: x.get_wall_time(), reverse=True)
+        return {
+            "generated": time.time(),
+            # of the whole run, including what is not done per bundle
+            "wall": time.perf_counter() - self._start_time,
+            "cpu": time.process_time() - self._start_cpu_time,
+            "bundles": len(self.bundles),
+            "per_bundle": {
+                "wall": summarize(x.get_wall_time() for x in self.bundles),
+                "cpu": summarize(x.get_cpu_time() for x in self.bundles),
+            },
+            "stages": stages,
+            "slowest": [x.to_json() for x in slowest[: self.slowest]],
+            "timings": [x.to_json() for x in self.bundles],
+        }
+
+    def write(self, path):
+        """
+        Writes the report to path
+        :param path: path to the JSON report
+        :type path: str
+        :return: None
+        :rtype: None
+        """
+        with open(path, "w") as fp:
+            json.dump(self.to_json(), fp, indent=2)
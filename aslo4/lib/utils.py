@@ -18,12 +18,14 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import collections
 import os
 import shlex
 import subprocess
 import logging
+import threading
 
-from jinja2 import Environment
+from jinja2 import Environment, FileSystemBytecodeCache
 from aslo4.catalog import catalog
 from aslo4.platform import get_executable_path, SYSTEM
 
@@ -43,6 +45,36 @@ def decode_each(iterable):
     return (x.decode() for x in iterable)
 
 
+def map_bounded(executor, function, iterable, max_pending):
+    """
+    Like executor.map, but the items are submitted as the results are
+    consumed, so that at most max_pending results wait in memory for a
+    slow consumer. The results are yielded in the order of the items
+    :param executor: executor running function
+    :type executor: concurrent.futures.Executor
+    :param function: function called with each item
+    :type function: Callable
+    :param iterable: items
+    :type iterable: Iterable
+    :param max_pending: maximum number of submitted items whose result
+    was not consumed yet
+    :type max_pending: int
+    :return: the result of function for each item
+    :rtype: Iterator
+    """
+    pending = collections.deque()
+    try:
+        for item in iterable:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
 def git_checkout_latest_tag(path_to_git_repository):
     if not os.path.exists(os.path.join(path_to_git_repository, ".git")):
         raise ValueError("Invalid git repository")
@@ -137,6 +169,100 @@ def git_checkout(path_to_git_repository, branch="master"):
     return 0
 
 
+class TemplateEngine:
+    """
+    Renders jinja templates with a single jinja Environment, so that each
+    template (and the templates it includes) is read and compiled only
+    once. Optionally, the compiled templates are also cached on the disk
+    with a jinja bytecode cache, which makes the next runs start faster
+    """
+
+    def __init__(self, file_system_loader, bytecode_cache_dir=None):
+        """
+        :param file_system_loader: jinja2 FileSystemLoader
+        :type file_system_loader: jinja2.FileSystemLoader
+        :param bytecode_cache_dir: directory to store the compiled templates
+        :type bytecode_cache_dir: str
+        """
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+        self.file_system_loader = file_system_loader
+        # templates do not change while the generator is running,
+        # do not check them for changes on every render
+        self.environment = Environment(
+            loader=file_system_loader,
+            bytecode_cache=bytecode_cache,
+            auto_reload=False,
+        )
+        self._templates = dict()
+        self._lock = threading.Lock()
+
+    def get_template(self, html_template_path):
+        """
+        Returns the compiled template
+        Templates in the search path of the loader are loaded by their
+        name, so that they can be stored in the bytecode cache; others are
+        compiled from their source
+        :param html_template_path: Path to the HTML template
+        :type html_template_path: str
+        :return: compiled template
+        :rtype: jinja2.Template
+        """
+        template = self._templates.get(html_template_path)
+        if template is not None:
+            return template
+
+        template_path = os.path.abspath(html_template_path)
+        for search_path in self.file_system_loader.searchpath:
+            search_path = os.path.abspath(search_path)
+            if os.path.dirname(template_path) == search_path:
+                template = self.environment.get_template(
+                    os.path.basename(template_path)
+                )
+                break
+        else:
+            with open(html_template_path, "r") as _buffer:
+                template = self.environment.from_string(_buffer.read())
+
+        with self._lock:
+            self._templates[html_template_path] = template
+        return template
+
+    def render(self, html_template_path, html_output_path=None, **kwargs):
+        """
+        Render the HTML template with kwargs as the argument and write it
+        to html_output_path. If html_output_path is not provided, the
+        rendered template is returned
+        :param html_template_path: Path to the HTML template
+        :type html_template_path: str
+        :param html_output_path: Path to write the parsed HTML template
+        :type html_output_path: str
+        :param kwargs:
+        :type kwargs:
+        :return:
+        :rtype: Union[str, None]
+        """
+        if html_output_path is not None:
+            output_path_file_name = html_output_path.split(os.path.sep)[-1]
+        else:
+            output_path_file_name = html_template_path
+
+        logger.info("[STATIC] Reading template: {}".format(output_path_file_name))
+        html_template = self.get_template(html_template_path)
+
+        logger.info(
+            "[STATIC] Writing parsed template: {}".format(output_path_file_name)
+        )
+        rendered = html_template.render(**kwargs, catalog=catalog)
+        if html_output_path is not None:
+            with open(html_output_path, "w") as w:
+                w.write(rendered)
+        else:
+            return rendered
+
+
 def read_parse_and_write_template(
     file_system_loader, html_template_path, html_output_path=None, **kwargs
 ):
@@ -144,6 +270,8 @@ def read_parse_and_write_template(
     Read HTML Template, parse the HTML template with jinja template
     renderer and write the formatted jinja template to html_output_path with
     kwargs as the argument
+    The template is compiled on every call; to render many templates,
+    use a TemplateEngine
     :param file_system_loader: jinja2 FileSystemLoader
     :type file_system_loader: jinja2.FileSystemLoader
     :param html_template_path: Path to the HTML template
@@ -155,22 +283,6 @@ def read_parse_and_write_template(
     :return:
     :rtype:
     """
-    if html_output_path is not None:
-        output_path_file_name = html_output_path.split(os.path.sep)[-1]
-    else:
-        output_path_file_name = html_template_path
-
-    logger.info("[STATIC] Reading template: {}".format(output_path_file_name))
-    with open(html_template_path, "r") as _buffer:
-        html_template = Environment(loader=file_system_loader).from_string(
-            _buffer.read()
-        )
-
-    logger.info("[STATIC] Writing parsed template: {}".format(output_path_file_name))
-
-    rendered = html_template.render(**kwargs, catalog=catalog)
-    if html_output_path is not None:
-        with open(html_output_path, "w") as w:
-            w.write(rendered)
-    else:
-        return rendered
+    return TemplateEngine(file_system_loader).render(
+        html_template_path, html_output_path=html_output_path, **kwargs
+    )
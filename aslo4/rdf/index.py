@@ -0,0 +1,104 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import struct
+import tempfile
+
+# Binary update index, read by aslo4-server/update_index.py with mmap.
+# All integers are little endian.
+#
+# header:
+#     magic          8 bytes  b"ASLOUIDX"
+#     format version u32
+#     record count   u32
+# records, sorted by the utf-8 bytes of the bundle id:
+#     strings offset u32      from the end of the records
+#     strings length u32
+#     update size    u32      in kB, as in the RDF
+#     sha256         32 bytes of the bundle
+#     uuid           16 bytes id of the target application in the RDF
+# strings, utf-8 separated by NUL:
+#     bundle id, version, min version, max version, update link, info url
+UPDATE_INDEX_MAGIC = b"ASLOUIDX"
+UPDATE_INDEX_VERSION = 1
+UPDATE_INDEX_HEADER = struct.Struct("<8sII")
+UPDATE_INDEX_RECORD = struct.Struct("<III32s16s")
+UPDATE_INDEX_STRING_FIELDS = (
+    "bundle_id",
+    "version",
+    "min_version",
+    "max_version",
+    "update_link",
+    "update_info",
+)
+
+
+def write_update_index(path, updates):
+    """
+    Writes the binary update index of the bundles. The file is replaced
+    atomically, so that the server can swap it while serving
+    :param path: path to the index
+    :type path: str
+    :param updates: updates, see aslo4.rdf.rdf.RDF.get_update. If a
+    bundle id is repeated, the last update is kept, as its RDF is the
+    one written last
+    :type updates: Iterable[dict]
+    :return: number of bundles in the index
+    :rtype: int
+    """
+    updates = {update["bundle_id"]: update for update in updates}
+    records = list()
+    strings = list()
+    strings_offset = 0
+    for bundle_id in sorted(updates, key=lambda x: x.encode("utf-8")):
+        update = updates[bundle_id]
+        record_strings = b"\0".join(
+            str(update[x]).encode("utf-8") for x in UPDATE_INDEX_STRING_FIELDS
+        )
+        records.append(
+            UPDATE_INDEX_RECORD.pack(
+                strings_offset,
+                len(record_strings),
+                int(update["update_size"]),
+                bytes.fromhex(update["sha256"]),
+                update["uuid"].bytes,
+            )
+        )
+        strings.append(record_strings)
+        strings_offset += len(record_strings)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".aslo4-index")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(
+                UPDATE_INDEX_HEADER.pack(
+                    UPDATE_INDEX_MAGIC, UPDATE_INDEX_VERSION, len(records)
+                )
+            )
+            fp.writelines(records)
+            fp.writelines(strings)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(records)
@@ -31,18 +31,23 @@ xmlns:em="http://www.mozilla.org/2004/em-rdf#">
 </RDF:RDF>"""
 
 
-def get_sha256(filepath):
-    md5 = hashlib.md5()
-    sha256 = hashlib.sha256()
+def get_sha256(filepath, md5=False):
+    """
+    Reads the file in chunks and returns its sha256, and its md5 if
+    requested, as {"sha256": ..., "md5": ...}
+    """
+    hashes = {"sha256": hashlib.sha256()}
+    if md5:
+        hashes["md5"] = hashlib.md5()
 
     with open(filepath, "rb") as f:
         while True:
             data = f.read(BUF_SIZE)
             if not data:
                 break
-            md5.update(data)
-            sha256.update(data)
-    return {"md5": md5.hexdigest(), "sha256": sha256.hexdigest()}
+            for _hash in hashes.values():
+                _hash.update(data)
+    return {name: _hash.hexdigest() for name, _hash in hashes.items()}
 
 
 class RDF:
@@ -55,6 +60,7 @@ class RDF:
         max_version="0.118",
         base_url="http://activities.sugarlabs.org/bundles",
         info_url="https://activities.sugarlabs.org/activity",
+        hash_cache=None,
     ):
         """
         Generates a RDF file based on the properties of the activity Bundle
@@ -74,12 +80,15 @@ class RDF:
         :type base_url: str
         :param info_url: url to provide information about the activities
         :type info_url: str
+        :param hash_cache: cache of the sha256 of the bundles
+        :type hash_cache: aslo4.lib.cache.HashCache
         """
         self.bundle_id = bundle_id
         self.bundle_version = bundle_version
         self.bundle_path = bundle_path
         self.base_url = base_url
         self.info_url = info_url
+        self.hash_cache = hash_cache
         if self.base_url.endswith("/"):
             # remove trailing slash
             self.base_url = self.base_url[:-1]
@@ -99,19 +108,57 @@ class RDF:
     def __repr__(self):
         return "RDF ({})".format(self.bundle_id)
 
+    def get_bundle_sha256(self):
+        if self.hash_cache is not None:
+            return self.hash_cache.get_sha256(self.bundle_path)
+        return get_sha256(self.bundle_path)["sha256"]
+
     def get_bundle_size(self):
         return os.path.getsize(self.bundle_path) // 1000
 
-    def parse(self):
+    def get_update(self):
+        """
+        Returns the fields of the update described by the RDF. The id of
+        the target application is derived from the bundle, so that the
+        RDF of a bundle is the same from one run to the next
+        :return:
+        :rtype: dict
+        """
+        sha256 = self.get_bundle_sha256()
+        return {
+            "bundle_id": self.bundle_id,
+            "version": self.bundle_version,
+            "uuid": uuid.uuid5(
+                uuid.NAMESPACE_URL,
+                "{}:{}:{}".format(self.bundle_id, self.bundle_version, sha256),
+            ),
+            "min_version": self.compatibility["min"],
+            "max_version": self.compatibility["max"],
+            "update_link": self.url,
+            "update_size": self.get_bundle_size(),
+            "update_info": "{}/{}.html".format(self.info_url, self.bundle_id),
+            "sha256": sha256,
+        }
+
+    def parse(self, update=None):
+        """
+        Renders the RDF
+        :param update: the update of the RDF, see get_update
+        :type update: dict
+        :return:
+        :rtype: str
+        """
+        if update is None:
+            update = self.get_update()
         return RDF_TEMPLATE.format(
-            bundle_id=self.bundle_id,
-            version=self.bundle_version,
-            uuid="{{{}}}".format(uuid.uuid4()),
-            min_version=self.compatibility["min"],
-            max_version=self.compatibility["max"],
-            update_link=self.url,
+            bundle_id=update["bundle_id"],
+            version=update["version"],
+            uuid="{{{}}}".format(update["uuid"]),
+            min_version=update["min_version"],
+            max_version=update["max_version"],
+            update_link=update["update_link"],
             sha_type="sha256",
-            sha_hash=get_sha256(self.bundle_path)["sha256"],
-            update_size=self.get_bundle_size(),
-            update_info="{}/{}.html".format(self.info_url, self.bundle_id),
+            sha_hash=update["sha256"],
+            update_size=update["update_size"],
+            update_info=update["update_info"],
         )
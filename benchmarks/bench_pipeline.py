@@ -0,0 +1,315 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Benchmark of the stages of the generator on synthetic catalogs
+
+    $ python3 benchmarks/bench_pipeline.py --sizes 10 100 1000 -o results.json
+    $ python3 benchmarks/bench_pipeline.py --sizes 10 100 1000 \\
+          --compare results.json
+
+times list_activities, without and with a warm scan cache, RDF.parse of
+every bundle, a full and an incremental generate_web_page and
+generate_sitemap on catalogs written by fixtures.py, and writes the wall
+and CPU seconds of each stage to a JSON file. With --compare, the stages which got slower than the baseline by
+more than --threshold are reported, and the exit code is 1.
+
+Every catalog size runs in its own process, as aslo4.generator reads its
+command line arguments when it is imported, and so that the peak memory
+of a size is not the one of a larger size.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.fixtures import make_catalog  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+SITEMAP_DOMAIN = "https://activities.example.org"
+
+
+def measure(function):
+    """
+    Calls function
+    :return: Tuple (wall seconds, CPU seconds of the process)
+    :rtype: tuple
+    """
+    start_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+    function()
+    return time.perf_counter() - start_time, time.process_time() - start_cpu_time
+
+
+def run_stages(input_dir, output_dir, repeat):
+    """
+    Times the stages of the generator on the catalog of input_dir. Runs
+    in the child process
+    :return: [{stage, seconds, cpu_seconds, max_rss_kib}, ...], the best
+    of `repeat` runs of each stage
+    :rtype: list
+    """
+    sys.argv = [
+        "aslo4",
+        "-i",
+        input_dir,
+        "-o",
+        output_dir,
+        "-p",
+        os.path.join(ROOT_DIR, "aslo4-static"),
+        "-s",
+        "-P",
+        "-y",
+    ]
+    from aslo4.generator import SaaSBuild
+    from aslo4.lib.cache import ScanCache
+
+    # the first release of every bundle is announced on stdout
+    sys.stdout = open(os.devnull, "w")
+    saas_build = SaaSBuild()
+
+    def generate_rdfs():
+        for bundle in saas_build.list_activities():
+            bundle_path = bundle.get_bundle_path()
+            if bundle_path:
+                saas_build._get_rdf(bundle, bundle_path).parse()
+
+    scan_cache_path = "{}-scan.json".format(output_dir)
+
+    def list_activities_cached():
+        # loaded from the disk, as in a new run
+        saas_build.list_activities(scan_cache=ScanCache(scan_cache_path))
+
+    def generate_web_page(incremental):
+        if not incremental:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        saas_build.index = list()
+        saas_build.generate_web_page(output_dir=output_dir, incremental=incremental)
+
+    # name, function called once before the stage without being timed,
+    # stage
+    stages = (
+        ("list_activities", None, saas_build.list_activities),
+        # with the scan cache written by a first listing
+        ("list_activities_cached", list_activities_cached, list_activities_cached),
+        ("rdf", None, generate_rdfs),
+        ("generate_web_page", None, lambda: generate_web_page(False)),
+        # a rebuild in which nothing changed, after the build manifest
+        # was written by a first incremental run
+        (
+            "generate_web_page_incremental",
+            lambda: generate_web_page(True),
+            lambda: generate_web_page(True),
+        ),
+        (
+            "generate_sitemap",
+            None,
+            lambda: saas_build.generate_sitemap(SITEMAP_DOMAIN),
+        ),
+    )
+    results = list()
+    for stage, prepare, function in stages:
+        if prepare is not None:
+            prepare()
+        seconds, cpu_seconds = min(measure(function) for _ in range(repeat))
+        results.append(
+            {
+                "stage": stage,
+                "seconds": seconds,
+                "cpu_seconds": cpu_seconds,
+                # peak of the process so far; kilobytes on linux
+                "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            }
+        )
+    return results
+
+
+def get_meta():
+    try:
+        commit = subprocess.run(
+            ["git", "-C", ROOT_DIR, "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """
+    Returns the stages which are slower than in the baseline
+    :param results: results of this run
+    :type results: list
+    :param baseline: results of the baseline run
+    :type baseline: list
+    :param threshold: allowed relative slowdown, 0.25 is 25% slower
+    :type threshold: float
+    :param min_seconds: slowdowns smaller than this are noise
+    :type min_seconds: float
+    :return: [(result, baseline seconds), ...]
+    :rtype: list
+    """
+    baseline_seconds = {(x["activities"], x["stage"]): x["seconds"] for x in baseline}
+    regressions = list()
+    for result in results:
+        before = baseline_seconds.get((result["activities"], result["stage"]))
+        if before is None:
+            continue
+        if (
+            result["seconds"] > before * (1 + threshold)
+            and result["seconds"] - before > min_seconds
+        ):
+            regressions.append((result, before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        "Pipeline benchmark",
+        description="Measures the stages of the generator on synthetic catalogs",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Numbers of activities of the catalogs (default: 10 100 1000 10000)",
+    )
+    parser.add_argument(
+        "--fixtures-dir",
+        default=os.path.join(tempfile.gettempdir(), "aslo4-bench-fixtures"),
+        help="Directory to keep the synthetic catalogs in, between runs",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=1,
+        help="Run each stage REPEAT times and keep the fastest",
+    )
+    parser.add_argument(
+        "-o", "--output", default="", help="Write the results as JSON to OUTPUT"
+    )
+    parser.add_argument(
+        "--compare", default="", help="Results of a previous run to compare with"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Relative slowdown reported as a regression (default: 0.25)",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.05,
+        help="Slowdowns of less seconds are ignored (default: 0.05)",
+    )
+    # used by the parent process to run the stages of one catalog
+    parser.add_argument("--run-stages", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stages:
+        input_dir, output_dir, results_path = args.run_stages
+        results = run_stages(input_dir, output_dir, args.repeat)
+        with open(results_path, "w") as fp:
+            json.dump(results, fp)
+        return
+
+    results = list()
+    with tempfile.TemporaryDirectory(prefix="aslo4-bench") as work_dir:
+        for size in args.sizes:
+            input_dir = make_catalog(
+                os.path.join(args.fixtures_dir, "{}-{}".format(size, args.seed)),
+                size,
+                seed=args.seed,
+            )
+            results_path = os.path.join(work_dir, "results.json")
+            subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "--repeat",
+                    str(args.repeat),
+                    "--run-stages",
+                    input_dir,
+                    os.path.join(work_dir, "output-{}".format(size)),
+                    results_path,
+                ],
+                env=dict(
+                    os.environ,
+                    CI="true",
+                    ASLOv4_LOGGER_PATH=os.path.join(work_dir, "aslo-build.log"),
+                ),
+                check=True,
+            )
+            with open(results_path) as fp:
+                for result in json.load(fp):
+                    result = dict(activities=size, **result)
+                    results.append(result)
+                    print(
+                        "{activities:>6} {stage:<30} {seconds:>9.3f} s "
+                        "{cpu_seconds:>9.3f} s CPU {max_rss_kib:>8} KiB".format(
+                            **result
+                        )
+                    )
+            shutil.rmtree(
+                os.path.join(work_dir, "output-{}".format(size)), ignore_errors=True
+            )
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump({"meta": get_meta(), "results": results}, fp, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(
+            results, baseline["results"], args.threshold, args.min_seconds
+        )
+        for result, before in regressions:
+            print(
+                "REGRESSION {activities} activities, {stage}: "
+                "{before:.3f} s -> {seconds:.3f} s".format(before=before, **result)
+            )
+        if regressions:
+            sys.exit(1)
+        print("No regressions against {}".format(args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Micro-benchmark of the per-page cost of rendering templates/app.html
+
+    $ python3 benchmarks/bench_templates.py -p ./aslo4-static -n 500
+
+compares compiling the template for every page (read_parse_and_write_template)
+with a shared TemplateEngine, and the cold start of a TemplateEngine with
+and without a bytecode cache.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# the catalog is not needed to render the templates
+os.environ.setdefault("CI", "true")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import FileSystemLoader  # noqa: E402
+
+from aslo4.lib.utils import TemplateEngine  # noqa: E402
+from aslo4.lib.utils import read_parse_and_write_template  # noqa: E402
+
+PAGE_KWARGS = dict(
+    title="Pippy",
+    version="75",
+    summary="Python programming environment",
+    description="",
+    licenses='<span class="badge badge-info">GPLv3+</span>',
+    description_html_div="",
+    bundle_path="/bundles/Pippy-75.xo",
+    tag_list_html_formatted="".join(
+        '<span class="badge badge-primary saas-badge">{}</span>'.format(x)
+        for x in ("programming", "python", "coding")
+    ),
+    author_list_html_formatted="".join(
+        '<span class="badge badge-secondary saas-badge">Author {}  '
+        '<span class="badge badge-dark">{}</span></span>'.format(x, x)
+        for x in range(20)
+    ),
+    icon_path="/icons/pippy.svg",
+    new_feature_html_div="<h4>New in this Version</h4><ul><li>Fixes</li></ul>",
+    changelog_html_div="",
+    git_url="https://github.com/sugarlabs/Pippy",
+    flatpak_html_div="",
+    carousel="",
+)
+
+
+def timeit(function, number):
+    start_time = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start_time) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        "Template rendering benchmark",
+        description="Measures the per-page cost of rendering app.html",
+    )
+    parser.add_argument(
+        "-p",
+        "--pull-static-css-js-html",
+        default=os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            "aslo4-static",
+        ),
+        help="Path to aslo4-static",
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=200, help="Number of pages to render"
+    )
+    args = parser.parse_args()
+
+    # the template engine logs every render
+    logging.getLogger("aslo-builder").setLevel(logging.ERROR)
+
+    templates_dir = os.path.join(args.pull_static_css_js_html, "templates")
+    app_html = os.path.join(templates_dir, "app.html")
+    loader = FileSystemLoader(templates_dir)
+
+    per_call = timeit(
+        lambda: read_parse_and_write_template(
+            file_system_loader=loader, html_template_path=app_html, **PAGE_KWARGS
+        ),
+        args.number,
+    )
+
+    engine = TemplateEngine(loader)
+    shared = timeit(
+        lambda: engine.render(html_template_path=app_html, **PAGE_KWARGS),
+        args.number,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="aslo4-bench") as cache_dir:
+        # populate the bytecode cache
+        TemplateEngine(loader, bytecode_cache_dir=cache_dir).render(
+            html_template_path=app_html, **PAGE_KWARGS
+        )
+        cold = timeit(
+            lambda: TemplateEngine(loader).render(
+                html_template_path=app_html, **PAGE_KWARGS
+            ),
+            args.number,
+        )
+        cold_cached = timeit(
+            lambda: TemplateEngine(loader, bytecode_cache_dir=cache_dir).render(
+                html_template_path=app_html, **PAGE_KWARGS
+            ),
+            args.number,
+        )
+
+    print("pages rendered: {}".format(args.number))
+    print("per page, template compiled per call: {:.3f} ms".format(per_call * 1000))
+    print(
+        "per page, shared TemplateEngine:      {:.3f} ms ({:.1f}x)".format(
+            shared * 1000, per_call / shared
+        )
+    )
+    print("cold start, no bytecode cache:        {:.3f} ms".format(cold * 1000))
+    print(
+        "cold start, bytecode cache:           {:.3f} ms ({:.1f}x)".format(
+            cold_cached * 1000, cold / cold_cached
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
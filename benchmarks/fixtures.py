@@ -0,0 +1,294 @@
+"""
+Sugar Activities App Store (ASLOv4)
+https://github.com/sugarlabs/aslo-v4
+
+Copyright (C) 2020 Srevin Saju <srevinsaju@sugarlabs.org>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Synthetic activity catalog for the benchmarks
+
+    $ python3 benchmarks/fixtures.py -n 100 -o /tmp/catalog
+
+writes N activities the way the input directory of aslo4 looks like:
+activity directories with an activity.info, NEWS, an SVG icon,
+screenshots, a git history and a built dist/*.xo, and some .xo bundles
+without a source directory. The same count and seed give the same
+catalog.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import struct
+import subprocess
+import zipfile
+import zlib
+
+# bump when the layout of the catalog changes, so that cached catalogs
+# are generated again
+FIXTURE_VERSION = 1
+FIXTURE_STAMP_FILE_NAME = ".aslo4-fixture"
+
+# share of the activities which are only a .xo in the input directory
+LOOSE_BUNDLE_RATIO = 0.1
+
+WORDS = (
+    "abacus paint turtle music physics chess memory words maze story write "
+    "read speak measure clock fraction planet map letter number puzzle color "
+    "shape garden robot piano drum journal camera calculate browse chat "
+    "record poll jigsaw sudoku"
+).split()
+TAGS = (
+    "Maths Programming Language Games Music Science Art Tools Geography Reading"
+).split()
+LICENSES = ("GPLv3+", "GPLv2+", "MIT", "LGPLv2.1+", "AGPLv3+")
+AUTHORS = tuple(
+    ("{} {}".format(first, last), "{}.{}@example.org".format(first, last).lower())
+    for first in ("Ana", "Ben", "Chen", "Dara", "Eli", "Femi", "Gita", "Hugo")
+    for last in ("Silva", "Kim", "Okafor", "Novak", "Singh")
+) + (("weblate", "noreply@weblate.org"),)
+
+ICON_TEMPLATE = """<?xml version="1.0" ?><!DOCTYPE svg  PUBLIC '-//W3C//DTD SVG 1.1//EN'
+  'http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd' [
+  <!ENTITY stroke_color "#010101">
+  <!ENTITY fill_color "#FFFFFF">
+]><svg enable-background="new 0 0 55 55" height="55px" version="1.1" \
+viewBox="0 0 55 55" width="55px" x="0px" xmlns="http://www.w3.org/2000/svg" \
+y="0px"><g display="block" id="{name}">
+{shapes}
+</g></svg>
+"""
+
+
+def _random_bytes(rng, size):
+    return rng.getrandbits(8 * size).to_bytes(size, "little") if size else b""
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def make_icon(rng, name):
+    shapes = list()
+    for _ in range(rng.randint(3, 12)):
+        shapes.append(
+            '<path d="M{} {} L{} {} Q{} {} {} {} Z" fill="&fill_color;" '
+            'stroke="&stroke_color;" stroke-width="2.5"/>'.format(
+                *(rng.randint(2, 53) for _ in range(8))
+            )
+        )
+    return ICON_TEMPLATE.format(name=name, shapes="\n".join(shapes))
+
+
+def make_png(rng, width=64, height=48):
+    """
+    Returns a valid, noisy RGB PNG
+    """
+
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    rows = b"".join(b"\0" + _random_bytes(rng, width * 3) for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def make_news(rng, version):
+    sections = list()
+    for release in range(version, max(version - rng.randint(1, 8), 0), -1):
+        bullets = "\n".join(
+            "* {}".format(_sentence(rng, rng.randint(3, 9)))
+            for _ in range(rng.randint(1, 6))
+        )
+        sections.append("{}\n\n{}\n".format(release, bullets))
+    return "\n".join(sections)
+
+
+def make_activity_files(rng, index):
+    """
+    Returns the name, bundle id, version and the files of an activity
+    :return: Tuple (name, bundle_id, version, {relative path: bytes})
+    """
+    name = "{}{}{}".format(
+        rng.choice(WORDS).capitalize(), rng.choice(WORDS).capitalize(), index
+    )
+    bundle_id = "org.sugarlabs.{}".format(name)
+    version = rng.randint(1, 120)
+    icon = "activity-{}".format(name.lower())
+    info = "\n".join(
+        (
+            "[Activity]",
+            "name = {}".format(name),
+            "activity_version = {}".format(version),
+            "bundle_id = {}".format(bundle_id),
+            "icon = {}".format(icon),
+            "exec = sugar-activity3 activity.{}Activity".format(name),
+            "license = {}".format(";".join(rng.sample(LICENSES, rng.randint(1, 2)))),
+            "summary = {}".format(_sentence(rng, rng.randint(4, 12))),
+            "tags = {}".format(";".join(rng.sample(TAGS, rng.randint(1, 4)))),
+            "repository = https://github.com/sugarlabs/{}.git".format(name.lower()),
+            "",
+        )
+    )
+    files = {
+        "activity/activity.info": info.encode(),
+        "activity/{}.svg".format(icon): make_icon(rng, icon).encode(),
+        "NEWS": make_news(rng, version).encode(),
+        "activity.py": "\n".join(
+            "# {}".format(_sentence(rng, 10)) for _ in range(rng.randint(50, 400))
+        ).encode(),
+        # translations, sounds and images make most of the size of a bundle
+        "data/assets.bin": _random_bytes(rng, rng.randint(2, 32) * 1024),
+    }
+    for i in range(rng.randint(0, 3)):
+        files["screenshots/{}.png".format(i)] = make_png(rng)
+    return name, bundle_id, version, files
+
+
+def make_bundle(path, name, files):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for file_name, data in sorted(files.items()):
+            if file_name.startswith("screenshots/"):
+                continue
+            zip_file.writestr("{}.activity/{}".format(name, file_name), data)
+
+
+def make_git_history(rng, path, name, files):
+    """
+    Creates the git repository of an activity, with a history of commits
+    by several authors, in one git fast-import
+    """
+    # without the sample hooks of the default template
+    subprocess.run(["git", "init", "-q", "--template=", path], check=True)
+    with open(os.path.join(path, ".git", "HEAD")) as fp:
+        branch = fp.read().split(":", 1)[1].strip()
+    with open(os.path.join(path, ".git", "config"), "a") as fp:
+        fp.write(
+            '[remote "origin"]\n'
+            "\turl = https://github.com/sugarlabs/{}.git\n"
+            "\tfetch = +refs/heads/*:refs/remotes/origin/*\n".format(name.lower())
+        )
+
+    authors = rng.sample(AUTHORS, rng.randint(1, 6))
+    commits = rng.randint(2, 40)
+    timestamp = 1262304000 + rng.randint(0, 10**8)
+    stream = list()
+    for mark in range(1, commits + 1):
+        author_name, author_email = rng.choice(authors)
+        timestamp += rng.randint(600, 10**6)
+        message = _sentence(rng, rng.randint(2, 8)).encode()
+        stream.append(
+            "commit {branch}\nmark :{mark}\n"
+            "author {author} {timestamp} +0000\n"
+            "committer {author} {timestamp} +0000\n"
+            "data {length}\n".format(
+                branch=branch,
+                mark=mark,
+                author="{} <{}>".format(author_name, author_email),
+                timestamp=timestamp,
+                length=len(message),
+            ).encode()
+            + message
+            + b"\n"
+        )
+        # the last commit has the files of the working tree
+        changed = files if mark == commits else {"activity.py": message}
+        for file_name, data in sorted(changed.items()):
+            stream.append(
+                "M 100644 inline {}\ndata {}\n".format(file_name, len(data)).encode()
+                + data
+                + b"\n"
+            )
+    stream.append("reset refs/tags/v{}\nfrom :{}\n\n".format(commits, commits).encode())
+    subprocess.run(
+        ["git", "-C", path, "fast-import", "--quiet"],
+        input=b"".join(stream),
+        check=True,
+    )
+    # fast-import does not touch the index
+    subprocess.run(["git", "-C", path, "reset", "-q"], check=True)
+
+
+def make_catalog(root, count, seed=0):
+    """
+    Writes a catalog of `count` activities to root, unless root already
+    has the catalog of the same count and seed
+    :param root: input directory
+    :type root: str
+    :param count: number of activities
+    :type count: int
+    :param seed: seed of the random catalog
+    :type seed: int
+    :return: root
+    :rtype: str
+    """
+    stamp = "{} {} {}".format(FIXTURE_VERSION, count, seed)
+    stamp_path = os.path.join(root, FIXTURE_STAMP_FILE_NAME)
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as fp:
+            if fp.read() == stamp:
+                return root
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+
+    rng = random.Random(seed)
+    for index in range(count):
+        name, bundle_id, version, files = make_activity_files(rng, index)
+        bundle_file_name = "{}-{}.xo".format(name, version)
+        if rng.random() < LOOSE_BUNDLE_RATIO:
+            make_bundle(os.path.join(root, bundle_file_name), name, files)
+            continue
+
+        activity_dir = os.path.join(root, name)
+        for file_name, data in files.items():
+            path = os.path.join(activity_dir, file_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fp:
+                fp.write(data)
+        os.makedirs(os.path.join(activity_dir, "dist"))
+        make_bundle(os.path.join(activity_dir, "dist", bundle_file_name), name, files)
+        make_git_history(rng, activity_dir, name, files)
+
+    with open(stamp_path, "w") as fp:
+        fp.write(stamp)
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        "Synthetic catalog", description="Writes a synthetic activity catalog"
+    )
+    parser.add_argument("-o", "--output", required=True, help="Input directory")
+    parser.add_argument(
+        "-n", "--number", type=int, default=100, help="Number of activities"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_catalog(args.output, args.number, seed=args.seed)
+    print("{} activities written to {}".format(args.number, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,9 @@ setup(
     author_email="srevinsaju@sugarlabs.org",
     description="A python package to build sugar app store",
     include_package_data=True,
+    python_requires=">=3.7",
     install_requires=["python_utils", "jinja2", "colorama"],
+    extras_require={"brotli": ["brotli"]},
     entry_points={
         "console_scripts": [
             "aslo4-gen = aslo4.__main__:main",
@@ -29,7 +31,6 @@ setup(
     classifiers=[
         "Operating System :: OS Independent",
         "Programming Language :: Python :: 3.7",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.8",
         "Operating System :: MacOS :: MacOS X",
         "Operating System :: Microsoft :: Windows",
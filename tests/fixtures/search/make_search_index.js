@@ -0,0 +1,27 @@
+/*
+Writes search-index.json, the index of documents.json as serialized by
+JSON.stringify(miniSearch) with the MiniSearch of the website, which
+tests/test_search.py compares aslo4.lib.search.build_search_index with:
+
+    cd tests/fixtures/search
+    npm install --no-save minisearch@2.2.2
+    node make_search_index.js
+*/
+
+const fs = require('fs');
+const path = require('path');
+const MiniSearch = require('minisearch');
+
+// the options of aslo4-static/js/search.js
+const miniSearchOptions = {
+  fields: ['name', 'summary'],
+  storeFields: ['name', 'summary', 'url', 'icon_name', 'bundle_name', 'v', 'bundle_id'],
+};
+
+const documents = JSON.parse(
+    fs.readFileSync(path.join(__dirname, 'documents.json'), 'utf8'));
+const miniSearch = new MiniSearch(miniSearchOptions);
+miniSearch.addAll(documents);
+fs.writeFileSync(
+    path.join(__dirname, 'search-index.json'),
+    JSON.stringify(miniSearch, null, 2) + '\n');
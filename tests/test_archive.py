@@ -0,0 +1,62 @@
+import os
+import zipfile
+
+import pytest
+
+from aslo4.bundle.archive import BundleArchive
+
+ICON = b'<svg xmlns="http://www.w3.org/2000/svg"><rect/></svg>'
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = str(tmp_path / "Foo-1.xo")
+    with zipfile.ZipFile(path, "w") as fp:
+        fp.writestr("Foo.activity/activity/activity-foo.svg", ICON)
+    archive = BundleArchive(path)
+    yield archive
+    archive.close()
+
+
+@pytest.fixture
+def source(tmp_path):
+    # the icon in the git repository of the activity
+    source = tmp_path / "activity-foo.svg"
+    source.write_bytes(b"<svg/>")
+    return source
+
+
+def test_extract_member(archive, tmp_path):
+    output_path = str(tmp_path / "icon.svg")
+    archive.extract_member("Foo.activity/activity/activity-foo.svg", output_path)
+    with open(output_path, "rb") as fp:
+        assert fp.read() == ICON
+    assert archive.is_extracted("Foo.activity/activity/activity-foo.svg", output_path)
+    assert sorted(os.listdir(str(tmp_path))) == ["Foo-1.xo", "icon.svg"]
+
+
+def test_extract_onto_a_hardlink(archive, source, tmp_path):
+    output_path = str(tmp_path / "icon.svg")
+    # as published with --publish-strategy hardlink
+    os.link(str(source), output_path)
+    archive.extract_member("Foo.activity/activity/activity-foo.svg", output_path)
+    assert source.read_bytes() == b"<svg/>"
+    with open(output_path, "rb") as fp:
+        assert fp.read() == ICON
+    assert not os.path.samefile(str(source), output_path)
+
+
+def test_extract_onto_a_symlink(archive, source, tmp_path):
+    output_path = str(tmp_path / "icon.svg")
+    os.symlink(str(source), output_path)
+    archive.extract_member("Foo.activity/activity/activity-foo.svg", output_path)
+    assert source.read_bytes() == b"<svg/>"
+    assert not os.path.islink(output_path)
+    with open(output_path, "rb") as fp:
+        assert fp.read() == ICON
+
+
+def test_missing_member(archive, tmp_path):
+    with pytest.raises(KeyError):
+        archive.extract_member("Foo.activity/missing.svg", str(tmp_path / "x.svg"))
+    assert not os.path.lexists(str(tmp_path / "x.svg"))
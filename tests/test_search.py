@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+from aslo4.lib.search import LEAF, build_search_index, tokenize
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(__file__), "fixtures", "search")
+
+
+@pytest.fixture
+def documents():
+    with open(os.path.join(FIXTURES_DIRECTORY, "documents.json")) as fp:
+        return json.load(fp)
+
+
+def find_term(index, term):
+    """
+    Returns the postings of a term in the radix tree of an index, or None
+    """
+    tree = index["index"]["_tree"]
+    while term:
+        edge = next((x for x in tree if x != LEAF and term.startswith(x)), None)
+        if edge is None:
+            return None
+        size = len(edge)
+        tree = tree[edge]
+        term = term[size:]
+    return tree.get(LEAF)
+
+
+@pytest.mark.parametrize(
+    "text, tokens",
+    [
+        ("Chess", ["Chess"]),
+        ("", [""]),
+        ("Play chess, or a friend.", ["Play", "chess", "or", "a", "friend", ""]),
+        ("  ...a Logo-inspired turtle!  ", ["", "a", "Logo", "inspired", "turtle", ""]),
+        ("¿Hablas?", ["", "Hablas", ""]),
+        ("edit — and «share»…", ["edit", "and", "share", ""]),
+        ("珠算、算術。　Abacus", ["珠算", "算術", "Abacus"]),
+        ("a b c", ["a", "b", "c"]),
+        ("Écrire l'été", ["Écrire", "l", "été"]),
+        # symbols, tabs and currency signs are not separators
+        ("$1 + 1 = 2 | a~b", ["$1", "+", "1", "=", "2", "|", "a~b"]),
+        ("a\tb", ["a\tb"]),
+    ],
+)
+def test_tokenize(text, tokens):
+    assert tokenize(text) == tokens
+
+
+def test_field_length_counts_empty_terms(documents):
+    index = build_search_index(documents)
+    turtle = next(i for i, x in enumerate(documents) if x["name"] == "Turtle Blocks")
+    summary = index["fieldIds"]["summary"]
+    # the leading and trailing separators are counted as empty terms, as
+    # String.split returns them, but they are not indexed
+    assert index["fieldLength"][turtle][summary] == 10
+    assert find_term(index, "") is None
+    assert LEAF not in index["index"]["_tree"]
+
+
+def test_terms_are_indexed(documents):
+    index = build_search_index(documents)
+    name = index["fieldIds"]["name"]
+    summary = index["fieldIds"]["summary"]
+    chess = find_term(index, "chess")
+    assert chess[name] == {"df": 1, "ds": {0: 1}}
+    assert chess[summary] == {"df": 1, "ds": {0: 1}}
+    assert find_term(index, "écrire")[name]["ds"] == {1: 1}
+    assert find_term(index, "算術")[summary]["ds"] == {5: 1}
+    assert find_term(index, "Chess") is None
+    assert find_term(index, "ches") is None
+    # documents without a summary are indexed by their name only
+    hello_world = len(documents) - 1
+    assert summary not in index["fieldLength"][hello_world]
+    assert index["storedFields"][hello_world]["summary"] is None
+
+
+def test_search_index_matches_minisearch(documents):
+    """
+    Compares the index with the one of the MiniSearch of the website,
+    see tests/fixtures/search/make_search_index.js
+    """
+    path = os.path.join(FIXTURES_DIRECTORY, "search-index.json")
+    if not os.path.exists(path):
+        pytest.skip("run tests/fixtures/search/make_search_index.js first")
+    with open(path) as fp:
+        expected = json.load(fp)
+    # the keys of the documents are strings once serialized
+    index = json.loads(json.dumps(build_search_index(documents)))
+    assert index["averageFieldLength"] == pytest.approx(
+        expected.pop("averageFieldLength")
+    )
+    del index["averageFieldLength"]
+    assert index == expected